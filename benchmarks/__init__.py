@@ -0,0 +1 @@
+""" Benchmarks of LeApp Workflow module using synthetic actors """
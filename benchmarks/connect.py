@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+""" Benchmark matching ports of synthetic actors and compiling their
+workflow """
+
+import argparse
+import time
+
+from leappwf.actor import AnnotatedFuncActor
+from leappwf.msgtypes import ShellCommandStatus
+from leappwf.portannotation import (
+    All,
+    Any,
+    DstPortAnnotation,
+    PortAnnotation,
+    PortMatcher,
+    matchactors,
+    matchport)
+from leappwf.workflow import Workflow
+
+
+def noop(*args):
+    """ Synthetic actor function """
+    return None
+
+
+def synthetic_actors(count, wildcards=True):
+    """ Build count actors forming a binary tree of dependencies
+
+    Every actor has its own message type derived from ShellCommandStatus,
+    depends on its parent by name and every 1000th actor also collects
+    all ShellCommandStatus messages. The root takes messages of any actor.
+    Without wildcards, the root takes nothing and nobody collects all
+    messages, so that the actors form no cycles
+    """
+    actors = []
+    for idx in range(count):
+        name = 'actor{}'.format(idx)
+        msgtype = type('Status{}'.format(idx), (ShellCommandStatus,), {})
+
+        inports = {}
+        if idx:
+            inports['parent'] = DstPortAnnotation(ShellCommandStatus,
+                                                  'actor{}'.format(idx // 2))
+        elif wildcards:
+            inports['parent'] = DstPortAnnotation(ShellCommandStatus, Any)
+        if wildcards and idx % 1000 == 999:
+            inports['everything'] = DstPortAnnotation(ShellCommandStatus, All)
+
+        actors.append(AnnotatedFuncActor(
+            noop,
+            name=name,
+            inports=sorted(inports),
+            inports_annotations=inports,
+            outports=['out'],
+            outports_annotations={'out': PortAnnotation(msgtype)}))
+    return actors
+
+
+def naive_matches(actors):
+    """ Match every inport against every outport """
+    alloutports = [p for a in actors for p in a.outports.values()]
+    return [(ip, [op for op in alloutports
+                  if matchport(ip, op) and op.owner is not a])
+            for a in actors for ip in a.inports.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--actors', type=int, default=10000,
+                        help='number of synthetic actors')
+    parser.add_argument('--check', type=int, default=2000,
+                        help='compare with all pairs scan up to this size')
+    args = parser.parse_args()
+
+    actors = synthetic_actors(args.actors)
+
+    start = time.time()
+    matches = matchactors(actors)
+    print("matchactors: {} actors in {:.3f}s".format(args.actors,
+                                                     time.time() - start))
+
+    if args.actors <= args.check:
+        start = time.time()
+        expected = naive_matches(actors)
+        print("all pairs scan: {} actors in {:.3f}s".format(
+            args.actors, time.time() - start))
+        assert matches == expected, "indexed matching differs"
+
+    start = time.time()
+    matcher = PortMatcher()
+    for actor in actors:
+        matcher.add(actor)
+    indexed = [(ip, matcher.match(ip)) for ip, _ in matches]
+    print("PortMatcher: {} actors in {:.3f}s".format(args.actors,
+                                                     time.time() - start))
+    assert indexed == matches, "PortMatcher differs from matchactors"
+
+    workflow = Workflow()
+    for actor in synthetic_actors(args.actors, wildcards=False):
+        workflow.add_actor(actor)
+    start = time.time()
+    plan = workflow.compile()
+    print("Workflow.compile: {} actors, {} planned in {:.3f}s".format(
+        args.actors, len(plan.order), time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+""" Measure memory used by messages and by workflow runs with large
+payloads """
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+
+from leappwf.msgtypes import ShellCommandStatus
+from leappwf.run import LeAppWorkflow
+from leappwf.workflow import THREAD
+
+from . import synth
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+
+class DictStatus(object):
+    """ Message with per-instance __dict__, for comparison """
+
+    def __init__(self, srcname, errorinfo, payload):
+        self.srcname = srcname
+        self.errorinfo = errorinfo
+        self.payload = payload
+
+
+def msg_size(msg):
+    """ Return bytes used by message itself, payload excluded """
+    size = sys.getsizeof(msg)
+    if hasattr(msg, '__dict__'):
+        size += sys.getsizeof(msg.__dict__)
+    return size
+
+
+def run_peak(actors_path, mode):
+    """ Run workflow, return (peak bytes, how peak was measured) """
+    wf = LeAppWorkflow(actors_path, cache=False)
+    wf.load_actors()
+    if tracemalloc is None:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        wf.run_actors(mode)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # maxrss only grows, so this is 0 unless the run set a new maximum
+        return (after - before) * 1024, 'maxrss increase'
+
+    tracemalloc.start()
+    try:
+        wf.run_actors(mode)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, 'tracemalloc peak'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--actors', type=int, default=1000,
+                        help='number of actors in collectors workflow')
+    parser.add_argument('--payload-size', type=int, default=1000,
+                        help='number of strings in payload of each actor')
+    parser.add_argument('--mode', default=THREAD,
+                        help='workflow run mode')
+    args = parser.parse_args()
+
+    slotted = msg_size(ShellCommandStatus('actor', None, 0))
+    plain = msg_size(DictStatus('actor', None, 0))
+    print("message: {} bytes with __slots__, {} bytes with __dict__".format(
+        slotted, plain))
+    print("saved for {} messages: {:.1f} KiB".format(
+        args.actors, (plain - slotted) * args.actors / 1024.0))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        actors_path = os.path.join(tmpdir, 'actors')
+        synth.generate(actors_path, synth.COLLECTORS, args.actors,
+                       payload_size=args.payload_size)
+        peak, how = run_peak(actors_path, args.mode)
+    finally:
+        shutil.rmtree(tmpdir)
+    print("{} run of {} actors x {} payload strings: {:.1f} MiB {}".format(
+        args.mode, args.actors, args.payload_size, peak / 1048576.0, how))
+
+
+if __name__ == '__main__':
+    main()
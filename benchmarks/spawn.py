@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+""" Benchmark script spawn latency: sudo per actor vs privileged helpers """
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from leappwf.actor import run_script
+from leappwf.executor import PrivilegedExecutor
+
+
+def timed_runs(runner, script, count):
+    """ Run no-op script count times, return total seconds """
+    start = time.time()
+    for _ in range(count):
+        res = runner(script, '')
+        assert res[0] == 0, "no-op script failed: {}".format(res)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--actors', type=int, default=500,
+                        help='number of no-op actor scripts to run')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        script = os.path.join(tmpdir, 'noop.sh')
+        with open(script, 'w') as stream:
+            stream.write('#!/bin/sh\ntrue\n')
+        os.chmod(script, 0o755)
+
+        spawn = timed_runs(run_script, script, args.actors)
+        print("sudo per actor: {} runs in {:.3f}s".format(args.actors, spawn))
+
+        start = time.time()
+        with PrivilegedExecutor() as executor:
+            helper = timed_runs(executor, script, args.actors)
+        total = time.time() - start
+        print("privileged helper: {} runs in {:.3f}s "
+              "({:.3f}s with helper start/stop)".format(args.actors,
+                                                        helper, total))
+        print("saved per actor: {:.2f}ms".format(
+            (spawn - total) * 1000.0 / args.actors))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+""" Time startup of the leappwf command, as run by frequent cron jobs """
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import synth
+
+# modules slow to import, reported if importing leappwf pulls them in
+_HEAVY = ('wowp', 'networkx', 'jsonschema', 'yaml')
+
+_IMPORTED = ("import sys, leappwf.cli; "
+             "print(' '.join(m for m in {heavy!r} if m in sys.modules))")
+
+
+def timed_command(args, env, repeat):
+    """ Return best seconds of repeat runs of python with args """
+    best = None
+    with open(os.devnull, 'wb') as devnull:
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.call([sys.executable] + args, env=env,
+                            stdout=devnull, stderr=devnull)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--actors', type=int, default=100,
+                        help='number of actors in wide workflow')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of each command, best one is reported')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        actors_path = os.path.join(tmpdir, 'actors')
+        synth.generate(actors_path, synth.WIDE, args.actors)
+        env = dict(os.environ)
+        # keep actors cache of the benchmark out of the real one
+        env['HOME'] = tmpdir
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+            [path for path in [os.environ.get('PYTHONPATH')] if path])
+
+        imported = subprocess.check_output(
+            [sys.executable, '-c', _IMPORTED.format(heavy=_HEAVY)],
+            env=env).decode().split()
+        print("importing leappwf.cli imports: {}".format(
+            ' '.join(imported) or 'none of ' + ', '.join(_HEAVY)))
+
+        cli = ['-m', 'leappwf.cli']
+        for name, command in (
+                ('interpreter', ['-c', 'pass']),
+                ('import leappwf', ['-c', 'import leappwf']),
+                ('leappwf --help', cli + ['--help']),
+                ('leappwf list, no cache',
+                 cli + ['list', '--no-cache', actors_path]),
+                ('leappwf list, cached', cli + ['list', actors_path]),
+                ('leappwf run, cached', cli + ['run', actors_path])):
+            if name.endswith('cached'):
+                # fill actors cache
+                timed_command(cli + ['list', actors_path], env, 1)
+            print("{:<24} {:8.3f} s".format(
+                name, timed_command(command, env, args.repeat)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
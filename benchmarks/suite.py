@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+""" Time loading, class generation, wiring and runs of synthetic actors """
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from leappwf.jsonclasses import JSONClassFactory
+from leappwf.portannotation import PortMatcher
+from leappwf.run import LeAppWorkflow
+from leappwf.version import __version__
+from leappwf.workflow import PROCESS, SERIAL, THREAD, _default_actors
+
+from . import synth
+
+
+def timed(func, *args, **kwargs):
+    """ Return (seconds, result) of func call """
+    start = time.time()
+    res = func(*args, **kwargs)
+    return time.time() - start, res
+
+
+def loaded(actors_path):
+    """ Return workflow with actors loaded, bypassing actors cache """
+    wf = LeAppWorkflow(actors_path, cache=False)
+    wf.load_actors()
+    return wf
+
+
+def match_ports(actors):
+    """ Return matches of inports of actors indexed by PortMatcher """
+    matcher = PortMatcher()
+    for actor in actors:
+        matcher.add(actor)
+    return [(inport, matcher.match(inport)) for actor in actors
+            for inport in matcher.inports(actor)]
+
+
+def bench(actors_path, modes, target):
+    """ Return timings of each stage for actors in actors_path """
+    res = {}
+    wf = LeAppWorkflow(actors_path, cache=False)
+    res['load_actors'], _ = timed(wf.load_actors)
+    res['actors'] = len(wf.workflow.actors)
+    for load_mode in (SERIAL, THREAD, PROCESS):
+        mode_wf = LeAppWorkflow(actors_path, cache=False)
+        mode_wf.load_mode = load_mode
+        res['load_actors_' + load_mode], _ = timed(mode_wf.load_actors)
+
+    target_wf = LeAppWorkflow(actors_path, cache=False)
+    res['load_target'], _ = timed(target_wf.load_actors, targets=[target])
+    res['target_actors'] = len(target_wf.workflow.actors)
+
+    factory = JSONClassFactory()
+    for name in wf.actors_data:
+        factory.add_classes_data(name, wf.class_factory.classes_data(name))
+    res['generate_classes'], _ = timed(factory.generate_classes)
+
+    actors = list(wf.workflow.actors.values()) + list(_default_actors())
+    res['match_ports'], _ = timed(match_ports, actors)
+    res['compile'], _ = timed(wf.workflow.compile)
+
+    for mode in modes:
+        try:
+            mode_wf = loaded(actors_path)
+            res['run_' + mode], ret = timed(mode_wf.run_actors, mode)
+            # plan is compiled by first run only
+            res['rerun_' + mode], _ = timed(mode_wf.run_actors, mode)
+        except Exception as err:
+            res['error_' + mode] = repr(err)
+            continue
+        res['failed_' + mode] = len([data for data in ret.values()
+                                     if data['errorinfo']])
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shapes', nargs='+', default=list(synth.SHAPES),
+                        choices=synth.SHAPES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000],
+                        help='numbers of actors')
+    parser.add_argument('--depth', type=int, default=10,
+                        help='superclass chain length of hierarchy shape')
+    parser.add_argument('--modes', nargs='+', default=[SERIAL, THREAD],
+                        help='workflow run modes to time')
+    parser.add_argument('--output', help='write JSON results to file')
+    args = parser.parse_args()
+
+    results = []
+    for shape in args.shapes:
+        for size in args.sizes:
+            tmpdir = tempfile.mkdtemp()
+            try:
+                actors_path = os.path.join(tmpdir, 'actors')
+                synth.generate(actors_path, shape, size, args.depth)
+                res = bench(actors_path, args.modes,
+                            synth.actor_name(size - 1))
+            finally:
+                shutil.rmtree(tmpdir)
+            res.update({'shape': shape, 'size': size, 'depth': args.depth})
+            sys.stderr.write("{shape} {size}: {res}\n".format(
+                shape=shape, size=size, res=res))
+            results.append(res)
+
+    report = json.dumps({'leappwf': __version__,
+                         'python': platform.python_version(),
+                         'timestamp': time.time(),
+                         'results': results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            stream.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+""" Generate synthetic actor directories """
+
+import json
+import os
+
+# Shapes of generated actor trees
+WIDE = 'wide'
+CHAIN = 'chain'
+COLLECTORS = 'collectors'
+HIERARCHY = 'hierarchy'
+SHAPES = (WIDE, CHAIN, COLLECTORS, HIERARCHY)
+
+_NOOP_SCRIPT = '#!/bin/sh\nexit 0\n'
+# prints payload.json stored next to the script
+_PAYLOAD_SCRIPT = '#!/bin/sh\ncat "$(dirname "$0")/payload.json"\n'
+
+
+def _write_actor(path, name, decl, types, payload_size=0):
+    """ Write actor dir with script, actordecl.yaml and port types
+
+    types is a list of (type name, superclass name). With payload_size the
+    script outputs a list of payload_size strings on its first outport
+    """
+    actor_path = os.path.join(path, name)
+    os.makedirs(actor_path)
+
+    script = os.path.join(actor_path, name + '.sh')
+    with open(script, 'w') as stream:
+        stream.write(_PAYLOAD_SCRIPT if payload_size else _NOOP_SCRIPT)
+    os.chmod(script, 0o755)
+
+    if payload_size:
+        payload = ['{}-{:08d}'.format(name, idx)
+                   for idx in range(payload_size)]
+        with open(os.path.join(actor_path, 'payload.json'), 'w') as stream:
+            json.dump({'outports': {types[0][0]: payload}}, stream)
+
+    # JSON is a subset of YAML
+    with open(os.path.join(actor_path, 'actordecl.yaml'), 'w') as stream:
+        json.dump(decl, stream)
+
+    for type_name, superclass in types:
+        type_path = os.path.join(actor_path, type_name + '.json')
+        with open(type_path, 'w') as stream:
+            json.dump({'superclass': superclass}, stream)
+
+
+def actor_name(idx):
+    return 'actor{:06d}'.format(idx)
+
+
+def generate(path, shape, size, depth=10, payload_size=0):
+    """ Generate size actors of given shape in path
+
+    WIDE: all actors depend on the first one
+    CHAIN: every actor depends on the previous one
+    COLLECTORS: independent actors and the last one collects all of
+                their outputs with src: '*'
+    HIERARCHY: independent actors with depth outports whose types form a
+               superclass chain
+
+    Actors output payload_size strings each when payload_size is set
+    """
+    if shape not in SHAPES:
+        raise ValueError("unknown shape: {}".format(shape))
+
+    for idx in range(size):
+        name = actor_name(idx)
+        types = [('Status', 'ShellCommandStatus')]
+        decl = {'outports': [{'type': 'Status.json'}]}
+
+        if shape == WIDE and idx:
+            decl['inports'] = [{'src': actor_name(0)}]
+        elif shape == CHAIN and idx:
+            decl['inports'] = [{'src': actor_name(idx - 1)}]
+        elif shape == COLLECTORS and idx == size - 1:
+            decl['inports'] = [{'name': 'everything', 'src': '*'}]
+        elif shape == HIERARCHY:
+            for level in range(1, depth):
+                types.append(('Status{}'.format(level),
+                              types[-1][0]))
+            # subclasses first, so that class generation has to reorder
+            decl['outports'] = [{'type': type_name + '.json'}
+                                for type_name, _ in reversed(types)]
+
+        _write_actor(path, name, decl, types, payload_size)
@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 """ Build and run workflow using LeApp Workflow module """
 
+import logging
+
 import leappwf
 
 if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=logging.INFO)
     wf = leappwf.LeAppWorkflow('./actors')
     wf.load_actors()
     ret = wf.run_actors()
@@ -1,6 +1,38 @@
-import logging
+import sys
+import types
 
-from .run import LeAppWorkflow
+# Importing actors machinery (wowp, networkx) is slow, so it is deferred
+# until exported names are used. Logging is left to be configured by
+# applications, see leappwf.cli
+__all__ = ['Fleet', 'LeAppWorkflow']
 
-logging.basicConfig(format='%(levelname)s: %(message)s',
-                    level=logging.INFO)
+_EXPORTS = {'Fleet': 'fleet', 'LeAppWorkflow': 'run'}
+
+
+class _Package(types.ModuleType):
+    """ Package module importing exported names when they are first used,
+    the way module __getattr__ of Python 3.7 would """
+
+    def __getattr__(self, name):
+        if name not in _EXPORTS:
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                self.__name__, name))
+        import importlib
+        value = getattr(importlib.import_module('.' + _EXPORTS[name],
+                                                self.__name__), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_EXPORTS))
+
+
+if sys.version_info >= (3, 5):
+    sys.modules[__name__].__class__ = _Package
+else:
+    # class of a module cannot be changed, the package module is replaced,
+    # keeping the original one alive as its globals are used above
+    _package = _Package(__name__)
+    _package.__dict__.update(globals())
+    _package._original = sys.modules[__name__]
+    sys.modules[__name__] = _package
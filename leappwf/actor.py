@@ -3,9 +3,31 @@
 import json
 import logging
 import os
+import tempfile
+import threading
+import time
 from subprocess import Popen, PIPE
 from wowp.actors import FuncActor
 
+from .instrument import nophase
+from .journal import file_key, inputs_key
+from .limits import (
+    CANCELLED,
+    CPU_TIME,
+    MEMORY,
+    TIMEOUT,
+    ScriptKiller,
+    exceeded,
+    output_limits,
+    preexec,
+    reap)
+from .output import (
+    communicate,
+    json_member,
+    open_output,
+    oversized,
+    read_output,
+    remove_output)
 from .portannotation import ActorError, MsgType
 from .msgtypes import ShellCommandStatus
 
@@ -20,6 +42,177 @@ class ScriptError(ActorError):
     pass
 
 
+class CancelError(ActorError):
+    def __init__(self, actorname):
+        super(CancelError, self).__init__("cancelled",
+                                          "run cancelled by failed actor",
+                                          actorname)
+        self.actorname = actorname
+
+
+# errors of scripts killed for exceeding their limits
+_LIMIT_ERRORS = {TIMEOUT: "script timed out",
+                 CPU_TIME: "script exceeded CPU time limit",
+                 MEMORY: "script exceeded memory limit"}
+
+
+class OutputLimitError(ActorError):
+    def __init__(self, stream, size, limit):
+        super(OutputLimitError, self).__init__("failed",
+                                               "script output too large",
+                                               {'stream': stream,
+                                                'size': size,
+                                                'limit': limit})
+        self.stream = stream
+
+
+def script_cmd(script, inports_file, inports_data=None):
+    """ Return command running actor script
+
+    Script gets path to inports data file as argument, unless inports data
+    are sent to its stdin
+    """
+    if inports_data is not None:
+        return ['sudo', script]
+    return ['sudo', script, inports_file]
+
+
+class ScriptResult(tuple):
+    """ (returncode, stdout, stderr) of script with its resource usage and
+    the reason it was killed for, if it was (see leappwf.limits) """
+    def __new__(cls, returncode, out, err, rusage=None, killed=None):
+        res = super(ScriptResult, cls).__new__(cls, (returncode, out, err))
+        res.rusage = rusage
+        res.killed = killed
+        return res
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+
+class ScriptCall(object):
+    """ Run of actor script prepared by DirAnnotatedShellActor.prepare
+
+    args are the arguments of run_script for the run. result is the
+    memoized script result if the script need not run at all
+    """
+    def __init__(self, args, keys):
+        self.args = args
+        self.keys = keys
+        self.memo_key = None
+        self.result = None
+        self.started = time.time()
+
+
+def run_script(script, inports_file, inports_data=None, limits=None):
+    """ Run actor script and return (returncode, stdout, stderr)
+
+    inports_data, if not None, is written to script's stdin. limits, if
+    given, are enforced on the script, see leappwf.limits. Returned
+    ScriptResult also carries resource usage of the script
+    """
+    return run_command(script_cmd(script, inports_file, inports_data),
+                       inports_data, limits)
+
+
+def run_command(cmd, data=None, limits=None):
+    """ Run command with data on its stdin, return its ScriptResult
+
+    Command is killed when it exceeds its limits or when the workflow run
+    it belongs to is cancelled
+    """
+    child = Popen(cmd,
+                  stdin=PIPE,
+                  stdout=PIPE,
+                  stderr=PIPE,
+                  preexec_fn=preexec(limits))
+    killer = ScriptKiller(child.pid, (limits or {}).get('timeout'))
+    groups = getattr(_local, 'groups', None)
+    if groups is not None:
+        groups.add(killer)
+    try:
+        out, err = communicate(child, data, *output_limits(limits))
+        rusage = reap(child)
+    except BaseException:
+        # interrupted, e.g. by Ctrl-C, which the script in a session of its
+        # own does not get
+        killer.kill(CANCELLED)
+        raise
+    finally:
+        killer.close()
+        if groups is not None:
+            groups.discard(killer)
+    killed = killer.reason or exceeded(limits, child.returncode, rusage)
+    return ScriptResult(child.returncode, out, err, rusage, killed)
+
+
+# scripts of the workflow run the current thread works for
+_local = threading.local()
+
+
+class ScriptGroups(object):
+    """ Scripts running on behalf of one workflow run, killed all at once
+    when the run is cancelled
+
+    Only scripts run by run_command in threads of this process and by
+    leappwf.aio.run_script_async given these groups are known
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._killers = set()
+        self.cancelled = False
+
+    def runner(self, runner):
+        """ Return runner whose scripts belong to these groups """
+        def run(script, inports_file, inports_data=None, limits=None):
+            outer = getattr(_local, 'groups', None)
+            _local.groups = self
+            try:
+                return runner(script, inports_file, inports_data, limits)
+            finally:
+                _local.groups = outer
+        return run
+
+    def add(self, killer):
+        """ Add killer of a started script """
+        with self._lock:
+            self._killers.add(killer)
+            cancelled = self.cancelled
+        if cancelled:
+            killer.kill(CANCELLED)
+
+    def discard(self, killer):
+        """ Forget killer of a reaped script """
+        with self._lock:
+            self._killers.discard(killer)
+
+    def cancel(self):
+        """ Kill running scripts and any started later """
+        with self._lock:
+            self.cancelled = True
+            killers = list(self._killers)
+        for killer in killers:
+            killer.kill(CANCELLED)
+
+
+def prereq_error(inportargs):
+    """ Return PrereqError for the first message of a failed required actor
+    among inport values, None if there is none """
+    for arg in inportargs:
+        if isinstance(arg, MsgType) and arg.errorinfo:
+            return PrereqError("required actor failed",
+                               arg.srcname,
+                               arg.errorinfo)
+    return None
+
+
+def failed(res):
+    """ Return True if outports messages of actor report an error """
+    msgs = res if isinstance(res, tuple) else (res,)
+    return any(getattr(msg, 'errorinfo', None) for msg in msgs)
+
+
 class AnnotatedFuncActor(FuncActor):
     def __init__(self,
                  func,
@@ -42,28 +235,54 @@ class AnnotatedFuncActor(FuncActor):
         for opn in self.outports.keys():
             self.outports[opn].annotation = outports_annotations[opn]
 
+    # failure of actor cancels the rest of the workflow run
+    fail_fast = False
+    # share of workflow run budget taken while actor runs
+    weight = 1
+    # names of resources no other actor may use while actor runs
+    locks = ()
+
+    def execute(self, inportargs, runner=None):
+        """ Call actor function directly, outside of wowp scheduling """
+        return self.func(*inportargs)
+
+    def skip(self, inportargs, cancelled_by=None):
+        """ Return outports messages of actor not to be run, None if it has
+        to run """
+        return None
+
 
 class DirAnnotatedShellActor(AnnotatedFuncActor):
     inports_data_path = '~/.leappwf/actors_inport'
     outports_key = 'outports'
+    # bytes of script stdout or stderr kept in memory, the rest is spilled
+    # to a temporary file
+    output_spill_size = 1024 * 1024
+    # seconds after which scripts of actors without timeout of their own
+    # are killed, None is no limit
+    default_timeout = None
 
-    def _default_prefunc(self, inports, inportargs):
-        """ Default function to run before main script """
-        logging.debug("[RUNNING] [pre] (default): %s", self.name)
+    def _inports_data(self, inports, inportargs):
+        """ Return payloads of required actors keyed by inport name """
+        err = prereq_error(inportargs)
+        if err is not None:
+            raise err
 
         inports_data = {}
         for arg in inportargs:
             if isinstance(arg, MsgType):
-                if arg.errorinfo:
-                    raise PrereqError("required actor failed",
-                                      arg.srcname,
-                                      arg.errorinfo)
-
                 if isinstance(arg, ShellCommandStatus) and arg.payload:
                     for port, portannotation in inports.items():
                         if isinstance(arg, portannotation.annotation.msgtype):
                             inports_data.update({port: arg.payload})
                             break
+        return inports_data
+
+    def _default_prefunc(self, inports, inportargs):
+        """ Default function to run before main script """
+        logging.debug("[RUNNING] [pre] (default): %s", self.name)
+
+        inports_data = self._inports_data(inports, inportargs)
 
         inports_file = ''
         if inports_data:
@@ -75,66 +294,329 @@ class DirAnnotatedShellActor(AnnotatedFuncActor):
                                     err)
 
             try:
-                inports_file = os.path.join(
-                    os.path.expanduser(self.inports_data_path),
-                    self.name + '_in.json')
+                # unique per execution, so parallel runs do not clash
+                fd, inports_file = tempfile.mkstemp(
+                    prefix=self.name + '_',
+                    suffix='_in.json',
+                    dir=os.path.expanduser(self.inports_data_path))
 
-                with open(inports_file, 'w') as infile:
+                with os.fdopen(fd, 'w') as infile:
                     json.dump(inports_data, infile)
-            except IOError as err:
+            except (IOError, OSError) as err:
                 logging.warning("Failed to write actor inports data: %s",
                                 err)
         return inportargs, inports_file
 
+    def _stdin_prefunc(self, inports, inportargs):
+        """ Function to run before main script reading inports from stdin
+
+        Inports data document is passed to the script instead of a file
+        """
+        logging.debug("[RUNNING] [pre] (stdin): %s", self.name)
+
+        inports_data = self._inports_data(inports, inportargs)
+        return json.dumps(inports_data).encode('utf-8'), ''
+
+    def _remove_inports_file(self, inports_file):
+        """ Remove inports data file written by _default_prefunc """
+        if os.path.dirname(inports_file) != \
+                os.path.expanduser(self.inports_data_path):
+            return
+
+        try:
+            os.remove(inports_file)
+        except OSError as err:
+            logging.warning("Failed to remove actor inports data: %s", err)
+
     def _default_postfunc(self, res):
         """ Default function to run after main script """
         logging.debug("[RUNNING] [post] (default): %s", self.name)
 
-        outports_data = {}
+        # only outports are decoded, whatever else script printed is not
+        with open_output(res[1]) as stream:
+            outports_data = json_member(stream, self.outports_key)
+        if not isinstance(outports_data, dict):
+            outports_data = {}
+
+        errorinfo = read_output(res[2])
+        return self._outport_msgs(dict((name, (payload, errorinfo))
+                                       for name, payload
+                                       in outports_data.items()),
+                                  errorinfo)
+
+    def _outport_msgs(self, outports, errorinfo=None):
+        """ Return one message for every outport, the only message if actor
+        has one outport, else their tuple in outports order
+
+        outports maps outport names to (payload, errorinfo), outports not in
+        it get no payload and errorinfo
+        """
+        msgs = []
+        for name, port in self.outports.items():
+            payload, port_errorinfo = outports.get(name, (None, errorinfo))
+            msgs.append(port.annotation.msgtype(self.name, port_errorinfo,
+                                                payload))
+        if len(msgs) == 1:
+            return msgs[0]
+        return tuple(msgs)
+
+    @property
+    def script(self):
+        """ Return path to actor's script """
+        return self._script
+
+    @property
+    def inports_stdin(self):
+        """ Return True if script reads inports data from stdin """
+        return self._inports_stdin
+
+    @property
+    def ttl(self):
+        """ Return seconds for which memoized script result stays valid """
+        return self._ttl
+
+    @property
+    def max_output(self):
+        """ Return max bytes of script stdout or stderr (None is no limit) """
+        return self._max_output
+
+    @property
+    def timeout(self):
+        """ Return seconds after which script is killed (None is no limit) """
+        if self._timeout is None:
+            return self.default_timeout
+        return self._timeout
+
+    @property
+    def cpu_time(self):
+        """ Return seconds of CPU time script may use (None is no limit) """
+        return self._cpu_time
+
+    @property
+    def memory(self):
+        """ Return bytes of address space of each script process (None is no
+        limit) """
+        return self._memory
+
+    @property
+    def fail_fast(self):
+        """ Return True if failure of actor cancels the rest of the run """
+        return self._fail_fast
+
+    @property
+    def weight(self):
+        """ Return share of workflow run budget taken while actor runs """
+        return self._weight
+
+    @property
+    def locks(self):
+        """ Return names of resources actor uses exclusively """
+        return self._locks
+
+    @property
+    def limits(self):
+        """ Return limits enforced on script, see leappwf.limits """
+        return {'max_output': self._max_output,
+                'spill_size': self.output_spill_size,
+                TIMEOUT: self.timeout,
+                CPU_TIME: self._cpu_time,
+                MEMORY: self._memory}
+
+    def _recall(self, inports_file, inports_data=None):
+        """ Return (memo key, memoized script result or None) """
+        if self._memo is None:
+            return None, None
+
+        key = self._memo.key(self._script, inports_file, inports_data)
+        return key, self._memo.get(self.name, key, self._ttl)
+
+    def _remember(self, key, res):
+        """ Memoize script result, unless script failed, was killed or its
+        output did not fit in memory
+
+        Failures are not replayed, as they may be transient
+        """
+        if self._memo is not None and res[0] == 0 and not res[2] and \
+                getattr(res, 'killed', None) is None and \
+                all(isinstance(output, bytes) for output in res[1:]):
+            self._memo.put(self.name, key, tuple(res))
+
+    def _phase(self, phase):
+        """ Return context recording actor's phase in run trace """
+        if self._trace is None:
+            return nophase()
+        return self._trace.phase(self.name, phase)
+
+    def _phase_done(self, phase, start):
+        """ Record actor's phase started at start and ending now in run
+        trace """
+        if self._trace is not None:
+            self._trace.add_phase(self.name, phase, start, time.time())
+
+    def _record_run(self, started, res):
+        """ Record duration and outcome of script run in run statistics """
+        if self._stats is not None:
+            self._stats.add(self.name, self._script, time.time() - started,
+                            res[0] != 0 or
+                            getattr(res, 'killed', None) is not None)
+
+    def _replay(self, inportargs):
+        """ Return (journal keys, outports messages replayed from run
+        journal or None) """
+        if self._journal is None:
+            return None, None
+        try:
+            keys = (file_key(self._script), inputs_key(inportargs))
+        except (IOError, OSError):
+            # script is gone, running it reports that
+            return None, None
+
+        outports = self._journal.replay(self.name, *keys)
+        if outports is None or set(outports) != set(self.outports.keys()):
+            return keys, None
+
+        logging.debug("[REPLAYED]: %s", self.name)
+        return keys, self._outport_msgs(outports)
+
+    def _record(self, keys, res):
+        """ Append outports messages of completed actor to run journal """
+        if keys is None:
+            return
+        msgs = res if isinstance(res, tuple) else (res,)
+        self._journal.record(self.name, keys[0], keys[1],
+                             dict((name, (msg.payload, msg.errorinfo))
+                                  for name, msg in zip(self.outports.keys(),
+                                                       msgs)))
+
+    def execute(self, inportargs, runner=None):
+        """ Run actor with given inport values
+
+        runner is a callable with the same signature as run_script, used
+        to delegate script execution (e.g. to a process pool)
+        """
+        res, call = self.prepare(inportargs)
+        if call is None:
+            return res
+        if call.result is not None:
+            return self.finish(call)
+
         try:
-            json_data = json.loads(res[1])
-            if isinstance(json_data, dict) and self.outports_key in json_data:
-                outports_data = json_data[self.outports_key]
-        except ValueError:
-            pass
-
-        payload = None
-        if self.outports.keys()[0] in outports_data:
-            payload = outports_data[self.outports.keys()[0]]
-
-        return self.outports.values()[0].annotation.msgtype(self.name,
-                                                            res[2],
-                                                            payload)
-
-    def _execfunc(self, _, inports_file):
-        """ Method that should be executed by actor"""
-        logging.debug("[RUNNING]: %s", self.name)
-
-        child = Popen(['sudo', self._script, inports_file],
-                      stdin=PIPE,
-                      stdout=PIPE,
-                      stderr=PIPE)
-        out, err = child.communicate()
-        return (child.returncode, out, err)
-
-    def _allfunc(self, *inportargs):
+            res = (runner or run_script)(*call.args)
+        except Exception as ee:
+            return self.finish(call, error=ee)
+        return self.finish(call, res)
+
+    def prepare(self, inportargs):
+        """ Prepare run of actor with given inport values
+
+        Return (outports messages, None) if actor is done without running
+        its script: replayed from run journal or failed before the script.
+        Otherwise return (None, ScriptCall), the script is to be run with
+        the call's args, unless the call has a memoized result, and the
+        call passed to finish()
+        """
+        keys, res = self._replay(inportargs)
+        if res is not None:
+            return res, None
+
         try:
-            preres, inports_file = self._prefunc(self.inports, inportargs)
-            try:
-                res = self._execfunc(preres, inports_file)
-            except Exception as ee:
-                raise ScriptError("failed", "script execution failed", ee)
+            with self._phase('pre'):
+                preres, inports_file = self._prefunc(self.inports,
+                                                     inportargs)
+        except ActorError as ae:
+            res = self._errorres(ae)
+            self._record(keys, res)
+            return res, None
+
+        inports_data = preres if self._inports_stdin else None
+        call = ScriptCall((self._script, inports_file, inports_data,
+                           self.limits), keys)
+        try:
+            call.memo_key, call.result = self._recall(inports_file,
+                                                      inports_data)
+        except Exception as ee:
+            return self.finish(call, error=ee), None
+
+        if call.result is not None:
+            logging.debug("[CACHED]: %s", self.name)
+        else:
+            logging.debug("[RUNNING]: %s", self.name)
+        return None, call
+
+    def finish(self, call, res=None, error=None):
+        """ Return outports messages of actor whose script, run as prepared
+        by call, returned res or raised error
+
+        The inports data file of the call is removed and script result
+        is memoized and recorded in run statistics, trace and journal
+        """
+        self._remove_inports_file(call.args[1])
+        if error is None and call.result is not None:
+            res = call.result
+        elif error is None:
+            if self._memo is not None:
+                self._memo.executed.add(self.name)
+            self._remember(call.memo_key, res)
+            self._record_run(call.started, res)
+        self._phase_done('script', call.started)
 
+        if error is not None:
+            msgs = self._errorres(ScriptError("failed",
+                                              "script execution failed",
+                                              error))
+        else:
+            if self._trace is not None:
+                self._trace.set_rusage(self.name,
+                                       getattr(res, 'rusage', None))
+            msgs = self._finish(res)
+        self._record(call.keys, msgs)
+        return msgs
+
+    def skip(self, inportargs, cancelled_by=None):
+        """ Return outports messages if a required actor failed or the run
+        was cancelled by failure of actor cancelled_by, None if actor has to
+        run """
+        err = prereq_error(inportargs)
+        if err is None and cancelled_by is not None:
+            err = CancelError(cancelled_by)
+        if err is None:
+            return None
+
+        logging.debug("[SKIPPED]: %s", self.name)
+        return self._errorres(err)
+
+    def _check_result(self, res):
+        """ Raise ActorError if script was killed or its output was too
+        large """
+        killed = getattr(res, 'killed', None)
+        if killed == CANCELLED:
+            raise ScriptError("cancelled", "script killed, run cancelled",
+                              None)
+        if killed in _LIMIT_ERRORS:
+            raise ScriptError("failed", _LIMIT_ERRORS[killed],
+                              {killed: self.limits[killed]})
+
+        for stream, output in zip(('stdout', 'stderr'), res[1:]):
+            if oversized(output):
+                raise OutputLimitError(stream, output['size'],
+                                       output['limit'])
+
+    def _finish(self, res):
+        """ Return outports messages for script result and remove files
+        its output was spilled to """
+        try:
+            self._check_result(res)
+            with self._phase('post'):
+                return self._postfunc(res)
         except ActorError as ae:
-            if len(self.outports) == 1:
-                excres = self.outports.at(0).annotation.msgtype(self.name,
-                                                                ae,
-                                                                None)
-            else:
-                excres = tuple(port.annotation.msgtype(self.name, ae, None) for port in self.outports)
-            return excres
+            return self._errorres(ae)
+        finally:
+            for output in res[1:]:
+                remove_output(output)
 
-        return self._postfunc(res)
+    def _errorres(self, ae):
+        """ Return outports messages reporting actor error """
+        return self._outport_msgs({}, ae)
 
     def __init__(self,
                  name,
@@ -144,13 +626,43 @@ class DirAnnotatedShellActor(AnnotatedFuncActor):
                  inports=None,
                  inports_annotation=None,
                  outports=None,
-                 outports_annotation=None):
+                 outports_annotation=None,
+                 memo=None,
+                 ttl=None,
+                 inports_stdin=False,
+                 trace=None,
+                 max_output=None,
+                 timeout=None,
+                 fail_fast=False,
+                 cpu_time=None,
+                 memory=None,
+                 weight=1,
+                 locks=(),
+                 journal=None,
+                 stats=None):
 
-        self._prefunc = self._default_prefunc
+        self._inports_stdin = inports_stdin
+        if inports_stdin:
+            self._prefunc = self._stdin_prefunc
+        else:
+            self._prefunc = self._default_prefunc
         self._postfunc = self._default_postfunc
         self._script = script
+        self._memo = memo
+        self._ttl = ttl
+        self._trace = trace
+        self._max_output = max_output
+        self._timeout = timeout
+        self._cpu_time = cpu_time
+        self._memory = memory
+        self._weight = weight
+        self._locks = frozenset(locks)
+        self._journal = journal
+        self._stats = stats
+        self._fail_fast = fail_fast
 
-        super(DirAnnotatedShellActor, self).__init__(self._allfunc,
+        # scripts are run by execute(), there is no actor function
+        super(DirAnnotatedShellActor, self).__init__(None,
                                                      args, kwargs,
                                                      name,
                                                      inports,
@@ -0,0 +1,166 @@
+""" Run actors on asyncio event loop (Python 3 only) """
+
+import asyncio
+import logging
+
+from .actor import (
+    DirAnnotatedShellActor,
+    ScriptGroups,
+    ScriptResult,
+    script_cmd)
+from .limits import (
+    CANCELLED,
+    ScriptKiller,
+    exceeded,
+    output_limits,
+    preexec)
+from .output import READ_SIZE, OutputCapture
+from .workflow import Dispatch
+
+
+async def _readstream(stream, script, label, limits):
+    """ Read stream as data arrives and return captured output """
+    output = OutputCapture(*output_limits(limits))
+    while True:
+        chunk = await stream.read(READ_SIZE)
+        if not chunk:
+            break
+        logging.debug("[%s] %s: %d bytes", label, script, len(chunk))
+        output.write(chunk)
+    return output.result()
+
+
+async def _drain(stream):
+    """ Read stream to its end, throwing data away """
+    while await stream.read(READ_SIZE):
+        pass
+
+
+async def _feedstream(stream, data):
+    """ Write data to stream and close it """
+    try:
+        stream.write(data)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # script does not care about its input
+        pass
+    stream.close()
+
+
+async def run_script_async(script, inports_file, inports_data=None,
+                           limits=None, groups=None):
+    """ Run actor script in asyncio subprocess
+
+    Return ScriptResult as run_script does. Script is killed when the
+    coroutine is cancelled or when groups (ScriptGroups), if given, are
+    cancelled
+    """
+    child = await asyncio.create_subprocess_exec(
+        *script_cmd(script, inports_file, inports_data),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        preexec_fn=preexec(limits))
+    killer = ScriptKiller(child.pid, (limits or {}).get('timeout'))
+    if groups is not None:
+        groups.add(killer)
+    try:
+        out, err, _ = await asyncio.gather(
+            _readstream(child.stdout, script, 'stdout', limits),
+            _readstream(child.stderr, script, 'stderr', limits),
+            _feedstream(child.stdin, inports_data or b''))
+        await child.wait()
+    except asyncio.CancelledError:
+        killer.kill(CANCELLED)
+        await asyncio.gather(_drain(child.stdout), _drain(child.stderr),
+                             child.wait())
+        raise
+    except BaseException:
+        # interrupted, e.g. by Ctrl-C, which the script in a session of its
+        # own does not get
+        killer.kill(CANCELLED)
+        raise
+    finally:
+        killer.close()
+        if groups is not None:
+            groups.discard(killer)
+    killed = killer.reason or exceeded(limits, child.returncode)
+    return ScriptResult(child.returncode, out, err, killed=killed)
+
+
+async def execute_actor(actor, inportargs, runner=run_script_async):
+    """ Run actor with given inport values awaiting its script
+
+    Same as DirAnnotatedShellActor.execute, runner is a coroutine function
+    with the signature of run_script_async
+    """
+    if not isinstance(actor, DirAnnotatedShellActor):
+        return actor.execute(inportargs)
+
+    res, call = actor.prepare(inportargs)
+    if call is None:
+        return res
+    if call.result is not None:
+        return actor.finish(call)
+
+    try:
+        res = await runner(*call.args)
+    except asyncio.CancelledError as ee:
+        # clean up after the call, task goes on being cancelled
+        actor.finish(call, error=ee)
+        raise
+    except Exception as ee:
+        return actor.finish(call, error=ee)
+    return actor.finish(call, res)
+
+
+async def finishing(coro, func, done=None):
+    """ Await coroutine, calling func once it is done and done with its
+    result if it succeeded """
+    try:
+        result = await coro
+        if done is not None:
+            done(result)
+        return result
+    finally:
+        func()
+
+
+async def run_workflow(workflow, max_concurrency=None, budget=None,
+                       durations=None):
+    """ Execute workflow running actors dispatched (see Dispatch) as
+    asyncio tasks
+
+    Failure of a fail-fast actor kills scripts still running
+    """
+    plan = workflow.compile()
+    groups = ScriptGroups()
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency \
+        else None
+
+    async def runner(script, inports_file, inports_data=None, limits=None):
+        if semaphore is None:
+            return await run_script_async(script, inports_file,
+                                          inports_data, limits, groups)
+        async with semaphore:
+            return await run_script_async(script, inports_file,
+                                          inports_data, limits, groups)
+
+    dispatch = Dispatch(workflow, plan,
+                        max_concurrency if budget is None else budget,
+                        durations)
+    running = {}
+    while dispatch.pending or running:
+        for actor, args in dispatch.ready():
+            task = asyncio.ensure_future(execute_actor(actor, args, runner))
+            running[task] = actor
+        if not running:
+            continue
+
+        finished, _ = await asyncio.wait(running,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            if dispatch.finished(running.pop(task), task.result()):
+                groups.cancel()
+
+    return dispatch.results()
@@ -0,0 +1,143 @@
+""" Keep parsed actors data on disk between runs """
+
+import hashlib
+import logging
+import os
+import pickle
+
+try:
+    from os import scandir
+except ImportError:
+    # Python 2
+    scandir = None
+
+from .version import __version__
+
+
+def _filestat(path):
+    """ Return (mtime, size) of file or None if it does not exist """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def signature(actor_path, files=()):
+    """ Return stats of all files in actor dir and of other given files """
+    stats = {}
+    if scandir is None:
+        for entry in os.listdir(actor_path):
+            path = os.path.join(actor_path, entry)
+            stats[path] = _filestat(path)
+    else:
+        for entry in scandir(actor_path):
+            try:
+                stat = entry.stat()
+            except OSError:
+                stats[entry.path] = None
+            else:
+                stats[entry.path] = (stat.st_mtime, stat.st_size)
+    for path in files:
+        if path not in stats:
+            stats[path] = _filestat(path)
+    return stats
+
+
+def valid(entry, path):
+    """ Return True if cache entry of actor in path is still valid """
+    return signature(path, entry[0]) == entry[0]
+
+
+class ActorCache(object):
+    """ On-disk cache of parsed actors data and their classes definitions
+
+    An entry is valid as long as the set of files in the actor dir and
+    mtime and size of each of them (and of any port description referenced
+    from outside the dir) stay the same
+    """
+    cache_data_path = '~/.leappwf/actors_cache'
+
+    def __init__(self, actors_path):
+        digest = hashlib.sha1(os.path.abspath(actors_path).encode('utf-8'))
+        self._cache_file = os.path.join(
+            os.path.expanduser(self.cache_data_path),
+            digest.hexdigest() + '.pickle')
+        self._entries = {}
+        self._seen = {}
+
+    @property
+    def cache_file(self):
+        """ Return path to cache file """
+        return self._cache_file
+
+    def load(self, rescan=False):
+        """ Read cache file, any error just leaves the cache empty
+
+        With rescan the cache file is ignored and all entries get replaced
+        """
+        self._entries = {}
+        self._seen = {}
+        if rescan:
+            return
+
+        try:
+            with open(self.cache_file, 'rb') as stream:
+                version, entries = pickle.load(stream)
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError) as err:
+            logging.debug("actors cache not loaded: %s", err)
+            return
+
+        if version == __version__:
+            self._entries = entries
+
+    def entry(self, name):
+        """ Return cached entry of actor, None if there is none
+
+        Entries are checked by valid() and kept by use(), get() does both
+        """
+        return self._entries.get(name)
+
+    def use(self, name):
+        """ Keep valid entry of actor """
+        self._seen[name] = self._entries[name]
+
+    def get(self, name, path):
+        """ Return (actor_data, classes_data) if cached entry is valid """
+        entry = self.entry(name)
+        if entry is None or not valid(entry, path):
+            return None
+
+        self.use(name)
+        _, actor_data, classes_data = entry
+        return actor_data, classes_data
+
+    def put(self, actor_data, classes_data, files=(), stats=None):
+        """ Store parsed actor data and classes defined by given files
+
+        stats are signature() of actor dir and files, if already taken
+        """
+        if stats is None:
+            stats = signature(actor_data.path, files)
+        self._seen[actor_data.name] = (stats, actor_data, classes_data)
+
+    def save(self, prune=True):
+        """ Write entries used by this scan, dropping all others unless
+        prune is False (only part of actors was scanned) """
+        entries = self._seen
+        if not prune:
+            entries = dict(self._entries)
+            entries.update(self._seen)
+
+        cache_dir = os.path.dirname(self.cache_file)
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmp_file, 'wb') as stream:
+                pickle.dump((__version__, entries), stream,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self.cache_file)
+        except (IOError, OSError, pickle.PicklingError) as err:
+            logging.warning("Failed to write actors cache: %s", err)
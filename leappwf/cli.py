@@ -0,0 +1,165 @@
+""" Command line interface of LeApp Workflow module
+
+Modules loading actors and running them are imported by commands only, so
+that the interpreter is up and parsing arguments as soon as possible.
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+# workflow run modes, not imported from leappwf.workflow which pulls in the
+# whole actors machinery
+_MODES = ('serial', 'thread', 'process', 'async')
+
+
+def _leapp(args, **kwargs):
+    """ Return LeAppWorkflow with actors of args loaded """
+    from .run import LeAppWorkflow
+
+    leapp = LeAppWorkflow(args.actors_path, cache=not args.no_cache,
+                          **kwargs)
+    leapp.load_actors(targets=args.targets)
+    return leapp
+
+
+def _print_results(results):
+    for actor, data in sorted(results.items()):
+        print("* {}:".format(actor))
+        if data['errorinfo']:
+            print("\t[errorinfo]: {}".format(data['errorinfo']))
+        else:
+            print("\t[OK]")
+
+
+def _cancel_tasks(loop):
+    """ Cancel tasks left on loop by an interrupted run, so that their
+    scripts are killed """
+    import asyncio
+
+    all_tasks = getattr(asyncio, 'all_tasks', None)
+    tasks = [task for task in (all_tasks or asyncio.Task.all_tasks)(loop)
+             if not task.done()]
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+def _error(message):
+    """ Report error the way argparse does, return exit code for it """
+    sys.stderr.write("leappwf: error: {}\n".format(message))
+    return 2
+
+
+def list_actors(args):
+    """ Print names of actors, with targets just of those they require """
+    try:
+        workflow = _leapp(args).required(args.targets)
+    except ValueError as err:
+        return _error(err)
+    for name in sorted(workflow.actors):
+        print(name)
+    return 0
+
+
+def run_actors(args):
+    """ Run actors and print their results, return 1 if any failed """
+    leapp = _leapp(args, journal=args.journal or args.resume,
+                   stats=args.stats, results=args.results)
+    try:
+        leapp.required(args.targets)
+    except ValueError as err:
+        return _error(err)
+
+    if args.mode == 'async':
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(leapp.run_actors_async(
+                args.max_workers, args.targets, args.budget, args.resume))
+        except BaseException:
+            _cancel_tasks(loop)
+            raise
+        finally:
+            loop.close()
+    else:
+        results = leapp.run_actors(args.mode, args.max_workers,
+                                   args.sudo_workers, args.targets,
+                                   args.budget, args.resume)
+
+    from .results import jsonable_results
+
+    results = jsonable_results(results)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, separators=(',', ': '),
+                  sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        _print_results(results)
+    return 1 if any(data['errorinfo'] for data in results.values()) else 0
+
+
+def parser():
+    """ Return parser of command line arguments """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('actors_path')
+    # not nargs='+', which would take actors_path following the names
+    common.add_argument('--targets', action='append',
+                        metavar='ACTOR[,ACTOR...]',
+                        help='just these actors and actors they require, '
+                        'comma separated, may be repeated')
+    common.add_argument('--no-cache', action='store_true',
+                        help='parse every actor, ignoring actors cache')
+    common.add_argument('--quiet', action='store_true',
+                        help='log errors only')
+
+    main_parser = argparse.ArgumentParser(
+        prog='leappwf', description=__doc__.splitlines()[0])
+    commands = main_parser.add_subparsers(dest='command')
+    commands.required = True
+
+    list_parser = commands.add_parser('list', parents=[common],
+                                      help=list_actors.__doc__.strip())
+    list_parser.set_defaults(func=list_actors)
+
+    run_parser = commands.add_parser('run', parents=[common],
+                                     help=run_actors.__doc__.strip())
+    run_parser.add_argument('--mode', default='serial', choices=_MODES)
+    run_parser.add_argument('--max-workers', type=int,
+                            help='max actors run at once')
+    run_parser.add_argument('--sudo-workers', type=int, default=0,
+                            help='privileged helpers executing scripts, '
+                            'not in async mode')
+    run_parser.add_argument('--budget', type=float,
+                            help='max weight of actors run at once')
+    run_parser.add_argument('--journal', action='store_true',
+                            help='journal completed actors')
+    run_parser.add_argument('--resume', action='store_true',
+                            help='resume last journaled run')
+    run_parser.add_argument('--stats', action='store_true',
+                            help='record durations, run slow chains first')
+    run_parser.add_argument('--results', action='store_true',
+                            help='store results in results database')
+    run_parser.add_argument('--json', action='store_true',
+                            help='print results as JSON')
+    run_parser.set_defaults(func=run_actors)
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    args = main_parser.parse_args(argv)
+    if getattr(args, 'mode', None) == 'async' and args.sudo_workers:
+        main_parser.error("--sudo-workers cannot be used with --mode async")
+    if args.targets is not None:
+        args.targets = [name for names in args.targets
+                        for name in names.split(',') if name]
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=logging.ERROR if args.quiet else logging.INFO)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
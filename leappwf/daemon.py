@@ -0,0 +1,226 @@
+""" Keep actors loaded and run them on requests over a Unix socket
+
+Requests and responses are JSON documents, one per line. A request is
+{"targets": [actor names]} to run just these actors and their
+prerequisites, or {} to run all actors. A response is {"results": {...}}
+with payload and errorinfo of each actor run, or {"error": message}.
+"""
+
+import argparse
+import errno
+import json
+import logging
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import Future
+
+import six
+from six.moves import queue, socketserver
+
+from .results import jsonable_results
+from .run import LeAppWorkflow
+from .workflow import SERIAL, THREAD, PROCESS
+
+# queued to stop the worker
+_STOP = object()
+
+
+def _request_targets(request):
+    """ Return targets of request document, raise ValueError if it is not
+    a valid request """
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    targets = request.get('targets')
+    if targets is not None and not (
+            isinstance(targets, list) and
+            all(isinstance(name, six.string_types) for name in targets)):
+        raise ValueError("targets must be a list of actor names")
+    return targets
+
+
+def _remove_stale_socket(socket_path):
+    """ Remove socket left behind by a daemon which is gone
+
+    Raise IOError if a daemon still listens on the socket or the path is
+    not a socket
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except OSError as err:
+        if err.errno == errno.ENOENT:
+            return
+        raise
+    if not stat.S_ISSOCK(mode):
+        raise IOError("{} is not a socket".format(socket_path))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error as err:
+        if err.errno != errno.ECONNREFUSED:
+            raise
+        os.remove(socket_path)
+        return
+    finally:
+        sock.close()
+    raise IOError("a daemon is listening on {}".format(socket_path))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """ Answer requests of one connection """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                targets = _request_targets(json.loads(line.decode('utf-8')))
+                results = self.server.workflow_daemon.run(targets)
+                response = {'results': jsonable_results(results)}
+            except Exception as err:
+                logging.warning("request failed: %s", err)
+                response = {'error': str(err)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class WorkflowDaemon(object):
+    """ Actors loaded once and run on requests
+
+    Requests are run one at a time. A request waiting for its run is
+    joined by any other request for the same actors arriving meanwhile.
+    Before each run, actors changed in the actors directory meanwhile are
+    loaded again, leaving the others as they are.
+    """
+
+    def __init__(self, path, socket_path, mode=THREAD, max_workers=None):
+        self._path = path
+        self._socket_path = socket_path
+        self._mode = mode
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        # futures of queued runs by their targets
+        self._queued = {}
+        self._server = None
+        self._leapp = LeAppWorkflow(path)
+        self._leapp.watch()
+        self._leapp.load_actors()
+        self._leapp.workflow.compile()
+        logging.info("loaded %d actors from %s",
+                     len(self._leapp.workflow.actors), path)
+
+    @property
+    def leapp(self):
+        """ Return currently loaded LeAppWorkflow """
+        return self._leapp
+
+    def reload(self):
+        """ Load again actors changed meanwhile, return their names
+
+        Only to be called from the worker running requests, or while it is
+        not running
+        """
+        try:
+            names = self._leapp.reload()
+        except Exception as err:
+            logging.warning("reloading actors failed: %s", err)
+            return set()
+        if names:
+            logging.info("reloaded actors %s", ', '.join(sorted(names)))
+        return names
+
+    def run(self, targets=None):
+        """ Queue run of targets (all actors if None), return its results """
+        if isinstance(targets, six.string_types):
+            raise ValueError("targets must be a list of actor names")
+        key = None if targets is None else tuple(sorted(set(targets)))
+        with self._lock:
+            future = self._queued.get(key)
+            if future is None:
+                future = self._queued[key] = Future()
+                self._queue.put(key)
+        return future.result()
+
+    def _work(self):
+        """ Run queued requests until stopped """
+        while True:
+            key = self._queue.get()
+            if key is _STOP:
+                break
+            with self._lock:
+                future = self._queued.pop(key)
+            self.reload()
+            try:
+                targets = None if key is None else list(key)
+                future.set_result(self._leapp.run_actors(
+                    self._mode, self._max_workers, targets=targets))
+            except Exception as err:
+                future.set_exception(err)
+
+    def serve_forever(self):
+        """ Answer requests on socket until shutdown()
+
+        Raise IOError if another daemon is listening on the socket
+        """
+        _remove_stale_socket(self._socket_path)
+        self._server = _Server(self._socket_path, _RequestHandler)
+        self._server.workflow_daemon = self
+        worker = threading.Thread(target=self._work)
+        worker.daemon = True
+        worker.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._queue.put(_STOP)
+            self._server.server_close()
+            os.remove(self._socket_path)
+
+    def shutdown(self):
+        """ Stop serve_forever, from another thread """
+        self._server.shutdown()
+
+
+def request(socket_path, targets=None):
+    """ Ask daemon listening on socket_path to run targets
+
+    Return the response document
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        stream = sock.makefile('rwb')
+        msg = {} if targets is None else {'targets': list(targets)}
+        stream.write(json.dumps(msg).encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline().decode('utf-8'))
+    finally:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('actors_path')
+    parser.add_argument('socket_path')
+    parser.add_argument('--mode', default=THREAD,
+                        choices=(SERIAL, THREAD, PROCESS))
+    parser.add_argument('--max-workers', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=logging.INFO)
+    try:
+        WorkflowDaemon(args.actors_path, args.socket_path, args.mode,
+                       args.max_workers).serve_forever()
+    except IOError as err:
+        parser.exit(1, "{}: {}\n".format(parser.prog, err))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+""" Run actor scripts through long-lived privileged helpers """
+
+import logging
+import os
+import sys
+import threading
+from subprocess import Popen, PIPE
+
+from six.moves import queue
+
+from . import sudohelper
+from .actor import ScriptResult
+
+
+class PrivilegedExecutor(object):
+    """ Pool of sudo launched helpers executing actor scripts
+
+    Spawning sudo for every actor is replaced by a single sudo call per
+    helper. Instances are callable with run_script signature, so they can be
+    used as script runner of a workflow run. Use as context manager to
+    stop helpers once the run is over.
+    """
+    helper_script = os.path.splitext(sudohelper.__file__)[0] + '.py'
+
+    def __init__(self, workers=1):
+        self._idle = queue.Queue()
+        self._helpers = []
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        """ Start new helper """
+        helper = Popen(['sudo', sys.executable, self.helper_script],
+                       stdin=PIPE,
+                       stdout=PIPE)
+        with self._lock:
+            self._helpers.append(helper)
+        return helper
+
+    def _replace(self, helper):
+        """ Kill broken helper and make a new one available """
+        with self._lock:
+            self._helpers.remove(helper)
+        try:
+            helper.kill()
+        except OSError:
+            pass
+        helper.wait()
+        self._idle.put(self._spawn())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __call__(self, script, inports_file, inports_data=None, limits=None):
+        """ Run script in an idle helper, return its ScriptResult """
+        helper = self._idle.get()
+        try:
+            sudohelper.write_msg(helper.stdin,
+                                 (script, inports_file, inports_data,
+                                  limits))
+            response = sudohelper.read_msg(helper.stdout)
+        except (IOError, OSError) as err:
+            self._replace(helper)
+            raise IOError("privileged helper failed: {}".format(err))
+        if response is None:
+            self._replace(helper)
+            raise IOError("privileged helper exited unexpectedly")
+
+        self._idle.put(helper)
+        err, res = response
+        if err is not None:
+            raise err
+        returncode, out, err, killed = res
+        return ScriptResult(returncode, out, err, killed=killed)
+
+    def close(self):
+        """ Stop all helpers """
+        with self._lock:
+            helpers, self._helpers = self._helpers, []
+        for helper in helpers:
+            try:
+                helper.stdin.close()
+            except (IOError, OSError) as err:
+                logging.debug("closing privileged helper: %s", err)
+            helper.wait()
@@ -0,0 +1,206 @@
+""" Run one workflow against many hosts """
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from six.moves import shlex_quote
+
+from .actor import run_command, run_script
+from .results import ResultsStore
+from .run import LeAppWorkflow
+from .workflow import THREAD
+
+# Writes inports data from stdin to a file on the host for the script
+_INPORTS_FILE_CMD = ('f=$(mktemp) && cat > "$f" && sudo {script} "$f"; '
+                     'rc=$?; rm -f "$f"; exit $rc')
+
+
+class LocalTransport(object):
+    """ Run actor scripts on this machine, whatever the host """
+
+    def runner(self, host):
+        """ Return script runner for host """
+        return run_script
+
+    def close(self):
+        """ Release resources held for hosts """
+        pass
+
+
+class CommandTransport(object):
+    """ Run actor scripts through a command taking a shell command line as
+    its last argument, the way ssh does
+
+    '{host}' in command items is replaced by the host. Actor scripts are
+    expected at the same paths on hosts, inports data are sent over stdin.
+    E.g. CommandTransport(['sh', '-c']) runs everything locally
+    """
+
+    def __init__(self, command):
+        self._command = list(command)
+
+    def command(self, host):
+        """ Return command for host """
+        return [item.replace('{host}', host) for item in self._command]
+
+    def close(self):
+        """ Release resources held for hosts """
+        pass
+
+    @staticmethod
+    def _cmdline(script, inports_file, inports_data):
+        """ Return (shell command line, data for its stdin) """
+        if inports_data is not None:
+            return 'sudo ' + shlex_quote(script), inports_data
+        if not inports_file:
+            return 'sudo {} {}'.format(shlex_quote(script),
+                                       shlex_quote(inports_file)), None
+
+        with open(inports_file, 'rb') as stream:
+            data = stream.read()
+        return _INPORTS_FILE_CMD.format(script=shlex_quote(script)), data
+
+    def runner(self, host):
+        """ Return script runner for host """
+        command = self.command(host)
+
+        def run(script, inports_file, inports_data=None, limits=None):
+            cmdline, data = self._cmdline(script, inports_file, inports_data)
+            return run_command(command + [cmdline], data, limits)
+        return run
+
+
+class SSHTransport(CommandTransport):
+    """ Run actor scripts over ssh, keeping one connection per host
+
+    The connection is opened by the first script run on a host and shared
+    by all others until close()
+    """
+
+    def __init__(self, ssh='ssh', options=()):
+        self._ssh = ssh
+        self._control_dir = tempfile.mkdtemp(prefix='leappwf_ssh_')
+        self._control_opts = ['-o', 'ControlPath=' +
+                              os.path.join(self._control_dir, '%C')]
+        self._hosts = set()
+        self._lock = threading.Lock()
+        super(SSHTransport, self).__init__(
+            [ssh, '-o', 'BatchMode=yes',
+             '-o', 'ControlMaster=auto',
+             '-o', 'ControlPersist=yes'] +
+            self._control_opts + list(options) + ['{host}'])
+
+    def runner(self, host):
+        """ Return script runner for host """
+        with self._lock:
+            self._hosts.add(host)
+        return super(SSHTransport, self).runner(host)
+
+    def close(self):
+        """ Close connections to all hosts """
+        with self._lock:
+            hosts, self._hosts = self._hosts, set()
+        with open(os.devnull, 'wb') as devnull:
+            for host in hosts:
+                subprocess.call([self._ssh] + self._control_opts +
+                                ['-O', 'exit', host],
+                                stdout=devnull, stderr=devnull)
+        shutil.rmtree(self._control_dir, ignore_errors=True)
+
+
+def _limited(runner, semaphore):
+    """ Return runner running scripts only while holding semaphore """
+    def run(script, inports_file, inports_data=None, limits=None):
+        with semaphore:
+            return runner(script, inports_file, inports_data, limits)
+    return run
+
+
+class Fleet(object):
+    """ Workflow of actors loaded once and run against many hosts
+
+    Use as context manager to release transport resources (e.g. ssh
+    connections) once done
+    """
+
+    def __init__(self, path, transport=None, cache=True, results=False):
+        self._leapp = LeAppWorkflow(path, cache=cache)
+        self._transport = transport or LocalTransport()
+        self._results = ResultsStore() if results else None
+        self._errors = {}
+
+    @property
+    def leapp(self):
+        """ Return LeAppWorkflow run against hosts """
+        return self._leapp
+
+    @property
+    def errors(self):
+        """ Return dict of hosts whose last run failed to the exception """
+        return self._errors
+
+    @property
+    def results(self):
+        """ Return store of results of past runs, by host """
+        return self._results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Release transport resources """
+        self._transport.close()
+
+    def run(self, hosts, max_hosts=None, max_actors=None, targets=None):
+        """ Run workflow against every host, return dict of host to results
+
+        Actors are loaded (see LeAppWorkflow.required) and wired once, when
+        first needed. At most max_hosts
+        hosts are worked on and at most max_actors scripts run at once
+        (None is no limit). With targets, only these actors and actors they
+        depend on are run. With results store, results of every host are
+        stored as a run against it
+        """
+        workflow = self._leapp.required(targets)
+        # wired once, before hosts share the workflow
+        workflow.compile()
+
+        semaphore = threading.BoundedSemaphore(max_actors) \
+            if max_actors else None
+        hosts = list(hosts)
+        self._errors = {}
+        results = {}
+        pool = ThreadPoolExecutor(max_workers=max_hosts or
+                                  max(len(hosts), 1))
+        try:
+            futures = dict((pool.submit(self._run_host, workflow, host,
+                                        semaphore, max_actors), host)
+                           for host in hosts)
+            for future in as_completed(futures):
+                host = futures[future]
+                try:
+                    results[host] = future.result()
+                except Exception as err:
+                    logging.warning("run on %s failed: %s", host, err)
+                    self._errors[host] = err
+                else:
+                    if self._results:
+                        self._results.add_run(results[host], host)
+        finally:
+            pool.shutdown()
+        return results
+
+    def _run_host(self, workflow, host, semaphore, max_actors):
+        """ Run compiled workflow against host """
+        runner = self._transport.runner(host)
+        if semaphore is not None:
+            runner = _limited(runner, semaphore)
+        return workflow.run(THREAD, max_actors, runner)
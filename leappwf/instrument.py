@@ -0,0 +1,129 @@
+""" Record actors timing and resource usage during workflow runs """
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+# phases of actor execution, in order
+PHASES = ('pre', 'script', 'post')
+
+
+@contextlib.contextmanager
+def nophase():
+    """ Phase context used when actor is not instrumented """
+    yield
+
+
+class RunTrace(object):
+    """ Timestamps and script resource usage of every actor in a run """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._actors = {}
+        self._deps = {}
+
+    def reset(self, deps=None):
+        """ Forget recorded data, deps map actor names to their prereqs """
+        with self._lock:
+            self._actors = {}
+            self._deps = dict(deps or {})
+
+    @property
+    def actors(self):
+        """ Return dict of actor name to its recorded data """
+        return self._actors
+
+    def _actor(self, name):
+        return self._actors.setdefault(name, {'phases': {}, 'rusage': None})
+
+    @contextlib.contextmanager
+    def phase(self, name, phase):
+        """ Record start and end of actor's phase """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, phase, start, time.time())
+
+    def add_phase(self, name, phase, start, end):
+        """ Record actor's phase which ran from start to end, finishing in
+        the current thread """
+        with self._lock:
+            self._actor(name)['phases'][phase] = {
+                'start': start,
+                'end': end,
+                'thread': threading.current_thread().ident}
+
+    def set_rusage(self, name, rusage):
+        """ Record resource usage of actor's script """
+        if rusage is None:
+            return
+        with self._lock:
+            self._actor(name)['rusage'] = {'utime': rusage.ru_utime,
+                                           'stime': rusage.ru_stime,
+                                           'maxrss': rusage.ru_maxrss}
+
+    def _span(self, name):
+        phases = self._actors[name]['phases'].values()
+        return (min(p['start'] for p in phases),
+                max(p['end'] for p in phases))
+
+    def critical_path(self):
+        """ Return names of actors on the chain that determined run time
+
+        Starting from the actor which finished last, follow the prereq
+        which finished last, i.e. the one the actor had to wait for
+        """
+        spans = dict((name, self._span(name)) for name, data
+                     in self._actors.items() if data['phases'])
+        if not spans:
+            return []
+
+        path = [max(spans, key=lambda name: spans[name][1])]
+        while True:
+            deps = [dep for dep in self._deps.get(path[-1], ())
+                    if dep in spans]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda name: spans[name][1]))
+        path.reverse()
+        return path
+
+    def as_dict(self):
+        """ Return recorded data with durations and critical path """
+        actors = {}
+        for name, data in self._actors.items():
+            phases = dict((phase, dict(times,
+                                       duration=times['end'] - times['start']))
+                          for phase, times in data['phases'].items())
+            actors[name] = {'phases': phases, 'rusage': data['rusage']}
+            if phases:
+                start, end = self._span(name)
+                actors[name]['duration'] = end - start
+        return {'actors': actors, 'critical_path': self.critical_path()}
+
+    def to_json(self):
+        """ Return recorded data as JSON """
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+    def to_chrome_trace(self):
+        """ Return recorded data in Chrome trace event format (JSON) """
+        events = []
+        for name, data in self._actors.items():
+            for phase in PHASES:
+                if phase not in data['phases']:
+                    continue
+                times = data['phases'][phase]
+                event = {'name': name,
+                         'cat': phase,
+                         'ph': 'X',
+                         'ts': times['start'] * 1e6,
+                         'dur': (times['end'] - times['start']) * 1e6,
+                         'pid': os.getpid(),
+                         'tid': times['thread']}
+                if phase == 'script' and data['rusage']:
+                    event['args'] = data['rusage']
+                events.append(event)
+        return json.dumps({'traceEvents': events})
@@ -0,0 +1,150 @@
+""" Append-only journal of actors completed in a run, to resume it """
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+
+from .portannotation import MsgType
+
+_HEADER = struct.Struct('>I')
+
+
+def file_key(path):
+    """ Return hash of file contents """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def inputs_key(inportargs):
+    """ Return hash of what actor got from actors it depends on """
+    def describe(arg):
+        if isinstance(arg, MsgType):
+            return [arg.srcname, arg.payload, bool(arg.errorinfo)]
+        if isinstance(arg, dict):
+            return sorted([key, describe(value)]
+                          for key, value in arg.items())
+        return repr(arg)
+
+    data = json.dumps([describe(arg) for arg in inportargs],
+                      sort_keys=True, default=repr)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class RunJournal(object):
+    """ Records of actors completed in the last run
+
+    A record holds payload and errorinfo of every outport of an actor along
+    with hashes of its script and inputs. Records are appended as actors
+    complete and synced to disk at most every sync_interval seconds, so a
+    crash loses only the latest of them. A resumed run replays actors whose
+    record matches their script and inputs and which did not fail
+    """
+    journal_data_path = '~/.leappwf/run_journals'
+    sync_interval = 1.0
+
+    def __init__(self, actors_path):
+        digest = hashlib.sha1(os.path.abspath(actors_path).encode('utf-8'))
+        self._journal_file = os.path.join(
+            os.path.expanduser(self.journal_data_path),
+            digest.hexdigest() + '.journal')
+        self._lock = threading.Lock()
+        self._stream = None
+        self._synced_at = 0
+        self._records = {}
+        self.replayed = set()
+
+    @property
+    def journal_file(self):
+        """ Return path to journal file """
+        return self._journal_file
+
+    def _load(self):
+        """ Read records, return size of journal up to the last whole one """
+        self._records = {}
+        end = 0
+        try:
+            with open(self._journal_file, 'rb') as stream:
+                while True:
+                    header = stream.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    size, = _HEADER.unpack(header)
+                    data = stream.read(size)
+                    if len(data) < size:
+                        break
+                    record = pickle.loads(data)
+                    self._records[record['actor']] = record
+                    end = stream.tell()
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                KeyError, AttributeError, pickle.UnpicklingError) as err:
+            logging.debug("journal read up to %d: %s", end, err)
+        return end
+
+    def start(self, resume=False):
+        """ Start journaling a run, continuing the last one if resume """
+        self.close()
+        self.replayed = set()
+        end = self._load() if resume else 0
+        if not resume:
+            self._records = {}
+
+        dirname = os.path.dirname(self._journal_file)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        self._stream = open(self._journal_file, 'ab')
+        # drop what a crash left of a record being written
+        self._stream.truncate(end)
+        self._stream.seek(end)
+        self._synced_at = time.time()
+
+    def replay(self, name, script_key, inputs_key):
+        """ Return {outport name: (payload, errorinfo)} recorded for actor,
+        None if it has to run """
+        record = self._records.get(name)
+        if record is None or record['script'] != script_key or \
+                record['inputs'] != inputs_key or \
+                any(errorinfo for _, errorinfo in record['outports'].values()):
+            return None
+
+        with self._lock:
+            self.replayed.add(name)
+        return record['outports']
+
+    def record(self, name, script_key, inputs_key, outports):
+        """ Append record of completed actor """
+        try:
+            data = pickle.dumps({'actor': name,
+                                 'script': script_key,
+                                 'inputs': inputs_key,
+                                 'outports': outports},
+                                pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            logging.warning("Failed to journal %s: %s", name, err)
+            return
+
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.write(_HEADER.pack(len(data)) + data)
+            self._stream.flush()
+            if time.time() - self._synced_at >= self.sync_interval:
+                os.fsync(self._stream.fileno())
+                self._synced_at = time.time()
+
+    def close(self):
+        """ Sync and close journal of the run """
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.flush()
+            os.fsync(self._stream.fileno())
+            self._stream.close()
+            self._stream = None
@@ -4,7 +4,6 @@ import json
 import logging
 import os
 import sys
-from jsonschema import exceptions, validate
 
 from .msgtypes import ShellCommandStatus
 from .portannotation import MsgType
@@ -29,6 +28,7 @@ class JSONClassFactory(object):
 
         self._classes_data = {}
         self._classes = {}
+        self._base_classes = {}
 
     def actor_classes(self, src_actor):
         """ Return a list of all generated classes for a src actor """
@@ -39,6 +39,9 @@ class JSONClassFactory(object):
 
     def _parse_json_file(self, namespace, file_path, class_name=None):
         """ Parse and validate JSON file """
+        # jsonschema is slow to import and not needed for cached actors
+        from jsonschema import exceptions, validate
+
         with open(file_path, 'r') as stream:
             try:
                 class_data = json.load(stream)
@@ -65,6 +68,14 @@ class JSONClassFactory(object):
 
         self._classes_data[namespace].append((name, class_data))
 
+    def classes_data(self, namespace):
+        """ Return list of (name, class data) parsed for namespace """
+        return list(self._classes_data.get(namespace, []))
+
+    def add_classes_data(self, namespace, classes_data):
+        """ Add already parsed and validated (name, class data) list """
+        self._classes_data.setdefault(namespace, []).extend(classes_data)
+
     def add_json_class(self, namespace, json_path, class_name=None):
         """ Load and parse provided JSON file with class definition """
         if not json_path.endswith('.json'):
@@ -80,58 +91,91 @@ class JSONClassFactory(object):
 
         return self._classes[src_actor][class_name]
 
-    def _generate_class(self, src_actor, name, superclass_name=None):
-        """ Generate Class from data """
-        superclass = None
-        if superclass_name:
-            if superclass_name in self.actor_classes(src_actor):
-                superclass = self.get_actor_class(src_actor, superclass_name)
-            else:
-                try:
-                    superclass = getattr(sys.modules[__name__],
-                                         superclass_name)
-                except AttributeError:
-                    superclass = None
-
-            if not superclass:
-                return False
-
-        new_class = None
-        if superclass:
-            new_class = type(name, (superclass,), {})
-        else:
-            new_class = type(name, (MsgType,), {})
-
-        if src_actor not in self._classes:
-            self._classes.update({src_actor: {}})
-
-        self._classes[src_actor].update({name: new_class})
-        return True
-
-    def generate_classes(self):
-        """ Generate all classes """
-        for src_actor, classes_data in self._classes_data.items():
-            while True:
-                pending = ()
-                something_built = False
-
-                for name, data in classes_data:
-                    if name in self.actor_classes(src_actor):
-                        continue
-
-                    superclass_name = None
-                    if u'superclass' in data:
-                        superclass_name = data[u'superclass'].encode('ascii')
-
-                    if self._generate_class(src_actor, name, superclass_name):
-                        something_built = True
-                    else:
-                        pending.append(name)
-
-                if not pending:
-                    break
-                elif not something_built:
-                    logging.warning("Classes not built for missing deps: %s",
-                                    pending)
-
+    def _base_class(self, superclass_name):
+        """ Return message type class of this module by name or None
+
+        Lookups are memoized as the same bases are shared by many actors
+        """
+        if superclass_name not in self._base_classes:
+            superclass = getattr(sys.modules[__name__], superclass_name, None)
+            if not (isinstance(superclass, type) and
+                    issubclass(superclass, MsgType)):
+                superclass = None
+            self._base_classes[superclass_name] = superclass
+        return self._base_classes[superclass_name]
+
+    def _generate_actor_classes(self, src_actor, classes_data):
+        """ Generate classes of src actor in a single pass
+
+        Each class has at most one superclass, so definitions form chains.
+        Every chain is walked up to an already resolved class, a class
+        defined elsewhere or a cycle, and then built top-down, so every
+        class is visited once.
+        """
+        superclasses = {}
+        names = []
+        for name, data in classes_data:
+            if name not in superclasses:
+                names.append(name)
+                superclasses[name] = str(data.get(u'superclass', '')) or None
+
+        built = self._classes.setdefault(src_actor, {})
+        resolved = set(built)
+        for name in names:
+            chain = []
+            on_chain = set()
+            current = name
+            while current in superclasses and current not in resolved:
+                if current in on_chain:
+                    cycle = chain[chain.index(current):]
+                    logging.warning("%s: classes not built for superclass "
+                                    "cycle: %s", src_actor,
+                                    ' -> '.join(cycle + [current]))
+                    resolved.update(cycle)
                     break
+                chain.append(current)
+                on_chain.add(current)
+                current = superclasses[current]
+
+            chain = [cname for cname in chain if cname not in resolved]
+            if not chain:
+                continue
+
+            if current is None:
+                superclass = MsgType
+            elif current in built:
+                superclass = built[current]
+            elif current in resolved:
+                superclass = None
+                logging.warning("%s: classes not built for failed "
+                                "superclass %s: %s", src_actor, current,
+                                chain)
+            else:
+                superclass = self._base_class(current)
+                if not superclass:
+                    logging.warning("%s: classes not built for missing "
+                                    "superclass %s: %s", src_actor, current,
+                                    chain)
+
+            for cname in reversed(chain):
+                if superclass:
+                    # namespace tells apart same named classes of actors
+                    superclass = type(cname, (superclass,),
+                                      {'__slots__': (),
+                                       'namespace': src_actor})
+                    built[cname] = superclass
+                resolved.add(cname)
+
+    def remove_classes(self, namespace):
+        """ Forget parsed data and generated classes of namespace """
+        self._classes_data.pop(namespace, None)
+        self._classes.pop(namespace, None)
+
+    def generate_classes(self, namespaces=None):
+        """ Generate classes of given namespaces, all if None """
+        if namespaces is None:
+            namespaces = list(self._classes_data)
+        for src_actor in namespaces:
+            if src_actor in self._classes_data:
+                self._generate_actor_classes(src_actor,
+                                             self._classes_data[src_actor])
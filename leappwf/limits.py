@@ -0,0 +1,158 @@
+""" Limits enforced on actor scripts processes
+
+Limits are a dict of builtin values, as they are pickled to the privileged
+helper:
+
+max_output: max bytes of captured stdout or stderr, see leappwf.output
+spill_size: bytes of captured stdout or stderr kept in memory
+timeout: seconds of wall-clock time after which the script is killed
+cpu_time: seconds of CPU time the script may use (RLIMIT_CPU)
+memory: bytes of address space of each script process (RLIMIT_AS)
+
+Missing or None values are no limit. Scripts run in a session of their own,
+so killing a script also kills every process it started. Resource limits
+are inherited by every process the script starts.
+
+This module is imported by sudohelper, so it must not import other leappwf
+modules.
+"""
+
+import errno
+import math
+import os
+import resource
+import signal
+import threading
+
+# seconds between asking a script to terminate and killing it
+KILL_GRACE = 2.0
+
+# reasons a script was killed for
+TIMEOUT = 'timeout'
+CPU_TIME = 'cpu_time'
+MEMORY = 'memory'
+CANCELLED = 'cancelled'
+
+# signals scripts die of when they run out of memory
+_MEMORY_SIGNALS = (signal.SIGSEGV, signal.SIGBUS, signal.SIGABRT,
+                   signal.SIGKILL)
+
+
+def output_limits(limits):
+    """ Return (max_size, spill_size) of captured output """
+    limits = limits or {}
+    return limits.get('max_output'), limits.get('spill_size')
+
+
+def preexec(limits):
+    """ Return function preparing script process before it is executed """
+    limits = limits or {}
+    cpu_time = limits.get(CPU_TIME)
+    memory = limits.get(MEMORY)
+
+    def prepare():
+        os.setsid()
+        if cpu_time is not None:
+            # SIGXCPU at the soft limit, SIGKILL a second later
+            seconds = int(math.ceil(cpu_time))
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    return prepare
+
+
+def reap(child):
+    """ Wait for Popen child to exit, return its resource usage
+
+    Resource usage includes children the child waited for
+    """
+    _, status, rusage = os.wait4(child.pid, 0)
+    if os.WIFSIGNALED(status):
+        child.returncode = -os.WTERMSIG(status)
+    else:
+        child.returncode = os.WEXITSTATUS(status)
+    return rusage
+
+
+def exceeded(limits, returncode, rusage=None):
+    """ Return name of resource limit script died of, None if it did not
+
+    Running out of memory is assumed for scripts dying of a signal
+    allocation failures are reported with. Scripts just exiting with an
+    error on a failed allocation report it themselves
+    """
+    limits = limits or {}
+    if returncode is None or returncode >= 0:
+        return None
+
+    signum = -returncode
+    cpu_time = limits.get(CPU_TIME)
+    if cpu_time is not None:
+        if signum == signal.SIGXCPU:
+            return CPU_TIME
+        if signum == signal.SIGKILL and (
+                rusage is None or
+                rusage.ru_utime + rusage.ru_stime >= cpu_time):
+            return CPU_TIME
+    if limits.get(MEMORY) is not None and signum in _MEMORY_SIGNALS:
+        return MEMORY
+    return None
+
+
+def signal_group(pgid, signum):
+    """ Send signal to process group, ignoring groups already gone """
+    try:
+        os.killpg(pgid, signum)
+    except OSError as err:
+        if err.errno not in (errno.ESRCH, errno.EPERM):
+            raise
+
+
+class ScriptKiller(object):
+    """ Kill process group of a running script, on its timeout or on
+    request
+
+    The script is asked to terminate first, whatever is left of it is killed
+    KILL_GRACE seconds later or once the script is reaped. close() has to be
+    called once the script is reaped
+    """
+
+    def __init__(self, pgid, timeout=None):
+        self._pgid = pgid
+        self._lock = threading.Lock()
+        self._closed = False
+        self._timers = []
+        # reason script was killed for, None if it was not
+        self.reason = None
+        if timeout is not None:
+            self._start(timeout, self.kill, TIMEOUT)
+
+    def _start(self, delay, func, *args):
+        timer = threading.Timer(delay, func, args)
+        timer.daemon = True
+        self._timers.append(timer)
+        timer.start()
+
+    def kill(self, reason):
+        """ Kill script for reason, unless it is already gone """
+        with self._lock:
+            if self._closed or self.reason is not None:
+                return
+            self.reason = reason
+            signal_group(self._pgid, signal.SIGTERM)
+            self._start(KILL_GRACE, self._force)
+
+    def _force(self):
+        with self._lock:
+            if not self._closed:
+                signal_group(self._pgid, signal.SIGKILL)
+
+    def close(self):
+        """ Stop watching reaped script, killing processes it left behind
+        if it was killed """
+        with self._lock:
+            self._closed = True
+            for timer in self._timers:
+                timer.cancel()
+            if self.reason is not None:
+                signal_group(self._pgid, signal.SIGKILL)
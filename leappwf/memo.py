@@ -0,0 +1,75 @@
+""" Remember actors script results to skip unchanged re-executions """
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+
+class ResultMemo(object):
+    """ Store last script result of every actor on disk
+
+    A result is replayed when actor script and its inports data are the
+    same as when it was stored and it is not older than actor's TTL.
+    cached and executed are names of actors whose results were replayed and
+    whose scripts were executed since reset
+    """
+    memo_data_path = '~/.leappwf/actors_memo'
+
+    def __init__(self):
+        self._memo_path = os.path.expanduser(self.memo_data_path)
+        self.cached = set()
+        self.executed = set()
+
+    def reset(self):
+        """ Forget which actors were cached or executed """
+        self.cached = set()
+        self.executed = set()
+
+    @staticmethod
+    def key(script, inports_file, inports_data=None):
+        """ Return hash of script and inports data contents """
+        digest = hashlib.sha1()
+        for path in (script, inports_file):
+            if path:
+                with open(path, 'rb') as stream:
+                    digest.update(stream.read())
+            digest.update(b'\0')
+        if inports_data is not None:
+            digest.update(inports_data)
+        return digest.hexdigest()
+
+    def _memo_file(self, name):
+        return os.path.join(self._memo_path, name + '.pickle')
+
+    def get(self, name, key, ttl=None):
+        """ Return stored (returncode, stdout, stderr) or None """
+        try:
+            with open(self._memo_file(name), 'rb') as stream:
+                stored_key, stored_at, res = pickle.load(stream)
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError):
+            return None
+
+        if stored_key != key:
+            return None
+        if ttl is not None and time.time() - stored_at > ttl:
+            return None
+
+        self.cached.add(name)
+        return res
+
+    def put(self, name, key, res):
+        """ Store script result of actor """
+        try:
+            if not os.path.exists(self._memo_path):
+                os.makedirs(self._memo_path)
+            fd, tmp_file = tempfile.mkstemp(dir=self._memo_path)
+            with os.fdopen(fd, 'wb') as stream:
+                pickle.dump((key, time.time(), res), stream,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self._memo_file(name))
+        except (IOError, OSError, pickle.PicklingError) as err:
+            logging.warning("Failed to store %s result: %s", name, err)
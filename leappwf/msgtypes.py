@@ -2,11 +2,18 @@ from .portannotation import MsgType
 
 
 class Trigger(MsgType):
+    __slots__ = ()
+
     def __init__(self):
         super(Trigger, self).__init__(None, None, None)
 
+    def __reduce__(self):
+        return (Trigger, ())
+
 
 class ShellCommandStatus(MsgType):
+    __slots__ = ()
+
     def __init__(self, srcname, errorinfo, retcode):
         super(ShellCommandStatus, self).__init__(srcname,
                                                  errorinfo,
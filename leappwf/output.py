@@ -0,0 +1,298 @@
+""" Bounded capture of actor scripts output and lookup of JSON members in it
+
+Captured output is bytes while it fits in memory. Past the spill size it is
+written to a temporary file and represented by {'size': ..., 'path': ...}.
+Past the maximum size it is read and thrown away, leaving just
+{'size': ..., 'limit': ...}. Only builtin types are used, as captured output
+is pickled back from the privileged helper.
+
+This module is imported by sudohelper, so it must not import other leappwf
+modules.
+"""
+
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+
+READ_SIZE = 64 * 1024
+
+
+class OutputCapture(object):
+    """ Collect output of a stream within given limits
+
+    owner, if given, is the uid spill files are handed over to
+    """
+
+    def __init__(self, max_size=None, spill_size=None, owner=None):
+        self._max_size = max_size
+        self._spill_size = spill_size
+        self._owner = owner
+        self._chunks = []
+        self._file = None
+        self._path = None
+        self.size = 0
+
+    @property
+    def exceeded(self):
+        """ Return True if more than max_size bytes were written """
+        return self._max_size is not None and self.size > self._max_size
+
+    def _spill(self):
+        """ Move output collected so far to a temporary file """
+        fd, self._path = tempfile.mkstemp(prefix='leappwf_', suffix='.out')
+        if self._owner is not None:
+            os.fchown(fd, self._owner, -1)
+        self._file = os.fdopen(fd, 'wb')
+        for chunk in self._chunks:
+            self._file.write(chunk)
+        self._chunks = []
+
+    def _discard(self):
+        """ Forget output collected so far """
+        self._chunks = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._path)
+            self._path = None
+
+    def write(self, chunk):
+        """ Add chunk of output """
+        self.size += len(chunk)
+        if self.exceeded:
+            self._discard()
+            return
+
+        if self._file is None and self._spill_size is not None and \
+                self.size > self._spill_size:
+            self._spill()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def result(self):
+        """ Return captured output, see module docstring """
+        if self.exceeded:
+            return {'size': self.size, 'limit': self._max_size}
+        if self._file is not None:
+            self._file.close()
+            return {'size': self.size, 'path': self._path}
+        return b''.join(self._chunks)
+
+
+def capture(stream, max_size=None, spill_size=None, owner=None):
+    """ Read stream to its end, return captured output """
+    output = OutputCapture(max_size, spill_size, owner)
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        output.write(chunk)
+    return output.result()
+
+
+def communicate(child, data, max_size=None, spill_size=None, owner=None):
+    """ Like Popen.communicate, but with bounded capture of output
+
+    Child is left to be reaped by caller
+    """
+    def feed():
+        try:
+            if data:
+                child.stdin.write(data)
+        except (IOError, OSError):
+            # script does not care about its input
+            pass
+        finally:
+            child.stdin.close()
+
+    err = []
+    threads = [threading.Thread(target=feed),
+               threading.Thread(target=lambda: err.append(
+                   capture(child.stderr, max_size, spill_size, owner)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    out = capture(child.stdout, max_size, spill_size, owner)
+    for thread in threads:
+        thread.join()
+    return out, err[0]
+
+
+def oversized(output):
+    """ Return True if captured output was discarded for its size """
+    return isinstance(output, dict) and 'limit' in output
+
+
+def open_output(output):
+    """ Return binary file object reading captured output """
+    if isinstance(output, dict):
+        if 'path' in output:
+            return open(output['path'], 'rb')
+        return io.BytesIO(b'')
+    if not isinstance(output, bytes):
+        output = (output or u'').encode('utf-8')
+    return io.BytesIO(output)
+
+
+def read_output(output):
+    """ Return captured output as bytes """
+    if isinstance(output, bytes):
+        return output
+    with open_output(output) as stream:
+        return stream.read()
+
+
+def remove_output(output):
+    """ Remove file captured output was spilled to """
+    if isinstance(output, dict) and 'path' in output:
+        try:
+            os.remove(output['path'])
+        except OSError:
+            pass
+
+
+# bytes a JSON scanner has to stop at
+_NON_SPACE = re.compile(b'[^ \t\r\n]')
+_STRING_END = re.compile(b'["\\\\]')
+_NESTED = re.compile(b'["{}\\[\\]]')
+_SCALAR_END = re.compile(b'[ \t\r\n,}\\]]')
+
+
+class _Scanner(object):
+    """ Scan JSON values read from binary stream one chunk at a time
+
+    Values which are not kept are only checked for balanced brackets, their
+    content is not validated
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buf = b''
+        self._pos = 0
+
+    def _fill(self):
+        """ Read next chunk, return False at end of stream """
+        data = self._stream.read(READ_SIZE)
+        if not data:
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _advance(self, pattern, keep, consume=True):
+        """ Move to next match of pattern, past it if consume
+
+        Return the matched byte and, if keep, the bytes moved over
+        """
+        pieces = []
+        while True:
+            match = pattern.search(self._buf, self._pos)
+            if match:
+                end = match.end() if consume else match.start()
+                if keep:
+                    pieces.append(self._buf[self._pos:end])
+                self._pos = end
+                return match.group(), b''.join(pieces)
+
+            if keep:
+                pieces.append(self._buf[self._pos:])
+            self._pos = len(self._buf)
+            if not self._fill():
+                raise ValueError("unexpected end of JSON document")
+
+    def peek(self):
+        """ Return next non-whitespace byte, b'' at end of stream """
+        try:
+            char, _ = self._advance(_NON_SPACE, False, consume=False)
+        except ValueError:
+            return b''
+        return char
+
+    def expect(self, char):
+        """ Move past next non-whitespace byte which has to be char """
+        if self.peek() != char:
+            raise ValueError("expected {!r} in JSON document".format(char))
+        self._pos += 1
+
+    def _string_rest(self, keep):
+        """ Move past end of string whose opening quote was consumed """
+        pieces = []
+        while True:
+            char, piece = self._advance(_STRING_END, keep)
+            pieces.append(piece)
+            if char == b'"':
+                return b''.join(pieces)
+            # escaped byte
+            if self._pos == len(self._buf) and not self._fill():
+                raise ValueError("unexpected end of JSON document")
+            pieces.append(self._buf[self._pos:self._pos + 1])
+            self._pos += 1
+
+    def value(self, keep):
+        """ Move past next value, return its JSON text if keep """
+        char = self.peek()
+        if char == b'"':
+            self._pos += 1
+            return char + self._string_rest(keep)
+
+        if char in (b'{', b'['):
+            self._pos += 1
+            pieces = [char]
+            depth = 1
+            while depth:
+                char, piece = self._advance(_NESTED, keep)
+                pieces.append(piece)
+                if char == b'"':
+                    pieces.append(self._string_rest(keep))
+                elif char in (b'{', b'['):
+                    depth += 1
+                else:
+                    depth -= 1
+            return b''.join(pieces)
+
+        _, piece = self._advance(_SCALAR_END, True, consume=False)
+        if not piece:
+            raise ValueError("expected value in JSON document")
+        return piece
+
+
+def json_member(stream, key):
+    """ Return value of key in JSON object read from binary stream
+
+    Only the value of key is kept and decoded, the rest of the document is
+    scanned over. Return None if the document is not a JSON object or it
+    has no such key
+    """
+    scanner = _Scanner(stream)
+    found = None
+    try:
+        scanner.expect(b'{')
+        if scanner.peek() == b'}':
+            scanner.expect(b'}')
+        else:
+            while True:
+                if scanner.peek() != b'"':
+                    return None
+                name = json.loads(scanner.value(True).decode('utf-8'))
+                scanner.expect(b':')
+                value = scanner.value(name == key)
+                if name == key:
+                    found = value
+
+                char = scanner.peek()
+                if char not in (b',', b'}'):
+                    return None
+                scanner.expect(char)
+                if char == b'}':
+                    break
+
+        if scanner.peek() or found is None:
+            return None
+        return json.loads(found.decode('utf-8'))
+    except ValueError:
+        return None
@@ -0,0 +1,140 @@
+""" Compiled execution plan of a workflow """
+
+import pickle
+
+import six
+
+# Source of the start Trigger in plan bindings, named as the start actor
+START = ('start_workflow', 'initial_out')
+
+
+def signature(actors):
+    """ Return what inport and outport matching of actors depends on
+
+    That is names, message types (with their superclasses) and required
+    source actors of all ports
+    """
+    def mro(msgtype):
+        return tuple((cls.__dict__.get('namespace'),
+                      cls.__module__ + '.' + cls.__name__)
+                     for cls in msgtype.__mro__)
+
+    def srcname(annotation):
+        src = annotation.srcname
+        return src if isinstance(src, six.string_types) else src.__name__
+
+    sig = {}
+    for actor in actors:
+        sig[actor.name] = (
+            tuple((port.name, mro(port.annotation.msgtype),
+                   srcname(port.annotation))
+                  for port in actor.inports.values()),
+            tuple((port.name, mro(port.annotation.msgtype))
+                  for port in actor.outports.values()))
+    return sig
+
+
+class Plan(object):
+    """ Immutable schedule of workflow actors
+
+    Actors and ports are referred to by name, so a plan can be pickled and
+    later run with actors loaded again from the same actors tree, without
+    matching ports again.
+
+    order: names of actors to run, each one after actors it depends on
+    deps: dict of actor names to frozenset of names of actors they depend on
+    bindings: dict of actor names to a (collect, sources) tuple for each
+              inport, sources are (actor name, outport name) tuples (START
+              for the start Trigger) and collect is True for inports
+              receiving all of them as a dict
+    collected: sources of workflow results
+    sig: signature of actors the plan was compiled for
+    """
+
+    def __init__(self, order, deps, bindings, collected, sig):
+        self.order = tuple(order)
+        self.deps = dict((name, frozenset(names))
+                         for name, names in deps.items())
+        self.bindings = dict((name, tuple((collect, tuple(sources))
+                                          for collect, sources in inports))
+                             for name, inports in bindings.items())
+        self.collected = tuple(collected)
+        self.sig = sig
+
+    def subset(self, names):
+        """ Return plan of given actors, which include all they depend on """
+        names = set(names)
+        return Plan([name for name in self.order if name in names],
+                    dict((name, deps) for name, deps in self.deps.items()
+                         if name in names),
+                    dict((name, inports)
+                         for name, inports in self.bindings.items()
+                         if name in names),
+                    [source for source in self.collected
+                     if source[0] in names],
+                    dict((name, sig) for name, sig in self.sig.items()
+                         if name in names))
+
+    def by_priority(self, durations=None):
+        """ Return names of actors, those heading the longest chains of
+        dependent actors first
+
+        Chain length is the sum of durations of actors on it (dict of actor
+        names to seconds). Without durations, plan order is kept
+        """
+        if not durations:
+            return list(self.order)
+
+        dependents = dict((name, []) for name in self.order)
+        for name in self.order:
+            for dep in self.deps[name]:
+                dependents[dep].append(name)
+        lengths = {}
+        for name in reversed(self.order):
+            lengths[name] = durations.get(name, 0) + max(
+                [lengths[dependent] for dependent in dependents[name]] or [0])
+        return sorted(self.order, key=lambda name: -lengths[name])
+
+    def fits(self, actors):
+        """ Return True if plan was compiled for actors like these """
+        return self.sig == signature(actors)
+
+    @staticmethod
+    def _collect(sources, outputs):
+        return dict((src + '__' + port, outputs[(src, port)])
+                    for src, port in sources if (src, port) in outputs)
+
+    def inportargs(self, name, outputs):
+        """ Return values for actor inports from upstream actors outputs """
+        args = []
+        for collect, sources in self.bindings[name]:
+            if collect:
+                args.append(self._collect(sources, outputs))
+            else:
+                args.append(next(outputs[source] for source in sources
+                                 if source in outputs))
+        return tuple(args)
+
+    def results(self, outputs):
+        """ Return dict of outputs collected as workflow results """
+        return self._collect(self.collected, outputs)
+
+    @staticmethod
+    def store_outputs(actor, res, outputs):
+        """ Map actor result to its outports """
+        if len(actor.outports) == 1:
+            outputs[(actor.name, actor.outports.at(0).name)] = res
+        else:
+            for outport, msg in zip(actor.outports.values(), res):
+                outputs[(actor.name, outport.name)] = msg
+
+    def save(self, path):
+        """ Write plan to file """
+        with open(path, 'wb') as stream:
+            pickle.dump(self, stream, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """ Read plan written by save """
+        with open(path, 'rb') as stream:
+            return pickle.load(stream)
@@ -1,4 +1,4 @@
-from wowp.actors import DictionaryMerge
+from collections import OrderedDict
 
 class Any(object):
     """A unique wildcard object
@@ -53,15 +53,27 @@ def matchport(inport, outport):
         return False
 
 class MsgType(object):
+    # the same message (and its payload) is handed to every receiving actor
+    # and to workflow results, so messages are immutable and have no
+    # per-instance __dict__; subclasses should define empty __slots__
+    __slots__ = ('srcname', 'errorinfo', 'payload')
+
     def __init__(self, srcname, errorinfo, payload):
-        self.srcname=srcname
+        object.__setattr__(self, 'srcname', srcname)
         # errorinfo is an ActorError exception defined below
-        self.errorinfo=errorinfo
-        self.payload=payload
+        object.__setattr__(self, 'errorinfo', errorinfo)
+        object.__setattr__(self, 'payload', payload)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("messages are immutable")
+
+    def __reduce__(self):
+        # attributes cannot be set on a new instance by pickle or deepcopy
+        return (type(self), (self.srcname, self.errorinfo, self.payload))
 
 class ActorError(Exception):
     def __init__(self, errtype, errmsg, errdetails):
-        # "failed" or "skipped"
+        # "failed", "skipped" or "cancelled"
         self.errtype = errtype
         # what error happened
         self.errmsg = errmsg
@@ -70,35 +82,134 @@ class ActorError(Exception):
     def __str__(self):
         return "actor " + self.errtype + ": " + self.errmsg + " " + self.errdetails.__str__()
 
-def connectactors(actors):
-    allinports=[p for a in actors for p in a.inports.values()]
-    alloutports=[p for a in actors for p in a.outports.values()]
+    def __reduce__(self):
+        # subclasses take other arguments, so attributes are restored instead
+        return (_restore_error, (type(self), self.__dict__))
+
+
+def _restore_error(cls, state):
+    err = Exception.__new__(cls)
+    err.__dict__.update(state)
+    return err
+
+
+def indexoutports(outports):
+    """Index outports by message type and by (message type, owner name)
+
+    Every outport is indexed under all classes of its message type MRO, so
+    looking up an inport message type gives exactly the outports matchport
+    would accept. Index lists keep the order of given outports.
+    """
+    index = {}
+    for op in outports:
+        try:
+            mro = op.annotation.msgtype.__mro__
+        except AttributeError:
+            continue
+        for cls in mro:
+            index.setdefault(cls, []).append(op)
+            index.setdefault((cls, op.owner.name), []).append(op)
+    return index
+
+
+def _inportkey(ip):
+    """Return index key of outports matching inport, None if there is none"""
+    try:
+        if ip.annotation.srcname == Any or ip.annotation.srcname == All:
+            return ip.annotation.msgtype
+        return (ip.annotation.msgtype, ip.annotation.srcname)
+    except AttributeError:
+        return None
+
+
+def _others(ip, ops):
+    """Return outports of actors other than owner of inport
+
+    An actor never gets its own output, e.g. an All-collector producing
+    the message type it collects would otherwise wait for itself
+    """
+    return [op for op in ops if op.owner is not ip.owner]
+
+
+def matchactors(actors):
+    """Return list of (inport, [matching outports]) for annotated inports"""
+    allinports = [p for a in actors for p in a.inports.values()]
+    index = indexoutports(p for a in actors for p in a.outports.values())
 
+    matches = []
     for ip in allinports:
-        opcount = 0
         if isinstance(ip.annotation, InitialPortAnnotation):
             continue
 
-        if ip.annotation.srcname==All:
-            ip.annotation.matchports=[]
-
-        for op in alloutports:
-            if matchport(ip, op):
-#                print("matched! ", ip)
-                opcount += 1
-                if ip.annotation.srcname==All:
-#                    print("wildcard matched! ", ip)
-                    ip.annotation.matchports.append(op)
-                else:
-                    ip += op
-                # we do not want to have more than one output port connected to one input port
-                # break
-        if ip.annotation.srcname == All:
-            namesports = {(mp.owner.name + '__' + mp.name):mp for mp in ip.annotation.matchports}
-            ip.annotation.linkedactor = DictionaryMerge(inport_names=namesports.keys(), outport_name='out')
-            ip += ip.annotation.linkedactor.outports['out']
-            for n, mp in namesports.items():
-                ip.annotation.linkedactor.inports[n] += mp
-        else:
-            if opcount > 1:
-                print("Warning: input port ", ip, "has {} output ports".format(opcount) )
+        matches.append((ip, _others(ip, index.get(_inportkey(ip), []))))
+    return matches
+
+
+class PortMatcher(object):
+    """Match inports to outports the way matchactors does, for actors added
+    and removed one by one
+
+    Both outports and inports are indexed, so add and remove can tell which
+    inports may match differently without looking at other actors
+    """
+
+    def __init__(self):
+        self._outports = {}
+        self._inports = {}
+
+    @staticmethod
+    def _outportkeys(op):
+        try:
+            mro = op.annotation.msgtype.__mro__
+        except AttributeError:
+            return []
+        return [key for cls in mro for key in (cls, (cls, op.owner.name))]
+
+    @staticmethod
+    def inports(actor):
+        """Return inports of actor that get matched"""
+        return [ip for ip in actor.inports.values()
+                if not isinstance(ip.annotation, InitialPortAnnotation)]
+
+    def _affected(self, actor):
+        """Return inports of other actors possibly matching actor outports"""
+        affected = OrderedDict()
+        for op in actor.outports.values():
+            for key in self._outportkeys(op):
+                for ip in self._inports.get(key, ()):
+                    if ip.owner is not actor:
+                        affected[ip] = None
+        return list(affected)
+
+    def add(self, actor):
+        """Index actor ports, return inports whose matches may have changed"""
+        for op in actor.outports.values():
+            for key in self._outportkeys(op):
+                self._outports.setdefault(key, OrderedDict())[op] = None
+        for ip in self.inports(actor):
+            key = _inportkey(ip)
+            if key is not None:
+                self._inports.setdefault(key, OrderedDict())[ip] = None
+        return self._affected(actor) + self.inports(actor)
+
+    def remove(self, actor):
+        """Forget actor ports, return inports whose matches may have changed"""
+        affected = self._affected(actor)
+        for op in actor.outports.values():
+            for key in self._outportkeys(op):
+                ops = self._outports[key]
+                del ops[op]
+                if not ops:
+                    del self._outports[key]
+        for ip in self.inports(actor):
+            key = _inportkey(ip)
+            if key is not None:
+                ips = self._inports[key]
+                del ips[ip]
+                if not ips:
+                    del self._inports[key]
+        return affected
+
+    def match(self, ip):
+        """Return outports matching inport"""
+        return _others(ip, self._outports.get(_inportkey(ip), ()))
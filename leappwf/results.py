@@ -0,0 +1,233 @@
+""" Store workflow run results and find what changed between runs """
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import six
+
+from .portannotation import ActorError
+
+# outcome of actors without errorinfo
+OK = 'ok'
+FAILED = 'failed'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS runs ('
+    ' id INTEGER PRIMARY KEY,'
+    ' host TEXT NOT NULL,'
+    ' finished REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS runs_host ON runs (host, id)',
+    # payloads are shared by all results with the same one
+    'CREATE TABLE IF NOT EXISTS payloads ('
+    ' digest TEXT PRIMARY KEY,'
+    ' data BLOB NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS results ('
+    ' run INTEGER NOT NULL,'
+    ' actor TEXT NOT NULL,'
+    ' outcome TEXT NOT NULL,'
+    ' errorinfo TEXT,'
+    ' payload TEXT NOT NULL,'
+    ' PRIMARY KEY (run, actor))',
+    'CREATE INDEX IF NOT EXISTS results_actor ON results (actor, run)',
+)
+
+
+def _jsonable_error(errorinfo):
+    """ Return errorinfo of actor result in JSON serializable form """
+    if isinstance(errorinfo, ActorError):
+        return {'type': errorinfo.errtype,
+                'message': errorinfo.errmsg,
+                'details': _jsonable_error(errorinfo.errdetails)}
+    if isinstance(errorinfo, bytes):
+        return errorinfo.decode('utf-8', 'replace') or None
+    if errorinfo is None or isinstance(errorinfo, (six.text_type, dict)):
+        return errorinfo or None
+    return six.text_type(errorinfo)
+
+
+def jsonable_results(results):
+    """ Return workflow results in JSON serializable form """
+    return dict((name, {'payload': data['payload'],
+                        'errorinfo': _jsonable_error(data['errorinfo'])})
+                for name, data in results.items())
+
+
+def outcome(errorinfo):
+    """ Return OK, FAILED or type of actor error ("skipped", ...) """
+    if not errorinfo:
+        return OK
+    if isinstance(errorinfo, ActorError):
+        return errorinfo.errtype
+    return FAILED
+
+
+class ResultsStore(object):
+    """ SQLite store of results of workflow runs, per host
+
+    Payloads are stored compressed and once for all results having the
+    same payload. Records returned by queries are dicts with outcome,
+    errorinfo (in JSON serializable form, see jsonable_results) and payload
+    of an actor
+    """
+    results_data_path = '~/.leappwf/results.sqlite'
+
+    def __init__(self, results_path=None):
+        self._results_path = os.path.expanduser(results_path or
+                                                self.results_data_path)
+        self._lock = threading.Lock()
+
+    @property
+    def results_path(self):
+        """ Return path to SQLite database """
+        return self._results_path
+
+    def _connect(self):
+        dirname = os.path.dirname(self._results_path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        conn = sqlite3.connect(self._results_path)
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    def _query(self, sql, args=()):
+        """ Return all rows returned by query """
+        with self._lock:
+            conn = self._connect()
+            try:
+                return conn.execute(sql, args).fetchall()
+            finally:
+                conn.close()
+
+    def add_run(self, results, host=''):
+        """ Store results of a workflow run against host, return run id """
+        rows = []
+        payloads = {}
+        for name, data in results.items():
+            payload = json.dumps(data['payload'], sort_keys=True)
+            digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+            payloads[digest] = payload
+            errorinfo = _jsonable_error(data['errorinfo'])
+            rows.append((name, outcome(data['errorinfo']),
+                         None if errorinfo is None else json.dumps(errorinfo),
+                         digest))
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    known = set()
+                    for digest in payloads:
+                        if conn.execute('SELECT 1 FROM payloads'
+                                        ' WHERE digest = ?',
+                                        (digest,)).fetchone():
+                            known.add(digest)
+                    conn.executemany(
+                        'INSERT INTO payloads VALUES (?, ?)',
+                        [(digest, sqlite3.Binary(zlib.compress(
+                            payload.encode('utf-8'))))
+                         for digest, payload in payloads.items()
+                         if digest not in known])
+                    run = conn.execute(
+                        'INSERT INTO runs (host, finished) VALUES (?, ?)',
+                        (host, time.time())).lastrowid
+                    conn.executemany(
+                        'INSERT INTO results VALUES (?, ?, ?, ?, ?)',
+                        [(run,) + row for row in rows])
+            finally:
+                conn.close()
+        return run
+
+    def runs(self, host=None, limit=None):
+        """ Return runs, newest first, as dicts with id, host and finished
+        time """
+        sql = 'SELECT id, host, finished FROM runs'
+        args = ()
+        if host is not None:
+            sql += ' WHERE host = ?'
+            args = (host,)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        return [{'id': run, 'host': run_host, 'finished': finished}
+                for run, run_host, finished in
+                self._query(sql, args + (-1 if limit is None else limit,))]
+
+    def last_run(self, host=''):
+        """ Return id of last run against host, None if there is none """
+        runs = self.runs(host, 1)
+        return runs[0]['id'] if runs else None
+
+    @staticmethod
+    def _record(row):
+        actor_outcome, errorinfo, data = row
+        return {'outcome': actor_outcome,
+                'errorinfo': None if errorinfo is None else
+                json.loads(errorinfo),
+                'payload': json.loads(zlib.decompress(data).decode('utf-8'))}
+
+    def results(self, run, actors=None, outcomes=None):
+        """ Return dict of actor names to their records in run, just for
+        given actors and outcomes if given """
+        rows = self._query(
+            'SELECT r.actor, r.outcome, r.errorinfo, p.data'
+            ' FROM results r JOIN payloads p ON p.digest = r.payload'
+            ' WHERE r.run = ?', (run,))
+        return dict((row[0], self._record(row[1:])) for row in rows
+                    if (actors is None or row[0] in actors) and
+                    (outcomes is None or row[1] in outcomes))
+
+    def history(self, actor, host=None, limit=None):
+        """ Return records of actor in runs, newest first, with run id, host
+        and finished time of the run """
+        sql = ('SELECT r.run, s.host, s.finished,'
+               ' r.outcome, r.errorinfo, p.data'
+               ' FROM results r JOIN runs s ON s.id = r.run'
+               ' JOIN payloads p ON p.digest = r.payload'
+               ' WHERE r.actor = ?')
+        args = (actor,)
+        if host is not None:
+            sql += ' AND s.host = ?'
+            args += (host,)
+        sql += ' ORDER BY r.run DESC LIMIT ?'
+        records = []
+        for row in self._query(sql, args + (-1 if limit is None else limit,)):
+            record = self._record(row[3:])
+            record.update({'run': row[0], 'host': row[1],
+                           'finished': row[2]})
+            records.append(record)
+        return records
+
+    def delta(self, run, since=None):
+        """ Return records of actors whose outcome, errorinfo or payload in
+        run differ from the previous run against the same host (or run
+        since). Actors missing in run are mapped to None
+        """
+        if since is None:
+            rows = self._query(
+                'SELECT p.id FROM runs r JOIN runs p ON p.host = r.host'
+                ' WHERE r.id = ? AND p.id < ? ORDER BY p.id DESC LIMIT 1',
+                (run, run))
+            since = rows[0][0] if rows else None
+
+        rows = self._query(
+            'SELECT actor, outcome, errorinfo, payload FROM results'
+            ' WHERE run = ?', (run,))
+        current = dict((row[0], row[1:]) for row in rows)
+        previous = {}
+        if since is not None:
+            rows = self._query(
+                'SELECT actor, outcome, errorinfo, payload FROM results'
+                ' WHERE run = ?', (since,))
+            previous = dict((row[0], row[1:]) for row in rows)
+
+        changed = [name for name in current
+                   if previous.get(name) != current[name]]
+        delta = self.results(run, actors=set(changed)) if changed else {}
+        for name in previous:
+            if name not in current:
+                delta[name] = None
+        return delta
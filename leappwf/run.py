@@ -1,17 +1,37 @@
 """ Load and run actors and build workflow """
 import glob
 import logging
+import numbers
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import six
 import yaml
-import types
+
+try:
+    from os import scandir
+except ImportError:
+    # Python 2
+    scandir = None
 
 from .actor import DirAnnotatedShellActor
+from .cache import ActorCache, signature, valid as cache_valid
+from .executor import PrivilegedExecutor
 from .jsonclasses import JSONClassFactory
+from .instrument import RunTrace
+from .journal import RunJournal
+from .memo import ResultMemo
 from .msgtypes import Trigger
 from .portannotation import Any, All, DstPortAnnotation, PortAnnotation, MsgType
-from .workflow import Workflow
+from .results import ResultsStore
+from .stats import RunStats
+from .watch import watch_actors
+from .workflow import PROCESS, SERIAL, THREAD, Workflow, default_workers
 
 _YAML_FILENAME = 'actordecl.yaml'
+# libyaml based loader is much faster, if available
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 _SCRIPT_KEY = 'script'
 _INPORTS_KEY = 'inports'
@@ -19,6 +39,16 @@ _OUTPORTS_KEY = 'outports'
 _PORT_NAME_KEY = 'name'
 _PORT_SRC_KEY = 'src'
 _PORT_TYPE_KEY = 'type'
+_TTL_KEY = 'ttl'
+_INPORTS_VIA_KEY = 'inports_via'
+_INPORTS_VIA_STDIN = 'stdin'
+_MAX_OUTPUT_KEY = 'max_output'
+_TIMEOUT_KEY = 'timeout'
+_FAIL_FAST_KEY = 'fail_fast'
+_CPU_TIME_KEY = 'cpu_time'
+_MEMORY_KEY = 'memory'
+_WEIGHT_KEY = 'weight'
+_LOCKS_KEY = 'locks'
 
 _DEFAULT_INPORT = 'default_in'
 _DEFAULT_OUTPORT = 'out'
@@ -31,6 +61,7 @@ class ActorData(object):
         self._name = name
         self._path = path
         self._data = data
+        self._script_list = None
 
     @property
     def name(self):
@@ -48,12 +79,81 @@ class ActorData(object):
         if self._data and _SCRIPT_KEY in self._data:
             return os.path.join(self._path, self._data[_SCRIPT_KEY])
 
-        script_list = glob.glob(os.path.join(self._path, '*.sh'))
-        if len(script_list) == 1:
-            return script_list.pop()
+        if self._script_list is None:
+            self._script_list = glob.glob(os.path.join(self._path, '*.sh'))
+        if len(self._script_list) == 1:
+            return self._script_list[0]
+
+        return None
+
+    @property
+    def ttl(self):
+        """ Return seconds for which actor's memoized result stays valid """
+        if self._data and _TTL_KEY in self._data:
+            return self._data[_TTL_KEY]
+        return None
+
+    @property
+    def max_output(self):
+        """ Return max bytes of script stdout or stderr """
+        if self._data and _MAX_OUTPUT_KEY in self._data:
+            return self._data[_MAX_OUTPUT_KEY]
+        return None
+
+    @property
+    def timeout(self):
+        """ Return seconds after which actor's script is killed """
+        if self._data and _TIMEOUT_KEY in self._data:
+            return self._data[_TIMEOUT_KEY]
+        return None
+
+    @property
+    def cpu_time(self):
+        """ Return seconds of CPU time actor's script may use """
+        if self._data and _CPU_TIME_KEY in self._data:
+            return self._data[_CPU_TIME_KEY]
+        return None
 
+    @property
+    def memory(self):
+        """ Return bytes of address space of actor's script processes """
+        if self._data and _MEMORY_KEY in self._data:
+            return self._data[_MEMORY_KEY]
         return None
 
+    @property
+    def weight(self):
+        """ Return share of run budget actor takes while running """
+        if self._data and _WEIGHT_KEY in self._data:
+            return self._data[_WEIGHT_KEY]
+        return 1
+
+    @property
+    def locks(self):
+        """ Return names of resources actor uses exclusively """
+        locks = self._data.get(_LOCKS_KEY) if self._data else None
+        if isinstance(locks, six.string_types):
+            return [locks]
+        return locks or []
+
+    @property
+    def fail_fast(self):
+        """ Return True if actor's failure cancels the rest of the run """
+        return bool(self._data) and bool(self._data.get(_FAIL_FAST_KEY))
+
+    @property
+    def inports_stdin(self):
+        """ Return True if actor's script reads inports data from stdin """
+        return bool(self._data) and \
+            self._data.get(_INPORTS_VIA_KEY) == _INPORTS_VIA_STDIN
+
+    @property
+    def port_files(self):
+        """ Return paths of port descriptions referenced by actor """
+        return [os.path.join(self._path, port[_PORT_TYPE_KEY])
+                for port in self.inports + self.outports
+                if _PORT_TYPE_KEY in port]
+
     @property
     def inports(self):
         """ Return actor's inports """
@@ -78,13 +178,186 @@ class ActorData(object):
             self._data = {_OUTPORTS_KEY: outports}
 
 
+def _parse_inports(class_factory, actor_data):
+    """ Parse inports data """
+    if actor_data.inports:
+        for port in actor_data.inports:
+            if _PORT_TYPE_KEY in port:
+                port_json = os.path.join(actor_data.path,
+                                         port[_PORT_TYPE_KEY])
+                if not os.path.isfile(port_json):
+                    logging.warning("skip %s: no inport descr for %s",
+                                    actor_data.name,
+                                    port[_PORT_TYPE_KEY])
+                    return False
+                class_factory.add_json_class(actor_data.name, port_json)
+
+    return True
+
+
+def _parse_outports(class_factory, actor_data):
+    """ Parse outports data """
+    if actor_data.outports:
+        for port in actor_data.outports:
+            if _PORT_TYPE_KEY in port:
+                port_json = os.path.join(actor_data.path,
+                                         port[_PORT_TYPE_KEY])
+                if not os.path.isfile(port_json):
+                    logging.warning("skip %s: no outport descr for %s",
+                                    actor_data.name,
+                                    port[_PORT_TYPE_KEY])
+                    return False
+
+                class_factory.add_json_class(actor_data.name, port_json)
+            else:
+                logging.warning("skip %s: no outport descr",
+                                actor_data.name)
+                return False
+
+    else:
+        port_json = os.path.join(actor_data.path,
+                                 _DEFAULT_OUTPORT + '.json')
+        if not os.path.isfile(port_json):
+            logging.warning("skip %s: no outport provided",
+                            actor_data.name)
+            return False
+
+        outport_name = _DEFAULT_OUTPORT
+        actor_data.set_outports([{_PORT_TYPE_KEY: outport_name + '.json'}])
+        class_factory.add_json_class(actor_data.name,
+                                     port_json,
+                                     outport_name)
+
+    return True
+
+
+def _non_negative(value, types=numbers.Real):
+    """ Return True if value is a non-negative number of types """
+    return isinstance(value, types) and not isinstance(value, bool) and \
+        value >= 0
+
+
+def _settings_error(actor_data):
+    """ Return what is wrong with settings of actor, None if nothing is
+
+    Settings are used only while the actor runs, so they are checked when
+    it is built rather than failing in the middle of a run
+    """
+    max_output = actor_data.max_output
+    if max_output is not None and \
+            not (_non_negative(max_output, six.integer_types) and max_output):
+        return "max_output should be a positive number of bytes"
+    for key in (_TIMEOUT_KEY, _CPU_TIME_KEY):
+        seconds = getattr(actor_data, key)
+        if seconds is not None and not _non_negative(seconds):
+            return "{} should be a non-negative number of seconds".format(key)
+    memory = actor_data.memory
+    if memory is not None and not _non_negative(memory, six.integer_types):
+        return "memory should be a non-negative number of bytes"
+    if not _non_negative(actor_data.weight):
+        return "weight should be a non-negative number"
+    locks = actor_data.locks
+    if not isinstance(locks, list) or \
+            not all(isinstance(lock, six.string_types) for lock in locks):
+        return "locks should be names"
+    return None
+
+
+def read_actor(actors_path, actor_name, cached=None, with_stats=False):
+    """ Parse actor dir in actors path, without side effects but logging
+
+    cached is the actors cache entry of the actor, used if still valid.
+    Return (actor_data, classes_data, stats, cached), actor_data being None
+    if the actor is skipped. stats are the actors cache signature of a
+    parsed actor if with_stats
+    """
+    actor_path = os.path.join(actors_path, actor_name)
+    if cached and cache_valid(cached, actor_path):
+        _, actor_data, classes_data = cached
+        return actor_data, classes_data, None, True
+
+    yaml_file = os.path.join(actor_path, _YAML_FILENAME)
+
+    actor_yaml = None
+    if os.path.isfile(yaml_file):
+        with open(yaml_file, 'r') as stream:
+            try:
+                actor_yaml = yaml.load(stream, Loader=_YAML_LOADER)
+
+            except yaml.YAMLError as err:
+                logging.warning("loading yaml error: %s", err)
+
+    actor_data = ActorData(actor_name,
+                           actor_path,
+                           actor_yaml)
+
+    class_factory = JSONClassFactory()
+    parsed_inports = _parse_inports(class_factory, actor_data)
+    parsed_outports = _parse_outports(class_factory, actor_data)
+    classes_data = class_factory.classes_data(actor_name)
+    if not (parsed_inports and parsed_outports):
+        return None, classes_data, None, False
+
+    stats = signature(actor_path, actor_data.port_files) \
+        if with_stats else None
+    return actor_data, classes_data, stats, False
+
+
+class _LogCapture(logging.Filter):
+    """ Root logger filter keeping records of threads reading actors, so
+    that they are logged in the order of actors """
+
+    def __init__(self):
+        super(_LogCapture, self).__init__()
+        self._local = threading.local()
+
+    def filter(self, record):
+        records = getattr(self._local, 'records', None)
+        if records is None:
+            return True
+        records.append((record.levelno, record.getMessage()))
+        return False
+
+    def call(self, func, *args):
+        """ Return (func result, [(level, message)] logged by func) """
+        logging.getLogger().addFilter(self)
+        self._local.records = []
+        try:
+            return func(*args), self._local.records
+        finally:
+            self._local.records = None
+
+
+_log_capture = _LogCapture()
+
+
+def _read_actor_logged(args):
+    """ Return read_actor result along with messages it logged """
+    return _log_capture.call(read_actor, *args)
+
+
 class LeAppWorkflow(object):
     """ LeApp Worflow based on actors """
-    def __init__(self, path):
+    # how load_actors reads actor dirs: SERIAL, THREAD or PROCESS pool
+    load_mode = THREAD
+    # size of pool reading actor dirs, None for default
+    load_workers = None
+
+    def __init__(self, path, cache=True, memo=False, trace=False,
+                 journal=False, stats=False, results=False):
         self._workflow = Workflow()
         self._actors_path = path
         self._class_factory = JSONClassFactory()
         self._actors_data = {}
+        # only some targets and actors they require were loaded
+        self._partial = False
+        self._cache = ActorCache(path) if cache and path else None
+        self._memo = ResultMemo() if memo else None
+        self._trace = RunTrace() if trace else None
+        self._journal = RunJournal(path) if journal and path else None
+        self._stats = RunStats() if stats else None
+        self._results = ResultsStore() if results else None
+        self._watcher = None
 
     @property
     def workflow(self):
@@ -101,6 +374,33 @@ class LeAppWorkflow(object):
         """ Return list of actors data """
         return self._actors_data
 
+    @property
+    def memo(self):
+        """ Return actors results memo telling which actors were replayed
+        from it (cached) and which were executed on last run """
+        return self._memo
+
+    @property
+    def trace(self):
+        """ Return timing and resource usage of actors on last run """
+        return self._trace
+
+    @property
+    def journal(self):
+        """ Return journal of actors completed in last run, telling which
+        were replayed from it when it was resumed """
+        return self._journal
+
+    @property
+    def stats(self):
+        """ Return store of actors past run durations """
+        return self._stats
+
+    @property
+    def results(self):
+        """ Return store of results of past runs """
+        return self._results
+
     @property
     def actors_path(self):
         """ Return path that should be scanned for actors """
@@ -108,11 +408,22 @@ class LeAppWorkflow(object):
 
     def _add_actor(self, actor):
         """ Parse actor data and add to workflow """
+        shell_actor = self._build_actor(actor)
+        if shell_actor:
+            self.workflow.add_actor(shell_actor)
+
+    def _build_actor(self, actor):
+        """ Return workflow actor built from actor data, None if skipped """
         script = actor.script
         if not script:
             logging.warning("skip %s: no script defined", actor.name)
             return
 
+        error = _settings_error(actor)
+        if error:
+            logging.warning("skip %s: %s", actor.name, error)
+            return
+
         in_names = []
         in_annotation = {}
         if not actor.inports:
@@ -140,7 +451,7 @@ class LeAppWorkflow(object):
 
                 msg_type = self.class_factory.get_actor_class(actor.name,
                                                               ptype)
-            elif isinstance(psrc, types.StringTypes):
+            elif isinstance(psrc, six.string_types):
                 if psrc in self.actors_data:
                     if len(self.actors_data[psrc].outports) == 1:
                         oport = self.actors_data[psrc].outports[0]
@@ -193,106 +504,330 @@ class LeAppWorkflow(object):
                                 actor.name)
                 return
 
-        self.workflow.add_actor(DirAnnotatedShellActor(
+        return DirAnnotatedShellActor(
             actor.name,
             script,
             inports=in_names,
             inports_annotation=in_annotation,
             outports=out_names,
-            outports_annotation=out_annotation
-        ))
-
-    def _parse_inports(self, actor_data):
-        """ Parse inports data """
-        if actor_data.inports:
-            for port in actor_data.inports:
-                if _PORT_TYPE_KEY in port:
-                    port_json = os.path.join(actor_data.path,
-                                             port[_PORT_TYPE_KEY])
-                    if not os.path.isfile(port_json):
-                        logging.warning("skip %s: no inport descr for %s",
-                                        actor_data.name,
-                                        port[_PORT_TYPE_KEY])
-                        return False
-                    self.class_factory.add_json_class(actor_data.name,
-                                                      port_json)
+            outports_annotation=out_annotation,
+            memo=self._memo,
+            ttl=actor.ttl,
+            inports_stdin=actor.inports_stdin,
+            trace=self._trace,
+            max_output=actor.max_output,
+            timeout=actor.timeout,
+            fail_fast=actor.fail_fast,
+            cpu_time=actor.cpu_time,
+            memory=actor.memory,
+            weight=actor.weight,
+            locks=actor.locks,
+            journal=self._journal,
+            stats=self._stats
+        )
+
+    def _merge_actor(self, actor_name, read):
+        """ Add classes of actor read by read_actor to class factory and
+        actor to actors cache, return its actor data """
+        actor_data, classes_data, stats, cached = read
+        # actor read again replaces classes it was read with before
+        self.class_factory.remove_classes(actor_name)
+        if classes_data:
+            self.class_factory.add_classes_data(actor_name, classes_data)
+        if self._cache:
+            if cached:
+                self._cache.use(actor_name)
+            elif actor_data:
+                self._cache.put(actor_data, classes_data,
+                                actor_data.port_files, stats)
+        return actor_data
+
+    def _read_actor(self, actor_name):
+        """ Return parsed data of actor in actors path or None if skipped """
+        actor_path = os.path.join(self.actors_path, actor_name)
+        if not os.path.exists(actor_path):
+            logging.warning("skip %s: no such actor", actor_name)
+            return None
+        if not os.path.isdir(actor_path):
+            logging.warning("skip %s: not a dir", actor_name)
+            return None
+
+        return self._read_actor_dir(actor_name)
+
+    def _read_actor_dir(self, actor_name):
+        """ Return parsed data of actor dir or None if skipped """
+        cached = self._cache.entry(actor_name) if self._cache else None
+        return self._merge_actor(actor_name, read_actor(self.actors_path,
+                                                        actor_name, cached))
+
+    def _actor_names(self):
+        """ Return sorted names of entries in actors path and set of those
+        which are dirs """
+        if scandir is None:
+            names = sorted(os.listdir(self.actors_path))
+            dirs = set(name for name in names if os.path.isdir(
+                os.path.join(self.actors_path, name)))
+        else:
+            entries = sorted(scandir(self.actors_path),
+                             key=lambda entry: entry.name)
+            names = [entry.name for entry in entries]
+            dirs = set(entry.name for entry in entries if entry.is_dir())
+        return names, dirs
+
+    def _read_actors(self, names):
+        """ Read actors on a pool, return {name: actor data} of those not
+        skipped
+
+        Actors are merged and messages logged while reading them are logged
+        in order of names, as if they were read one by one
+        """
+        args = [(self.actors_path, name,
+                 self._cache.entry(name) if self._cache else None,
+                 bool(self._cache))
+                for name in names]
+        if self.load_mode == PROCESS:
+            pool = ProcessPoolExecutor(max_workers=self.load_workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.load_workers or
+                                      default_workers())
+        try:
+            reads = pool.map(_read_actor_logged, args)
+            actors_data = {}
+            for name, (read, records) in zip(names, reads):
+                for level, message in records:
+                    logging.log(level, message)
+                actor_data = self._merge_actor(name, read)
+                if actor_data:
+                    actors_data[name] = actor_data
+        finally:
+            pool.shutdown()
+            logging.getLogger().removeFilter(_log_capture)
+        return actors_data
+
+    def _read_required(self, targets, scanned):
+        """ Read targets and actors they name as src of their inports
+
+        Return False as soon as an inport without src or with src: '*' is
+        found, such inport may depend on any actor. Names of read actors
+        are added to scanned
+        """
+        todo = list(targets)
+        while todo:
+            actor_name = todo.pop()
+            if actor_name in scanned:
+                continue
+            scanned.add(actor_name)
 
-        return True
+            actor_data = self._read_actor(actor_name)
+            if actor_data is None:
+                continue
+            self.actors_data.update({actor_name: actor_data})
 
-    def _parse_outports(self, actor_data):
-        """ Parse outports data """
-        if actor_data.outports:
-            for port in actor_data.outports:
-                if _PORT_TYPE_KEY in port:
-                    port_json = os.path.join(actor_data.path,
-                                             port[_PORT_TYPE_KEY])
-                    if not os.path.isfile(port_json):
-                        logging.warning("skip %s: no outport descr for %s",
-                                        actor_data.name,
-                                        port[_PORT_TYPE_KEY])
-                        return False
-
-                    self.class_factory.add_json_class(actor_data.name,
-                                                      port_json)
-                else:
-                    logging.warning("skip %s: no outport descr",
-                                    actor_data.name)
+            for port in actor_data.inports:
+                src = port.get(_PORT_SRC_KEY)
+                if src is None or src == '*':
+                    logging.debug("%s may depend on any actor, "
+                                  "loading all actors", actor_name)
                     return False
-
-        else:
-            port_json = os.path.join(actor_data.path,
-                                     _DEFAULT_OUTPORT + '.json')
-            if not os.path.isfile(port_json):
-                logging.warning("skip %s: no outport provided",
-                                actor_data.name)
-                return False
-
-            outport_name = _DEFAULT_OUTPORT
-            actor_data.set_outports([{_PORT_TYPE_KEY: outport_name + '.json'}])
-            self.class_factory.add_json_class(actor_data.name,
-                                              port_json,
-                                              outport_name)
+                todo.append(src)
 
         return True
 
-    def load_actors(self):
-        """ Scan actors path and parse provided data """
+    def load_actors(self, rescan=False, targets=None):
+        """ Scan actors path and parse provided data
+
+        Unchanged actors are taken from the actors cache unless rescan is
+        True, in which case every actor is parsed again. With targets, only
+        these actors and actors they require are loaded when the
+        requirements can be told from inports src, the rest is loaded by
+        run_actors and the like when needed. Actor dirs are read on a pool
+        of load_workers, see load_mode
+        """
         if not self.actors_path or not os.path.isdir(self.actors_path):
             logging.warning("%s should be a directory",
                             self.actors_path)
             return
 
-        for actor_name in os.listdir(os.path.join(self.actors_path)):
-            actor_path = os.path.join(self.actors_path, actor_name)
-            if not os.path.isdir(actor_path):
-                logging.warning("skip %s: not a dir", actor_name)
-                continue
-
-            yaml_file = os.path.join(actor_path, _YAML_FILENAME)
-
-            actor_yaml = None
-            if os.path.isfile(yaml_file):
-                with open(yaml_file, 'r') as stream:
-                    try:
-                        actor_yaml = yaml.load(stream)
-
-                    except yaml.YAMLError as err:
-                        logging.warning("loading yaml error: %s", err)
-
-            actor_data = ActorData(actor_name,
-                                   actor_path,
-                                   actor_yaml)
-
-            parsed_inports = self._parse_inports(actor_data)
-            parsed_outports = self._parse_outports(actor_data)
-            if parsed_inports and parsed_outports:
-                self.actors_data.update({actor_name: actor_data})
+        if self._cache:
+            self._cache.load(rescan)
+
+        loaded = bool(self.actors_data)
+        scanned = set()
+        partial = targets is not None and \
+            self._read_required(targets, scanned)
+        self._partial = partial and (self._partial or not loaded)
+        if not partial:
+            names, dirs = self._actor_names()
+            todo = []
+            for actor_name in names:
+                if actor_name in scanned:
+                    continue
+                if actor_name not in dirs:
+                    logging.warning("skip %s: not a dir", actor_name)
+                    continue
+                todo.append(actor_name)
+
+            if self.load_mode == SERIAL or len(todo) < 2:
+                for actor_name in todo:
+                    actor_data = self._read_actor_dir(actor_name)
+                    if actor_data:
+                        self.actors_data.update({actor_name: actor_data})
+            else:
+                self.actors_data.update(self._read_actors(todo))
 
         self.class_factory.generate_classes()
 
-        for _, data in self.actors_data.items():
-            self._add_actor(data)
-
-    def run_actors(self):
-        """ Run workflow """
-        return self.workflow.run()
+        for actor_name in sorted(self.actors_data):
+            self._add_actor(self.actors_data[actor_name])
+
+        if self._cache:
+            # saved last so that cached actors data keep found script
+            self._cache.save(prune=not partial)
+
+    def watch(self):
+        """ Start watching actors path for changes picked up by reload() """
+        if self._watcher is None:
+            self._watcher = watch_actors(self.actors_path)
+
+    def reload(self, names=None):
+        """ Load again actors which changed, return names of rebuilt actors
+
+        Changed actor dirs are given by names or found by the watcher
+        started by watch(). Only these are parsed again and only their
+        ports and ports of actors depending on their classes are matched
+        again
+        """
+        if names is None:
+            if self._watcher is None:
+                raise ValueError("actors path not watched, call watch()")
+            names = self._watcher.changed()
+        names = set(names)
+        if not names:
+            return names
+
+        for name in names:
+            self.actors_data.pop(name, None)
+            self.class_factory.remove_classes(name)
+        for name in names:
+            if os.path.isdir(os.path.join(self.actors_path, name)):
+                actor_data = self._read_actor(name)
+                if actor_data:
+                    self.actors_data.update({name: actor_data})
+        self.class_factory.generate_classes(names)
+
+        # inports without type get their class from source actor
+        rebuilt = names | set(
+            name for name, data in self.actors_data.items()
+            if any(port.get(_PORT_SRC_KEY) in names and
+                   _PORT_TYPE_KEY not in port for port in data.inports))
+        actors = []
+        for name in rebuilt:
+            if name in self.actors_data:
+                actor = self._build_actor(self.actors_data[name])
+                if actor:
+                    actors.append(actor)
+        self.workflow.replace_actors(rebuilt, actors)
+
+        if self._cache:
+            self._cache.save(prune=False)
+        return rebuilt
+
+    def required(self, targets=None):
+        """ Return workflow of targets and actors they require, the whole
+        workflow if targets is None
+
+        If no actors were loaded yet, only targets and actors they require
+        are loaded (all actors without targets). If just some were, all
+        actors are loaded unless targets were loaded already
+        """
+        if not self.actors_data:
+            self.load_actors(targets=targets)
+        elif self._partial and (targets is None or
+                                not set(targets) <= set(self.actors_data)):
+            self.load_actors()
+        if targets is None:
+            return self.workflow
+        return self.workflow.required(targets)
+
+    def _reset_run(self, workflow, resume=False):
+        """ Clear data collected by previous run """
+        if resume and not self._journal:
+            raise ValueError("resuming needs a run journal, use "
+                             "LeAppWorkflow(path, journal=True)")
+        if self._journal:
+            self._journal.start(resume)
+        if self._memo:
+            self._memo.reset()
+        if self._trace:
+            self._trace.reset(workflow.dependencies())
+
+    def _durations(self, workflow):
+        """ Return estimated durations of actors to prioritize them by """
+        if not self._stats:
+            return None
+        return self._stats.estimates(workflow.actors.values())
+
+    def _finish_run(self):
+        """ Store data collected by run """
+        if self._journal:
+            self._journal.close()
+        if self._stats:
+            self._stats.save()
+
+    def _store_results(self, results):
+        """ Store results of successful run """
+        if self._results:
+            self._results.add_run(results)
+
+    def estimate(self, mode=SERIAL, max_workers=None, targets=None,
+                 budget=None):
+        """ Return seconds run_actors with these arguments is expected to
+        take, judging by durations of past runs """
+        workflow = self.required(targets)
+        stats = self._stats or RunStats()
+        return workflow.estimate(stats.estimates(workflow.actors.values()),
+                                 mode, max_workers, budget)
+
+    def run_actors(self, mode=SERIAL, max_workers=None, sudo_workers=0,
+                   targets=None, budget=None, resume=False):
+        """ Run workflow
+
+        With sudo_workers, scripts are executed by that many privileged
+        helpers started once for the whole run instead of sudo per actor.
+        With targets, only these actors and actors they depend on are run
+        (loaded if they were not loaded yet, see required()). budget
+        bounds the weight of actors running at once, see Workflow.run.
+        With resume, actors which completed in the last run, as recorded
+        in the run journal, are replayed instead of run again. With run
+        statistics, actors heading the longest chains by past durations are
+        started first. With results store, results are stored as a run
+        against host ''
+        """
+        workflow = self.required(targets)
+        self._reset_run(workflow, resume)
+        durations = self._durations(workflow)
+        try:
+            if not sudo_workers:
+                results = workflow.run(mode, max_workers, budget=budget,
+                                       durations=durations)
+            else:
+                with PrivilegedExecutor(sudo_workers) as executor:
+                    results = workflow.run(mode, max_workers, executor,
+                                           budget, durations)
+        finally:
+            self._finish_run()
+        self._store_results(results)
+        return results
+
+    def run_actors_async(self, max_concurrency=None, targets=None,
+                         budget=None, resume=False):
+        """ Return coroutine running workflow on asyncio event loop """
+        workflow = self.required(targets)
+        self._reset_run(workflow, resume)
+        coro = workflow.run_async(max_concurrency, budget,
+                                  self._durations(workflow))
+        if not self._journal and not self._stats and not self._results:
+            return coro
+
+        from .aio import finishing
+        return finishing(coro, self._finish_run, self._store_results)
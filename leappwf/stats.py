@@ -0,0 +1,148 @@
+""" Durations of past actor runs, to estimate how long actors will take """
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .journal import file_key
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS runs ('
+    ' actor TEXT NOT NULL,'
+    ' script TEXT NOT NULL,'
+    ' finished REAL NOT NULL,'
+    ' duration REAL NOT NULL,'
+    ' failed INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS runs_actor ON runs (actor, script, finished)',
+)
+
+
+class RunStats(object):
+    """ SQLite store of durations and outcomes of actor scripts runs
+
+    Runs are keyed by actor name and hash of its script. Durations recorded
+    during a workflow run are kept in memory and stored by save()
+    """
+    stats_data_path = '~/.leappwf/run_stats.sqlite'
+    # runs of an actor estimates are based on
+    history = 10
+    # runs of an actor kept in store
+    keep_runs = 100
+    # seconds assumed for actors never run when nothing else is known
+    default_duration = 1.0
+
+    def __init__(self, stats_path=None):
+        self._stats_path = os.path.expanduser(stats_path or
+                                              self.stats_data_path)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._script_keys = {}
+
+    @property
+    def stats_path(self):
+        """ Return path to SQLite database """
+        return self._stats_path
+
+    def _connect(self):
+        dirname = os.path.dirname(self._stats_path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        conn = sqlite3.connect(self._stats_path)
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    def _script_key(self, script):
+        """ Return hash of script, computed once per workflow run, from
+        estimates() at its start until save() at its end """
+        key = self._script_keys.get(script)
+        if key is None:
+            try:
+                key = file_key(script)
+            except (IOError, OSError):
+                key = ''
+            self._script_keys[script] = key
+        return key
+
+    def add(self, name, script, duration, failed=False):
+        """ Record run of actor script, to be stored by save() """
+        with self._lock:
+            self._pending.append((name, self._script_key(script),
+                                  time.time(), duration, int(bool(failed))))
+
+    def save(self):
+        """ Store recorded runs, dropping runs of their actors beyond
+        keep_runs """
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._script_keys = {}
+        if not rows:
+            return
+
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany('INSERT INTO runs VALUES (?, ?, ?, ?, ?)',
+                                     rows)
+                    for name in set(row[0] for row in rows):
+                        conn.execute(
+                            'DELETE FROM runs WHERE actor = ? AND rowid NOT IN'
+                            ' (SELECT rowid FROM runs WHERE actor = ?'
+                            '  ORDER BY finished DESC LIMIT ?)',
+                            (name, name, self.keep_runs))
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as err:
+            logging.warning("Failed to store run statistics: %s", err)
+
+    def _estimate(self, conn, name, script_key):
+        """ Return mean of latest durations of actor, None if never run
+
+        Runs of the current script are preferred, successful runs are
+        preferred over failed ones
+        """
+        for where, args in (('script = ? AND NOT failed', (script_key,)),
+                            ('script = ?', (script_key,)),
+                            ('NOT failed', ()),
+                            ('1', ())):
+            durations = [row[0] for row in conn.execute(
+                'SELECT duration FROM runs WHERE actor = ? AND ' + where +
+                ' ORDER BY finished DESC LIMIT ?',
+                (name,) + args + (self.history,))]
+            if durations:
+                return sum(durations) / len(durations)
+        return None
+
+    def estimates(self, actors):
+        """ Return dict of actor names to estimated durations in seconds
+
+        Actors never run are assumed to take the mean of the others, or
+        default_duration
+        """
+        actors = [actor for actor in actors
+                  if getattr(actor, 'script', None)]
+        # scripts may have changed since the last estimates
+        with self._lock:
+            self._script_keys = {}
+        known = {}
+        try:
+            conn = self._connect()
+            try:
+                for actor in actors:
+                    duration = self._estimate(conn, actor.name,
+                                              self._script_key(actor.script))
+                    if duration is not None:
+                        known[actor.name] = duration
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as err:
+            logging.warning("Failed to read run statistics: %s", err)
+
+        unknown = self.default_duration
+        if known:
+            unknown = sum(known.values()) / len(known)
+        return dict((actor.name, known.get(actor.name, unknown))
+                    for actor in actors)
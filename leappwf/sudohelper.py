@@ -0,0 +1,89 @@
+""" Helper running actor scripts on behalf of PrivilegedExecutor
+
+Started once with sudo and kept running for a whole workflow run. Reads
+length prefixed pickled (script, inports_file, inports_data, limits)
+requests from stdin and writes back pickled
+(error, (returncode, stdout, stderr, killed)).
+
+This file is executed directly, not as part of the leappwf package. Besides
+the standard library it imports only the limits and output modules next to
+it, which must keep to the standard library themselves.
+"""
+
+import os
+import pickle
+import struct
+import sys
+from subprocess import Popen, PIPE
+
+try:
+    from .limits import (CANCELLED, ScriptKiller, exceeded, output_limits,
+                         preexec, reap)
+    from .output import communicate
+except (ImportError, ValueError):
+    # executed directly, modules are next to this file in sys.path
+    from limits import (CANCELLED, ScriptKiller, exceeded, output_limits,
+                        preexec, reap)
+    from output import communicate
+
+_HEADER = struct.Struct('>I')
+# protocol readable by both Python 2 and 3 ends
+PICKLE_PROTOCOL = 2
+
+
+def read_msg(stream):
+    """ Read one message, return None on end of stream """
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    size, = _HEADER.unpack(header)
+    return pickle.loads(stream.read(size))
+
+
+def write_msg(stream, msg):
+    """ Write one message """
+    data = pickle.dumps(msg, PICKLE_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def run(script, inports_file, inports_data, limits=None):
+    """ Run script the way run_script does, just without sudo
+
+    Files output is spilled to are given to the user who ran sudo
+    """
+    owner = os.environ.get('SUDO_UID')
+    max_size, spill_size = output_limits(limits)
+    cmd = [script] if inports_data is not None else [script, inports_file]
+    child = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                  preexec_fn=preexec(limits))
+    killer = ScriptKiller(child.pid, (limits or {}).get('timeout'))
+    try:
+        out, err = communicate(child, inports_data, max_size, spill_size,
+                               int(owner) if owner else None)
+        rusage = reap(child)
+    except BaseException:
+        # helper interrupted, do not leave the script behind
+        killer.kill(CANCELLED)
+        raise
+    finally:
+        killer.close()
+    killed = killer.reason or exceeded(limits, child.returncode, rusage)
+    return (child.returncode, out, err, killed)
+
+
+def main():
+    instream = getattr(sys.stdin, 'buffer', sys.stdin)
+    outstream = getattr(sys.stdout, 'buffer', sys.stdout)
+    while True:
+        request = read_msg(instream)
+        if request is None:
+            break
+        try:
+            write_msg(outstream, (None, run(*request)))
+        except (OSError, IOError) as err:
+            write_msg(outstream, (err, None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+""" Find changed actor directories """
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+
+# inotify(7) constants
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_ENTRIES_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+_ACTOR_MASK = _ENTRIES_MASK | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | \
+    IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct('iIII')
+
+
+def _actor_names(path):
+    return set(os.listdir(path))
+
+
+def actor_stamp(actor_path):
+    """ Return mtimes and sizes of actor dir and files in it, None if
+    there is no such dir """
+    try:
+        entries = sorted(os.listdir(actor_path))
+    except OSError:
+        return None
+
+    stamp = []
+    for entry in [''] + entries:
+        try:
+            stat = os.stat(os.path.join(actor_path, entry))
+        except OSError:
+            continue
+        stamp.append((entry, stat.st_mtime, stat.st_size))
+    return stamp
+
+
+class PollingWatcher(object):
+    """ Find changed actor dirs by comparing their files mtimes and sizes """
+
+    def __init__(self, path):
+        self._path = path
+        self._stamps = self._scan()
+
+    def _scan(self):
+        return dict((name, actor_stamp(os.path.join(self._path, name)))
+                    for name in _actor_names(self._path))
+
+    def changed(self):
+        """ Return names of actor dirs changed since last call """
+        stamps = self._scan()
+        changed = set(name for name in set(stamps) | set(self._stamps)
+                      if stamps.get(name) != self._stamps.get(name))
+        self._stamps = stamps
+        return changed
+
+    def close(self):
+        """ Stop watching """
+        pass
+
+
+class InotifyWatcher(object):
+    """ Find changed actor dirs from inotify events, without scanning """
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._path = path
+        # watched actor names by watch descriptor, None for path itself
+        self._watches = {}
+        self._changed = set()
+        try:
+            self._watch(path, None, _ENTRIES_MASK)
+            for name in _actor_names(path):
+                self._watch_actor(name)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, path, name, mask):
+        if not isinstance(path, bytes):
+            path = path.encode(sys.getfilesystemencoding())
+        wd = self._add_watch(self._fd, path, mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._watches[wd] = name
+
+    def _watch_actor(self, name):
+        actor_path = os.path.join(self._path, name)
+        if os.path.isdir(actor_path):
+            try:
+                self._watch(actor_path, name, _ACTOR_MASK)
+            except OSError as err:
+                # removed meanwhile
+                logging.debug("not watching %s: %s", actor_path, err)
+
+    def _read(self):
+        """ Return data of pending events """
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 64 * 1024)
+            except OSError as err:
+                if err.errno == errno.EAGAIN:
+                    break
+                raise
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def changed(self):
+        """ Return names of actor dirs changed since last call """
+        data = self._read()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, size = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + size].rstrip(b'\0')
+            offset += size
+            if not isinstance(name, str):
+                name = name.decode(sys.getfilesystemencoding())
+
+            if mask & IN_Q_OVERFLOW:
+                # events lost
+                self._changed.update(_actor_names(self._path))
+                self._changed.update(name for name in self._watches.values()
+                                     if name is not None)
+            elif wd not in self._watches:
+                continue
+            elif self._watches[wd] is None:
+                self._changed.add(name)
+                if mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR:
+                    self._watch_actor(name)
+            else:
+                self._changed.add(self._watches[wd])
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def close(self):
+        """ Stop watching """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def watch_actors(path):
+    """ Return watcher of actor dirs in path, using inotify if available """
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError, TypeError) as err:
+        logging.debug("inotify not available, polling %s: %s", path, err)
+        return PollingWatcher(path)
@@ -1,6 +1,17 @@
 """ Handle actors execution using Workflow programming """
 
-from .actor import AnnotatedFuncActor
+import heapq
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait)
+
+from .actor import AnnotatedFuncActor, ScriptGroups, failed, run_script
 from .msgtypes import ShellCommandStatus, Trigger
 from .portannotation import (
     All,
@@ -8,57 +19,536 @@ from .portannotation import (
     FinalPortAnnotation,
     InitialPortAnnotation,
     PortAnnotation,
-    connectactors)
+    PortMatcher)
+from .plan import START, Plan, signature
+
+# Execution modes accepted by Workflow.run
+SERIAL = 'serial'
+THREAD = 'thread'
+PROCESS = 'process'
+
+# seconds between checks of process pool workers for cancelled run, and of
+# interrupted thread pool runs
+CANCEL_POLL = 0.1
+
+
+def default_workers():
+    """ Return number of actors run at once when max_workers is not given,
+    the way concurrent.futures sizes its thread pools """
+    try:
+        cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpus = 1
+    return min(32, cpus + 4)
+
+
+def start_workflow(initial):
+    """ Simple function to trigger all other actors """
+    return Trigger()
+
+
+def end_workflow(stats):
+    """ Simple function to unify all actors output
+
+    Payloads are shared with the messages, not copied
+    """
+    ret = {}
+    for msg in stats.values():
+        ret.update({msg.srcname: {'payload': msg.payload,
+                                  'errorinfo': msg.errorinfo}})
+    return ret
+
+
+def _default_actors():
+    """ Create actors starting and finishing the workflow """
+    def_start = AnnotatedFuncActor(
+        func=start_workflow,
+        inports=['initial'],
+        inports_annotations={'initial': InitialPortAnnotation()},
+        outports=['initial_out'],
+        outports_annotations={'initial_out': PortAnnotation(Trigger)}
+    )
+
+    def_end = AnnotatedFuncActor(
+        func=end_workflow,
+        name='default_end',
+        inports=['stats'],
+        inports_annotations={'stats': DstPortAnnotation(ShellCommandStatus,
+                                                        All)},
+        outports=['final_out'],
+        outports_annotations={'final_out': FinalPortAnnotation}
+    )
+    return def_start, def_end
+
+
+def _cancellable_script(cancel, script, inports_file, inports_data=None,
+                        limits=None):
+    """ Run script in a process pool worker, killing it once cancel (an
+    Event of a multiprocessing manager) is set """
+    groups = ScriptGroups()
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            if cancel.wait(CANCEL_POLL):
+                groups.cancel()
+                return
+
+    watcher = threading.Thread(target=watch)
+    watcher.daemon = True
+    watcher.start()
+    try:
+        return groups.runner(run_script)(script, inports_file, inports_data,
+                                         limits)
+    finally:
+        done.set()
+
+
+def _pool_runner(pool, cancel=None):
+    """ Return script runner delegating execution to a process pool,
+    scripts are killed once cancel, if given, is set """
+    def runner(script, inports_file, inports_data=None, limits=None):
+        if cancel is None:
+            return pool.submit(run_script, script, inports_file,
+                               inports_data, limits).result()
+        return pool.submit(_cancellable_script, cancel, script, inports_file,
+                           inports_data, limits).result()
+    return runner
+
+
+class Budget(object):
+    """ Weight of running actors within capacity and locks they hold
+
+    An actor fits when none of its locks is held and its weight fits into
+    the capacity left, or when nothing runs at all so that actors heavier
+    than the whole capacity still get to run. None capacity is no limit
+    """
+
+    def __init__(self, capacity=None):
+        self._capacity = capacity
+        self._used = 0
+        self._running = 0
+        self._held = set()
+
+    def fits(self, actor):
+        """ Return True if actor may start now """
+        if self._held.intersection(actor.locks):
+            return False
+        return self._capacity is None or not self._running or \
+            self._used + actor.weight <= self._capacity
+
+    def take(self, actor):
+        """ Account for started actor """
+        self._used += actor.weight
+        self._running += 1
+        self._held.update(actor.locks)
+
+    def release(self, actor):
+        """ Account for finished actor """
+        self._used -= actor.weight
+        self._running -= 1
+        self._held.difference_update(actor.locks)
+
+
+class Dispatch(object):
+    """ Actors of a workflow run waiting to be started on a worker pool
+
+    Ready actors are dispatched by priority (see Plan.by_priority) as long
+    as they fit into the budget (see Budget). Actors whose required actors
+    failed are skipped instead, as is everything not started yet once a
+    fail-fast actor failed. Pools of threads and asyncio tasks share this
+    and differ only in how they run dispatched actors
+    """
+
+    def __init__(self, workflow, plan, budget=None, durations=None):
+        self._actors = workflow.actors
+        self._plan = plan
+        self._outputs = {START: Trigger()}
+        self._pending = OrderedDict((name, plan.deps[name])
+                                    for name in plan.by_priority(durations))
+        self._budget = Budget(budget)
+        self._done = set()
+        # name of fail-fast actor whose failure cancelled the run
+        self.cancelled_by = None
+
+    @property
+    def pending(self):
+        """ Return True if some actors were not dispatched yet """
+        return bool(self._pending)
+
+    def _store(self, actor, res):
+        self._plan.store_outputs(actor, res, self._outputs)
+        self._done.add(actor.name)
+
+    def ready(self):
+        """ Return list of (actor, inport values) of actors to start now,
+        their weight is taken from the budget """
+        started = []
+        for name, deps in list(self._pending.items()):
+            if not deps <= self._done:
+                continue
+            actor = self._actors[name]
+            args = self._plan.inportargs(name, self._outputs)
+            res = actor.skip(args, self.cancelled_by)
+            if res is not None:
+                del self._pending[name]
+                self._store(actor, res)
+                continue
+            if not self._budget.fits(actor):
+                continue
+            del self._pending[name]
+            self._budget.take(actor)
+            started.append((actor, args))
+        return started
+
+    def finished(self, actor, res):
+        """ Account for dispatched actor which returned outports messages
+        res, return True if its failure cancels the run """
+        self._budget.release(actor)
+        self._store(actor, res)
+        if self.cancelled_by is None and actor.fail_fast and failed(res):
+            logging.warning("%s failed, cancelling run", actor.name)
+            self.cancelled_by = actor.name
+            return True
+        return False
+
+    def results(self):
+        """ Return results of the run, see end_workflow """
+        return end_workflow(self._plan.results(self._outputs))
 
 
 class Workflow(object):
-    """ Manage dependencies between actors and execute workflow """
+    """ Manage dependencies between actors and execute workflow
+
+    Port matching is done once, when the workflow is compiled into a Plan
+    run by every following run(). Actors added or replaced afterwards only
+    get their own ports matched
+    """
 
     def __init__(self):
         self._actors = {}
+        self._plan = None
+        # state of compiled workflow kept for replacing actors
+        self._defaults = None
+        self._matcher = None
+        self._matches = None
+
+    @property
+    def actors(self):
+        """ Return dict of workflow actors by name """
+        return self._actors
 
     def add_actor(self, actor):
         """ Add actor to workflow """
-        self._actors[actor.name] = actor
-
-    def run(self):
-        """ Execute check workflow """
-        def start_workflow(initial):
-            """ Simple function to trigger all other actors """
-            return Trigger()
-
-        def end_workflow(stats):
-            """ Simple function to unify all actors output """
-            ret = {}
-            for msg in stats.values():
-                ret.update({msg.srcname: {'payload': msg.payload,
-                                          'errorinfo': msg.errorinfo}})
-            return ret
-
-        def_start = AnnotatedFuncActor(
-            func=start_workflow,
-            inports=['initial'],
-            inports_annotations={'initial': InitialPortAnnotation()},
-            outports=['initial_out'],
-            outports_annotations={'initial_out': PortAnnotation(Trigger)}
-        )
-
-        def_end = AnnotatedFuncActor(
-            func=end_workflow,
-            name='default_end',
-            inports=['stats'],
-            inports_annotations={'stats': DstPortAnnotation(ShellCommandStatus,
-                                                            All)},
-            outports=['final_out'],
-            outports_annotations={'final_out': FinalPortAnnotation}
-        )
-
-        self.add_actor(def_start)
-        self.add_actor(def_end)
-
-        connectactors(self._actors.values())
-
-        workflow = self._actors['default_end'].get_workflow()
-
-        ret_workflow = workflow(initial=True)
-        return ret_workflow['final_out'].pop()
+        self.replace_actors([actor.name], [actor])
+
+    def replace_actors(self, names, actors):
+        """ Remove actors of given names and add actors """
+        if self._matcher is None:
+            for name in names:
+                self._actors.pop(name, None)
+            for actor in actors:
+                self._actors[actor.name] = actor
+            self._plan = None
+            return
+
+        affected = set()
+        for name in names:
+            old = self._actors.pop(name, None)
+            if old is not None:
+                affected.update(self._matcher.remove(old))
+                for inport in old.inports.values():
+                    self._matches.pop(inport, None)
+        for actor in actors:
+            self._actors[actor.name] = actor
+            affected.update(self._matcher.add(actor))
+
+        def_end = self._defaults[1]
+        for inport in affected:
+            owner = inport.owner
+            if owner is def_end or self._actors.get(owner.name) is owner:
+                self._matches[inport] = self._matcher.match(inport)
+        self._plan = self._planned()
+
+    def compile(self):
+        """ Return execution plan of workflow """
+        if self._plan is None:
+            self._plan = self._compile()
+        return self._plan
+
+    def use_plan(self, plan):
+        """ Use plan compiled earlier, e.g. loaded from disk
+
+        Return False, leaving plan unused, if it was compiled for actors
+        with other ports
+        """
+        if not plan.fits(self._actors.values()):
+            return False
+        self._plan = plan
+        return True
+
+    def dependencies(self):
+        """ Return dict of actor names to names of actors they depend on """
+        return dict(self.compile().deps)
+
+    def required(self, targets):
+        """ Return workflow of target actors and all actors they depend on """
+        unknown = set(targets) - set(self.actors)
+        if unknown:
+            raise ValueError("unknown actors: {}".format(
+                ', '.join(sorted(unknown))))
+
+        plan = self.compile()
+        names = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in names:
+                names.add(name)
+                todo.extend(plan.deps.get(name, ()))
+
+        workflow = Workflow()
+        for name in names:
+            workflow.add_actor(self.actors[name])
+        workflow._plan = plan.subset(names)
+        return workflow
+
+    def run(self, mode=SERIAL, max_workers=None, runner=None, budget=None,
+            durations=None):
+        """ Execute check workflow
+
+        mode is SERIAL to run actors one after another, THREAD to run every
+        ready actor at once on a pool of max_workers threads (see
+        default_workers) or PROCESS to additionally run actor scripts on a
+        process pool. runner, if given,
+        replaces run_script for executing actor scripts (PROCESS mode then
+        behaves as THREAD). In THREAD and PROCESS modes, actors running at
+        once weigh at most budget (max_workers by default) and never share
+        a lock. Given durations (dict of actor names to estimated seconds),
+        ready actors heading longer chains of actors are started first
+        """
+        if mode not in (SERIAL, THREAD, PROCESS):
+            raise ValueError("unknown workflow mode: {}".format(mode))
+
+        plan = self.compile()
+        if mode == SERIAL:
+            return self._run_serial(plan, runner)
+        return self._run_parallel(plan, mode, max_workers, runner, budget,
+                                  durations)
+
+    def run_async(self, max_concurrency=None, budget=None, durations=None):
+        """ Return coroutine executing workflow on asyncio event loop
+
+        At most max_concurrency actor scripts run at once (unlimited if None)
+        and actors running at once weigh at most budget (max_concurrency by
+        default) and never share a lock. durations are used as by run()
+        """
+        from .aio import run_workflow
+        return run_workflow(self, max_concurrency, budget, durations)
+
+    def estimate(self, durations, mode=SERIAL, max_workers=None,
+                 budget=None):
+        """ Return seconds run() with these arguments is expected to take
+
+        The run is simulated with actors taking given durations (dict of
+        actor names to seconds), as if none of them failed
+        """
+        plan = self.compile()
+        if mode == SERIAL:
+            return sum(durations.get(name, 0) for name in plan.order)
+
+        max_workers = max_workers or default_workers()
+        budget = Budget(max_workers if budget is None else budget)
+        pending = OrderedDict((name, plan.deps[name])
+                              for name in plan.by_priority(durations))
+        # (end, name) of running actors
+        running = []
+        done = set()
+        now = 0.0
+        while pending:
+            for name, deps in list(pending.items()):
+                actor = self.actors[name]
+                if deps <= done and budget.fits(actor) and \
+                        len(running) < max_workers:
+                    del pending[name]
+                    budget.take(actor)
+                    heapq.heappush(running,
+                                   (now + durations.get(name, 0), name))
+            if not running:
+                break
+            now, name = heapq.heappop(running)
+            budget.release(self.actors[name])
+            done.add(name)
+        return max([now] + [end for end, _ in running])
+
+    def _compile(self):
+        """ Match ports of actors and return Plan of their execution """
+        self._defaults = _default_actors()
+        self._matcher = PortMatcher()
+        self._matches = {}
+        actors = list(self._actors.values()) + list(self._defaults)
+        for actor in actors:
+            self._matcher.add(actor)
+        for actor in actors:
+            for inport in self._matcher.inports(actor):
+                self._matches[inport] = self._matcher.match(inport)
+        return self._planned()
+
+    def _planned(self):
+        """ Return Plan of execution of actors with current port matches """
+        def_start, def_end = self._defaults
+        actors = list(self._actors.values())
+        matches = self._matches
+
+        def sources(inport):
+            return [START if op.owner is def_start else (op.owner.name,
+                                                         op.name)
+                    for op in matches.get(inport, [])]
+
+        deps = self._dependencies(actors, matches, def_start)
+        order = self._order(deps)
+        bindings = {}
+        for name in order:
+            inports = self._actors[name].inports.values()
+            bindings[name] = [(inport.annotation.srcname == All,
+                               sources(inport))
+                              for inport in inports]
+        return Plan(order,
+                    dict((name, deps[name]) for name in order),
+                    bindings,
+                    sources(def_end.inports.at(0)),
+                    signature(actors))
+
+    def _run_serial(self, plan, runner=None):
+        """ Execute actors one after another in plan order
+
+        Actors whose required actors failed are not run, nor is anything
+        after a failed fail-fast actor
+        """
+        outputs = {START: Trigger()}
+        cancelled_by = None
+        for name in plan.order:
+            actor = self.actors[name]
+            args = plan.inportargs(name, outputs)
+            res = actor.skip(args, cancelled_by)
+            if res is None:
+                res = actor.execute(args, runner)
+                if actor.fail_fast and failed(res):
+                    logging.warning("%s failed, cancelling run", name)
+                    cancelled_by = name
+            plan.store_outputs(actor, res, outputs)
+        return end_workflow(plan.results(outputs))
+
+    def _run_parallel(self, plan, mode, max_workers, runner=None,
+                      budget=None, durations=None):
+        """ Execute workflow running actors dispatched (see Dispatch) on a
+        worker pool
+
+        Failure of a fail-fast actor kills scripts still running, on the
+        process pool too, but not scripts of a given runner outside of this
+        process
+        """
+        max_workers = max_workers or default_workers()
+        procpool = manager = cancel = None
+        if mode == PROCESS and runner is None:
+            if any(self.actors[name].fail_fast for name in plan.order):
+                # pool workers watch the event to kill their scripts
+                manager = multiprocessing.Manager()
+                cancel = manager.Event()
+            procpool = ProcessPoolExecutor(max_workers=max_workers)
+            runner = _pool_runner(procpool, cancel)
+        groups = ScriptGroups()
+        runner = groups.runner(runner or run_script)
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        dispatch = Dispatch(self, plan,
+                            max_workers if budget is None else budget,
+                            durations)
+        try:
+            running = {}
+            while dispatch.pending or running:
+                for actor, args in dispatch.ready():
+                    running[pool.submit(actor.execute, args, runner)] = actor
+                if not running:
+                    continue
+
+                # with a timeout, as waits without one are not interrupted
+                # by Ctrl-C on Python 2
+                finished, _ = wait(running, CANCEL_POLL, FIRST_COMPLETED)
+                for future in finished:
+                    if dispatch.finished(running.pop(future),
+                                         future.result()):
+                        groups.cancel()
+                        if cancel is not None:
+                            cancel.set()
+        except BaseException:
+            # interrupted, e.g. by Ctrl-C, which scripts in sessions of their
+            # own do not get; pool workers get it from the terminal
+            groups.cancel()
+            raise
+        finally:
+            pool.shutdown()
+            if procpool:
+                procpool.shutdown()
+            if manager:
+                manager.shutdown()
+
+        return dispatch.results()
+
+    @staticmethod
+    def _dependencies(actors, matches, def_start):
+        """ Return dict of actor names to set of actor names they depend on
+
+        Actors with an inport not connected to any outport would never be
+        triggered, so they are dropped along with their dependents
+        """
+        deps = {}
+        for actor in actors:
+            deps[actor.name] = set()
+            for inport in actor.inports.values():
+                outports = matches.get(inport, [])
+                if not outports and inport.annotation.srcname != All:
+                    logging.warning("skip %s: inport %s not connected",
+                                    actor.name, inport.name)
+                    deps.pop(actor.name)
+                    break
+                deps[actor.name].update(op.owner.name for op in outports
+                                        if op.owner is not def_start)
+
+        dropped = True
+        while dropped:
+            dropped = [name for name, names in deps.items()
+                       if not names <= set(deps)]
+            for name in dropped:
+                logging.warning("skip %s: required actor not scheduled", name)
+                deps.pop(name)
+
+        return deps
+
+    @staticmethod
+    def _order(deps):
+        """ Return actor names, each one after actors it depends on
+
+        Actors depending on each other in a cycle are left out
+        """
+        dependents = dict((name, []) for name in deps)
+        for name, names in deps.items():
+            for dep in names:
+                dependents[dep].append(name)
+
+        waiting = dict((name, len(names)) for name, names in deps.items())
+        ready = sorted((name for name, count in waiting.items()
+                        if not count), reverse=True)
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in dependents[name]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    ready.append(dependent)
+
+        if len(order) < len(deps):
+            logging.warning("actors not run for cyclic deps: %s",
+                            sorted(set(deps) - set(order)))
+        return order
@@ -40,7 +40,15 @@ setup(
         "ipyparallel",
         "pyyaml",
         "jsonschema",
+        "six",
+        "futures; python_version < '3'",
     ],
 
+    entry_points={
+        'console_scripts': [
+            'leappwf = leappwf.cli:main',
+        ],
+    },
+
     zip_safe=False,
 )
@@ -0,0 +1 @@
+""" Tests of LeApp Workflow module """
@@ -0,0 +1,69 @@
+""" Helpers shared by tests """
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+# directory leappwf package is imported from
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# sample actors shipped with the module
+EXAMPLE_ACTORS = os.path.join(TOP, 'example', 'actors')
+
+# sudo running the command as the current user
+SUDO = '#!/bin/sh\nexec "$@"\n'
+
+
+def outcomes(results):
+    """ Return dict of actor names in workflow results to True if they
+    succeeded """
+    return dict((name, not data['errorinfo'])
+                for name, data in results.items())
+
+
+class ActorsTestCase(unittest.TestCase):
+    """ Test case with HOME in a temporary directory, so that caches and
+    journals of tests stay there, and a sudo stub first on PATH """
+    sudo = SUDO
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='leappwf_test_')
+        bindir = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(bindir)
+        self.write_script(os.path.join(bindir, 'sudo'), self.sudo)
+        self._environ = dict(os.environ)
+        os.environ['HOME'] = self.tmpdir
+        os.environ['PATH'] = bindir + os.pathsep + os.environ.get('PATH', '')
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self._environ)
+        shutil.rmtree(self.tmpdir)
+
+    @staticmethod
+    def write_script(path, text):
+        """ Write executable script """
+        with open(path, 'w') as stream:
+            stream.write(text)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def copy_actors(self, path=EXAMPLE_ACTORS):
+        """ Return path to a copy of actors tree which tests may change """
+        actors_path = os.path.join(self.tmpdir, 'actors')
+        shutil.copytree(path, actors_path)
+        return actors_path
+
+
+def make_actor(actors_path, name, script, decl=''):
+    """ Create actor with one outport running shell script, decl is added
+    to its actordecl.yaml """
+    actor_path = os.path.join(actors_path, name)
+    os.makedirs(actor_path)
+    with open(os.path.join(actor_path, name + '.json'), 'w') as stream:
+        stream.write('{"superclass": "ShellCommandStatus"}')
+    with open(os.path.join(actor_path, 'actordecl.yaml'), 'w') as stream:
+        stream.write(decl + 'outports:\n  - type: {}.json\n'.format(name))
+    ActorsTestCase.write_script(os.path.join(actor_path, name + '.sh'),
+                                '#!/bin/sh\n' + script + '\n')
@@ -0,0 +1,119 @@
+""" Tests of actors running scripts """
+
+import logging
+import os
+import tempfile
+import unittest
+
+from leappwf.actor import OutputLimitError, PrereqError
+from leappwf.msgtypes import ShellCommandStatus, Trigger
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor
+
+
+class MultiOutportTest(ActorsTestCase):
+
+    def setUp(self):
+        super(MultiOutportTest, self).setUp()
+        logging.disable(logging.WARNING)
+        actor_path = os.path.join(self.tmpdir, 'actors', 'multi')
+        os.makedirs(actor_path)
+        for name in ('first', 'second', 'third'):
+            with open(os.path.join(actor_path, name + '.json'), 'w') as f:
+                f.write('{"superclass": "ShellCommandStatus"}')
+        with open(os.path.join(actor_path, 'actordecl.yaml'), 'w') as f:
+            f.write('outports:\n'
+                    '  - type: first.json\n'
+                    '  - type: second.json\n'
+                    '  - type: third.json\n')
+        self.script = os.path.join(actor_path, 'multi.sh')
+        self.write_script(self.script, '#!/bin/sh\necho \'{"outports": '
+                          '{"first": 1, "second": [2]}}\'\n')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(MultiOutportTest, self).tearDown()
+
+    def actor(self):
+        wf = LeAppWorkflow(os.path.join(self.tmpdir, 'actors'), cache=False)
+        wf.load_actors()
+        return wf.workflow.actors['multi']
+
+    def test_message_per_outport(self):
+        msgs = self.actor().execute([Trigger()])
+        self.assertEqual(len(msgs), 3)
+        self.assertEqual([msg.payload for msg in msgs], [1, [2], None])
+        self.assertEqual([type(msg).__name__ for msg in msgs],
+                         ['first', 'second', 'third'])
+        for msg in msgs:
+            self.assertIsInstance(msg, ShellCommandStatus)
+            self.assertEqual(msg.srcname, 'multi')
+            self.assertFalse(msg.errorinfo)
+
+    def test_script_error(self):
+        self.write_script(self.script, '#!/bin/sh\necho oops >&2\nexit 1\n')
+        msgs = self.actor().execute([Trigger()])
+        self.assertEqual(len(msgs), 3)
+        for msg in msgs:
+            self.assertEqual(msg.errorinfo, b'oops\n')
+            self.assertIsNone(msg.payload)
+
+    def test_skipped(self):
+        failed = ShellCommandStatus('other', 'failed', None)
+        msgs = self.actor().skip([failed])
+        self.assertEqual(len(msgs), 3)
+        for msg in msgs:
+            self.assertIsInstance(msg.errorinfo, PrereqError)
+
+
+class OutputTest(ActorsTestCase):
+    """ Output of scripts spilled to files or over its limit """
+
+    # prints outports after a large member of the JSON document on stdout,
+    # and lots of lines on stderr
+    SCRIPT = ('echo \'{"log": [\'; i=0; while [ $i -lt 1000 ]; do '
+              'echo "\\"log line $i\\","; echo "err line $i" >&2; '
+              'i=$((i + 1)); done; '
+              'echo \'""], "outports": {"noisy": [1, 2]}}\'')
+
+    def setUp(self):
+        super(OutputTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self._tempdir = tempfile.tempdir
+        self.spill_dir = os.path.join(self.tmpdir, 'spill')
+        os.mkdir(self.spill_dir)
+        tempfile.tempdir = self.spill_dir
+
+    def tearDown(self):
+        tempfile.tempdir = self._tempdir
+        logging.disable(logging.NOTSET)
+        super(OutputTest, self).tearDown()
+
+    def execute(self, decl=''):
+        actors_path = os.path.join(self.tmpdir, 'actors')
+        make_actor(actors_path, 'noisy', self.SCRIPT, decl)
+        wf = LeAppWorkflow(actors_path, cache=False)
+        wf.load_actors()
+        actor = wf.workflow.actors['noisy']
+        actor.output_spill_size = 1024
+        return actor.execute([Trigger()])
+
+    def test_spilled(self):
+        msg = self.execute()
+        self.assertEqual(msg.payload, [1, 2])
+        self.assertTrue(msg.errorinfo.startswith(b'err line 0\n'))
+        self.assertTrue(msg.errorinfo.endswith(b'err line 999\n'))
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_oversized(self):
+        msg = self.execute('max_output: 4096\n')
+        self.assertIsNone(msg.payload)
+        self.assertIsInstance(msg.errorinfo, OutputLimitError)
+        self.assertEqual(msg.errorinfo.stream, 'stdout')
+        self.assertEqual(msg.errorinfo.errdetails['limit'], 4096)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+""" Tests of the actors cache """
+
+import logging
+import os
+import shutil
+import unittest
+
+from leappwf.cache import ActorCache, valid
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor, outcomes
+
+_NAMES = ('first', 'second', 'third')
+
+
+class CacheTest(ActorsTestCase):
+
+    def setUp(self):
+        super(CacheTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        make_actor(self.actors_path, 'first', 'echo "{}"')
+        make_actor(self.actors_path, 'second', 'echo "{}"')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(CacheTest, self).tearDown()
+
+    def load(self, rescan=False):
+        wf = LeAppWorkflow(self.actors_path)
+        wf.load_actors(rescan)
+        return wf
+
+    def cached(self):
+        """ Return names of actors with a valid entry in the cache file """
+        cache = ActorCache(self.actors_path)
+        cache.load()
+        return set(name for name in _NAMES
+                   if cache.entry(name) is not None and
+                   valid(cache.entry(name),
+                         os.path.join(self.actors_path, name)))
+
+    def path(self, name, filename):
+        return os.path.join(self.actors_path, name, filename)
+
+    def append(self, name, filename, text):
+        with open(self.path(name, filename), 'a') as stream:
+            stream.write(text)
+
+    def test_unchanged(self):
+        self.load()
+        self.assertEqual(self.cached(), set(['first', 'second']))
+        wf = self.load()
+        self.assertEqual(set(wf.actors_data), set(['first', 'second']))
+        self.assertEqual(outcomes(wf.run_actors()),
+                         {'first': True, 'second': True})
+
+    def test_edited_files(self):
+        self.load()
+        for filename, text in (('first.sh', 'true\n'),
+                               ('actordecl.yaml', 'ttl: 5\n'),
+                               ('first.json', '\n')):
+            self.append('first', filename, text)
+            self.assertEqual(self.cached(), set(['second']), filename)
+            wf = self.load()
+            self.assertEqual(self.cached(), set(['first', 'second']),
+                             filename)
+        self.assertEqual(wf.actors_data['first'].ttl, 5)
+
+    def test_removed_and_added(self):
+        self.load()
+        shutil.rmtree(os.path.join(self.actors_path, 'first'))
+        make_actor(self.actors_path, 'third', 'echo "{}"')
+        wf = self.load()
+        self.assertEqual(set(wf.actors_data), set(['second', 'third']))
+        self.assertEqual(self.cached(), set(['second', 'third']))
+        # entry of removed actor is dropped
+        cache = ActorCache(self.actors_path)
+        cache.load()
+        self.assertIsNone(cache.entry('first'))
+
+    def test_rescan(self):
+        # whole seconds, kept exactly by utime of every Python
+        mtime = 1500000000
+        path = self.path('first', 'actordecl.yaml')
+        self.append('first', 'actordecl.yaml', 'ttl: 5\n')
+        os.utime(path, (mtime, mtime))
+        self.load()
+        # same size and mtime, the cache cannot tell the change
+        with open(path) as stream:
+            text = stream.read()
+        with open(path, 'w') as stream:
+            stream.write(text.replace('ttl: 5', 'ttl: 7'))
+        os.utime(path, (mtime, mtime))
+
+        self.assertEqual(self.load().actors_data['first'].ttl, 5)
+        self.assertEqual(self.load(rescan=True).actors_data['first'].ttl, 7)
+        self.assertEqual(self.load().actors_data['first'].ttl, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
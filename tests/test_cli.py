@@ -0,0 +1,83 @@
+""" Tests of the leappwf command """
+
+import logging
+import subprocess
+import sys
+import unittest
+
+import six
+
+from leappwf import cli
+
+from .helpers import EXAMPLE_ACTORS, TOP, ActorsTestCase
+
+
+class CommandTest(ActorsTestCase):
+
+    def setUp(self):
+        super(CommandTest, self).setUp()
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(CommandTest, self).tearDown()
+
+    def main(self, *argv):
+        """ Return exit code and lines printed by leappwf command """
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = six.StringIO()
+        sys.stderr = self.stderr = six.StringIO()
+        try:
+            code = cli.main(list(argv) + ['--quiet'])
+            return code, sys.stdout.getvalue().split()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def test_targets_before_path(self):
+        self.assertEqual(self.main('list', '--targets', 'docker,rsync',
+                                   EXAMPLE_ACTORS),
+                         (0, ['docker', 'has_docker', 'has_rsync', 'rsync']))
+
+    def test_repeated_targets(self):
+        self.assertEqual(self.main('list', EXAMPLE_ACTORS,
+                                   '--targets', 'docker',
+                                   '--targets', 'basic'),
+                         (0, ['basic', 'docker', 'has_docker']))
+
+    def test_all(self):
+        code, names = self.main('list', EXAMPLE_ACTORS)
+        self.assertEqual(code, 0)
+        self.assertIn('basic', names)
+        self.assertIn('rsync', names)
+
+    def test_unknown_targets(self):
+        for command in ('list', 'run'):
+            self.assertEqual(self.main(command, EXAMPLE_ACTORS,
+                                       '--targets', 'docker,nosuch'),
+                             (2, []))
+            self.assertEqual(self.stderr.getvalue(),
+                             "leappwf: error: unknown actors: nosuch\n")
+
+    def test_async_sudo_workers(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.main('run', EXAMPLE_ACTORS, '--mode', 'async',
+                      '--sudo-workers', '2')
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn('--sudo-workers', self.stderr.getvalue())
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_deferred_imports(self):
+        """ Actors machinery is not imported by importing the command """
+        imported = subprocess.check_output(
+            [sys.executable, '-c',
+             "import sys, leappwf.cli; print(' '.join(sorted("
+             "name for name in ('leappwf.run', 'networkx', 'wowp', 'yaml')"
+             " if name in sys.modules)))"],
+            cwd=TOP)
+        self.assertEqual(imported.decode().strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
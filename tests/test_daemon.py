@@ -0,0 +1,120 @@
+""" Tests of the daemon running actors on requests """
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import unittest
+
+from leappwf.daemon import WorkflowDaemon, request
+
+from .helpers import EXAMPLE_ACTORS, ActorsTestCase
+
+
+class DaemonTest(ActorsTestCase):
+
+    def setUp(self):
+        super(DaemonTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.socket_path = os.path.join(self.tmpdir, 'leappwf.sock')
+        self.daemon = WorkflowDaemon(EXAMPLE_ACTORS, self.socket_path)
+        self.server = threading.Thread(target=self.daemon.serve_forever)
+        self.server.start()
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.server.join()
+        logging.disable(logging.NOTSET)
+        super(DaemonTest, self).tearDown()
+
+    def send(self, line):
+        """ Send request line, return response document """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            stream = sock.makefile('rwb')
+            stream.write(line + b'\n')
+            stream.flush()
+            return json.loads(stream.readline().decode('utf-8'))
+        finally:
+            sock.close()
+
+    def test_targets(self):
+        response = request(self.socket_path, targets=['docker'])
+        self.assertEqual(sorted(response['results']),
+                         ['docker', 'has_docker'])
+
+    def test_all(self):
+        response = request(self.socket_path)
+        self.assertIn('basic', response['results'])
+
+    def test_invalid_targets(self):
+        for line in (b'{"targets": "docker"}', b'{"targets": [1]}',
+                     b'{"targets": {"docker": 1}}', b'["docker"]'):
+            response = self.send(line)
+            self.assertNotIn('results', response)
+            self.assertIn('error', response)
+        # connection is still served after invalid requests
+        self.assertIn('results', self.send(b'{"targets": ["basic"]}'))
+
+    def test_string_targets(self):
+        with self.assertRaises(ValueError):
+            self.daemon.run('docker')
+
+    def test_running_daemon_kept(self):
+        other = WorkflowDaemon(EXAMPLE_ACTORS, self.socket_path)
+        with self.assertRaises(IOError):
+            other.serve_forever()
+        self.assertIn('results', request(self.socket_path, ['basic']))
+
+
+class SocketPathTest(ActorsTestCase):
+
+    def setUp(self):
+        super(SocketPathTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.socket_path = os.path.join(self.tmpdir, 'leappwf.sock')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(SocketPathTest, self).tearDown()
+
+    def test_stale_socket_replaced(self):
+        # bound by a daemon which is gone
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socket_path)
+        sock.close()
+
+        daemon = WorkflowDaemon(EXAMPLE_ACTORS, self.socket_path)
+        server = threading.Thread(target=daemon.serve_forever)
+        server.start()
+        try:
+            deadline = time.time() + 10
+            while True:
+                try:
+                    response = request(self.socket_path, ['basic'])
+                    break
+                except socket.error:
+                    self.assertLess(time.time(), deadline)
+                    time.sleep(0.01)
+            self.assertIn('results', response)
+        finally:
+            daemon.shutdown()
+            server.join()
+
+    def test_not_a_socket(self):
+        with open(self.socket_path, 'w') as stream:
+            stream.write('data')
+        daemon = WorkflowDaemon(EXAMPLE_ACTORS, self.socket_path)
+        with self.assertRaises(IOError):
+            daemon.serve_forever()
+        with open(self.socket_path) as stream:
+            self.assertEqual(stream.read(), 'data')
+
+
+if __name__ == '__main__':
+    unittest.main()
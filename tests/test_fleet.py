@@ -0,0 +1,99 @@
+""" Tests of running actors against many hosts with Fleet """
+
+import logging
+import threading
+import unittest
+
+from leappwf.fleet import CommandTransport, Fleet
+from leappwf.run import LeAppWorkflow
+
+from .helpers import EXAMPLE_ACTORS, ActorsTestCase, outcomes
+
+
+class CountingTransport(CommandTransport):
+    """ Local transport counting scripts and hosts running at once """
+
+    def __init__(self, failing=()):
+        super(CountingTransport, self).__init__(['sh', '-c'])
+        self._failing = failing
+        self._lock = threading.Lock()
+        self._running = {}
+        self.max_scripts = 0
+        self.max_hosts = 0
+
+    def runner(self, host):
+        if host in self._failing:
+            raise OSError("no route to host")
+        runner = super(CountingTransport, self).runner(host)
+
+        def run(*args):
+            with self._lock:
+                self._running[host] = self._running.get(host, 0) + 1
+                self.max_scripts = max(self.max_scripts,
+                                       sum(self._running.values()))
+                self.max_hosts = max(self.max_hosts, len(self._running))
+            try:
+                return runner(*args)
+            finally:
+                with self._lock:
+                    self._running[host] -= 1
+                    if not self._running[host]:
+                        del self._running[host]
+        return run
+
+
+class FleetTest(ActorsTestCase):
+    # slow enough for scripts of many actors and hosts to overlap
+    sudo = '#!/bin/sh\nsleep 0.05\nexec "$@"\n'
+
+    def setUp(self):
+        super(FleetTest, self).setUp()
+        logging.disable(logging.WARNING)
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        wf.load_actors()
+        self.expected = outcomes(wf.run_actors())
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(FleetTest, self).tearDown()
+
+    def test_results_per_host(self):
+        hosts = ['host{}'.format(idx) for idx in range(4)]
+        with Fleet(EXAMPLE_ACTORS, CommandTransport(['sh', '-c']),
+                   cache=False) as fleet:
+            results = fleet.run(hosts)
+        self.assertEqual(sorted(results), hosts)
+        for host in hosts:
+            self.assertEqual(outcomes(results[host]), self.expected)
+        self.assertEqual(fleet.errors, {})
+
+    def test_limits(self):
+        transport = CountingTransport()
+        hosts = ['host{}'.format(idx) for idx in range(6)]
+        with Fleet(EXAMPLE_ACTORS, transport, cache=False) as fleet:
+            results = fleet.run(hosts, max_hosts=2, max_actors=3)
+        self.assertEqual(sorted(results), hosts)
+        self.assertLessEqual(transport.max_scripts, 3)
+        self.assertLessEqual(transport.max_hosts, 2)
+        self.assertGreater(transport.max_scripts, 1)
+
+    def test_errors(self):
+        transport = CountingTransport(failing=['down'])
+        with Fleet(EXAMPLE_ACTORS, transport, cache=False) as fleet:
+            results = fleet.run(['up', 'down'])
+        self.assertEqual(list(results), ['up'])
+        self.assertEqual(outcomes(results['up']), self.expected)
+        self.assertEqual(list(fleet.errors), ['down'])
+        self.assertIsInstance(fleet.errors['down'], OSError)
+
+    def test_targeted_then_full(self):
+        with Fleet(EXAMPLE_ACTORS, CommandTransport(['sh', '-c']),
+                   cache=False) as fleet:
+            results = fleet.run(['host'], targets=['docker'])
+            self.assertEqual(sorted(results['host']), ['docker', 'has_docker'])
+            results = fleet.run(['host'])
+        self.assertEqual(outcomes(results['host']), self.expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
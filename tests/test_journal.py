@@ -0,0 +1,115 @@
+""" Tests of resuming interrupted runs from the run journal """
+
+import logging
+import os
+import unittest
+
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor
+
+
+class ResumeTest(ActorsTestCase):
+
+    def setUp(self):
+        super(ResumeTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        self.ran_path = os.path.join(self.tmpdir, 'ran')
+        self.make_actor('first', '{"outports": {"first": "v1"}}')
+        self.make_actor('second', '{}', 'inports:\n  - src: first\n')
+        self.make_actor('third', '{}', 'inports:\n  - src: second\n')
+        self.make_actor('bad', '{}', fails=True)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(ResumeTest, self).tearDown()
+
+    def script(self, name, output, fails=False):
+        """ Return script printing output and logging that it ran """
+        script = "echo {} >> '{}'\necho '{}'".format(name, self.ran_path,
+                                                     output)
+        if fails:
+            script += '\necho oops >&2; exit 1'
+        return script
+
+    def make_actor(self, name, output, decl='', fails=False):
+        make_actor(self.actors_path, name, self.script(name, output, fails),
+                   decl)
+
+    def rewrite_script(self, name, output):
+        """ Replace script of actor created by make_actor """
+        self.write_script(os.path.join(self.actors_path, name, name + '.sh'),
+                          '#!/bin/sh\n' + self.script(name, output) + '\n')
+
+    def run_actors(self, resume):
+        """ Return journal, results and sorted names of actors whose
+        scripts ran """
+        if os.path.exists(self.ran_path):
+            os.remove(self.ran_path)
+        wf = LeAppWorkflow(self.actors_path, cache=False, journal=True)
+        wf.load_actors()
+        results = wf.run_actors(resume=resume)
+        ran = []
+        if os.path.exists(self.ran_path):
+            with open(self.ran_path) as stream:
+                ran = sorted(stream.read().split())
+        return wf.journal, results, ran
+
+    def test_resume_replays_completed(self):
+        _, first_results, ran = self.run_actors(False)
+        self.assertEqual(ran, ['bad', 'first', 'second', 'third'])
+
+        journal, results, ran = self.run_actors(True)
+        self.assertEqual(journal.replayed, set(['first', 'second', 'third']))
+        # failed actor runs again
+        self.assertEqual(ran, ['bad'])
+        self.assertEqual(dict((name, data['payload'])
+                              for name, data in results.items()),
+                         dict((name, data['payload'])
+                              for name, data in first_results.items()))
+        self.assertTrue(results['bad']['errorinfo'])
+
+    def test_no_resume(self):
+        self.run_actors(False)
+        journal, _, ran = self.run_actors(False)
+        self.assertEqual(journal.replayed, set())
+        self.assertEqual(ran, ['bad', 'first', 'second', 'third'])
+
+    def test_torn_record(self):
+        journal, _, _ = self.run_actors(False)
+        # crash while writing the record of the last actor, third
+        size = os.path.getsize(journal.journal_file)
+        with open(journal.journal_file, 'r+b') as stream:
+            stream.truncate(size - 10)
+
+        journal, _, ran = self.run_actors(True)
+        self.assertEqual(journal.replayed, set(['first', 'second']))
+        self.assertEqual(ran, ['bad', 'third'])
+
+        # torn record was cut off and record of third appended readable
+        journal, _, ran = self.run_actors(True)
+        self.assertEqual(journal.replayed, set(['first', 'second', 'third']))
+        self.assertEqual(ran, ['bad'])
+
+    def test_changed_script(self):
+        self.run_actors(False)
+        self.rewrite_script('second', '{ }')
+
+        journal, _, ran = self.run_actors(True)
+        self.assertEqual(journal.replayed, set(['first', 'third']))
+        self.assertEqual(ran, ['bad', 'second'])
+
+    def test_changed_inputs(self):
+        self.run_actors(False)
+        self.rewrite_script('first', '{"outports": {"first": "v2"}}')
+
+        journal, results, ran = self.run_actors(True)
+        # second gets another payload from first, third the same as before
+        self.assertEqual(journal.replayed, set(['third']))
+        self.assertEqual(ran, ['bad', 'first', 'second'])
+        self.assertEqual(results['first']['payload'], 'v2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+""" Tests of generating message classes from JSON class definitions """
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from leappwf.jsonclasses import JSONClassFactory
+from leappwf.msgtypes import ShellCommandStatus
+from leappwf.portannotation import MsgType
+
+
+def _data(**superclasses):
+    """ Return classes data of classes with given superclasses """
+    return [(name, {'superclass': superclass} if superclass else {})
+            for name, superclass in sorted(superclasses.items())]
+
+
+class GenerateTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.factory = JSONClassFactory()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def generate(self, namespace, classes_data):
+        self.factory.add_classes_data(namespace, classes_data)
+        self.factory.generate_classes()
+        return dict((name, self.factory.get_actor_class(namespace, name))
+                    for name, _ in classes_data)
+
+    def test_chain(self):
+        # defined before their superclasses
+        classes = self.generate('actor', [('C', {'superclass': 'B'}),
+                                          ('B', {'superclass': 'A'}),
+                                          ('A', {'superclass':
+                                                 'ShellCommandStatus'}),
+                                          ('Plain', {})])
+        self.assertEqual(classes['C'].__mro__[:5],
+                         (classes['C'], classes['B'], classes['A'],
+                          ShellCommandStatus, MsgType))
+        self.assertEqual(classes['Plain'].__bases__, (MsgType,))
+        for cls in classes.values():
+            self.assertEqual(cls.namespace, 'actor')
+
+    def test_long_chain(self):
+        # deeper than the default recursion limit
+        count = 1200
+        classes_data = [('C{}'.format(i), {'superclass': 'C{}'.format(i + 1)})
+                        for i in range(count)]
+        classes_data.append(('C{}'.format(count), {}))
+        classes = self.generate('actor', classes_data)
+        self.assertEqual(len(classes['C0'].__mro__), count + 3)
+
+    def test_cycle(self):
+        classes = self.generate('actor',
+                                _data(X='Y', Y='X', Z='X', Self='Self',
+                                      Fine='ShellCommandStatus'))
+        self.assertEqual([name for name, cls in sorted(classes.items())
+                          if cls is not None], ['Fine'])
+
+    def test_missing_superclass(self):
+        classes = self.generate('actor', _data(M='NoSuchClass', N='M',
+                                               NotType='json',
+                                               NotMsgType='JSONClassFactory',
+                                               Fine=None))
+        self.assertEqual([name for name, cls in sorted(classes.items())
+                          if cls is not None], ['Fine'])
+
+    def test_namespaces(self):
+        first = self.generate('first', _data(A=None, B='A'))
+        second = self.generate('second', _data(A='ShellCommandStatus'))
+        self.assertIsNot(first['A'], second['A'])
+        self.assertIs(first['B'].__bases__[0], first['A'])
+        self.assertTrue(issubclass(second['A'], ShellCommandStatus))
+        self.assertFalse(issubclass(first['A'], ShellCommandStatus))
+
+    def test_generated_once(self):
+        classes = self.generate('actor', _data(A=None, B='A'))
+        self.factory.generate_classes()
+        self.assertIs(self.factory.get_actor_class('actor', 'B'),
+                      classes['B'])
+        self.factory.remove_classes('actor')
+        self.assertIsNone(self.factory.get_actor_class('actor', 'B'))
+        self.assertEqual(self.factory.classes_data('actor'), [])
+
+
+class JSONFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.tmpdir = tempfile.mkdtemp(prefix='leappwf_test_')
+        self.factory = JSONClassFactory()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        logging.disable(logging.NOTSET)
+
+    def add(self, filename, text, class_name=None):
+        path = os.path.join(self.tmpdir, filename)
+        with open(path, 'w') as stream:
+            stream.write(text)
+        self.factory.add_json_class('actor', path, class_name)
+
+    def test_files(self):
+        self.add('Status.json', json.dumps({'superclass':
+                                            'ShellCommandStatus'}))
+        self.add('out.json', json.dumps({'superclass': 'Status'}), 'Out')
+        self.add('broken.json', '{"superclass": ')
+        self.add('invalid.json', json.dumps({'superclass': 1}))
+        self.add('Status.txt', '{}')
+        self.assertEqual([name for name, _ in
+                          self.factory.classes_data('actor')],
+                         ['Status', 'Out'])
+        self.factory.generate_classes()
+        self.assertIs(self.factory.get_actor_class('actor', 'Out').__base__,
+                      self.factory.get_actor_class('actor', 'Status'))
+
+
+if __name__ == '__main__':
+    unittest.main()
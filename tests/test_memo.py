@@ -0,0 +1,100 @@
+""" Tests of replaying memoized script results """
+
+import logging
+import os
+import time
+import unittest
+
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor, outcomes
+
+
+class MemoTest(ActorsTestCase):
+
+    def setUp(self):
+        super(MemoTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        self.flag = os.path.join(self.tmpdir, 'flag')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(MemoTest, self).tearDown()
+
+    def source(self, payload, decl=''):
+        make_actor(self.actors_path, 'source',
+                   'echo \'{{"outports": {{"source": "{}"}}}}\''.format(
+                       payload), decl)
+
+    def rewrite_source(self, payload):
+        self.write_script(
+            os.path.join(self.actors_path, 'source', 'source.sh'),
+            '#!/bin/sh\necho \'{{"outports": {{"source": "{}"}}}}\'\n'.format(
+                payload))
+
+    def sink(self):
+        make_actor(self.actors_path, 'sink',
+                   'echo \'{"outports": {"sink": "done"}}\'',
+                   'inports:\n  - src: source\n')
+
+    def run_actors(self, spill_size=None):
+        """ Return (outcomes, replayed actors, executed actors) of a run """
+        wf = LeAppWorkflow(self.actors_path, cache=False, memo=True)
+        wf.load_actors()
+        if spill_size is not None:
+            for actor in wf.workflow.actors.values():
+                actor.output_spill_size = spill_size
+        results = outcomes(wf.run_actors())
+        return results, wf.memo.cached, wf.memo.executed
+
+    def test_hit(self):
+        self.source('data')
+        self.sink()
+        self.assertEqual(self.run_actors(),
+                         ({'source': True, 'sink': True},
+                          set(), set(['source', 'sink'])))
+        self.assertEqual(self.run_actors(),
+                         ({'source': True, 'sink': True},
+                          set(['source', 'sink']), set()))
+
+    def test_input_changed(self):
+        self.source('data')
+        self.sink()
+        self.run_actors()
+        # new script of source, new inports data of sink
+        self.rewrite_source('other data')
+        self.assertEqual(self.run_actors()[1:],
+                         (set(), set(['source', 'sink'])))
+        self.assertEqual(self.run_actors()[1:],
+                         (set(['source', 'sink']), set()))
+
+    def test_ttl_expired(self):
+        self.source('data', 'ttl: 0.5\n')
+        self.run_actors()
+        self.assertEqual(self.run_actors()[1:], (set(['source']), set()))
+        time.sleep(0.6)
+        self.assertEqual(self.run_actors()[1:], (set(), set(['source'])))
+
+    def test_failure_not_memoized(self):
+        # fails until its second run
+        make_actor(self.actors_path, 'flaky',
+                   'if [ ! -e {0} ]; then touch {0}; echo oops >&2; exit 1; '
+                   'fi; echo \'{{"outports": {{"flaky": 1}}}}\''.format(
+                       self.flag))
+        self.assertEqual(self.run_actors(),
+                         ({'flaky': False}, set(), set(['flaky'])))
+        self.assertEqual(self.run_actors(),
+                         ({'flaky': True}, set(), set(['flaky'])))
+        self.assertEqual(self.run_actors(),
+                         ({'flaky': True}, set(['flaky']), set()))
+
+    def test_spilled_output_executed(self):
+        self.source('x' * 100)
+        for _ in range(2):
+            self.assertEqual(self.run_actors(spill_size=16),
+                             ({'source': True}, set(), set(['source'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
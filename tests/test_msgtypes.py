@@ -0,0 +1,53 @@
+""" Tests of messages passed between actors """
+
+import copy
+import pickle
+import unittest
+
+from leappwf.actor import ScriptError
+from leappwf.msgtypes import ShellCommandStatus, Trigger
+
+
+class MsgTypeTest(unittest.TestCase):
+
+    def assertSameMsg(self, msg, other):
+        self.assertIs(type(other), type(msg))
+        self.assertEqual((other.srcname, other.payload),
+                         (msg.srcname, msg.payload))
+
+    def test_pickle_round_trip(self):
+        msg = ShellCommandStatus('actor', None, {'rpms': ['bash']})
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertSameMsg(msg, pickle.loads(pickle.dumps(msg,
+                                                              protocol)))
+
+    def test_pickle_error(self):
+        msg = ShellCommandStatus('actor',
+                                 ScriptError("failed", "script failed", 1),
+                                 None)
+        other = pickle.loads(pickle.dumps(msg, pickle.HIGHEST_PROTOCOL))
+        self.assertSameMsg(msg, other)
+        self.assertEqual(str(other.errorinfo), str(msg.errorinfo))
+
+    def test_pickle_trigger(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertIsInstance(pickle.loads(pickle.dumps(Trigger(),
+                                                            protocol)),
+                                  Trigger)
+
+    def test_deepcopy(self):
+        msg = ShellCommandStatus('actor', None, {'rpms': ['bash']})
+        other = copy.deepcopy(msg)
+        self.assertSameMsg(msg, other)
+        self.assertIsNot(other.payload, msg.payload)
+
+    def test_immutable(self):
+        msg = ShellCommandStatus('actor', None, None)
+        with self.assertRaises(AttributeError):
+            msg.payload = 1
+        with self.assertRaises(AttributeError):
+            copy.copy(msg).payload = 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+""" Tests of bounded capture of scripts output and of JSON member lookup """
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from leappwf.output import (
+    OutputCapture,
+    capture,
+    json_member,
+    open_output,
+    oversized,
+    read_output,
+    remove_output)
+
+
+class _Trickle(io.BytesIO):
+    """ Stream returning at most size bytes per read, so that scanned
+    values span many chunks """
+
+    def __init__(self, data, size):
+        io.BytesIO.__init__(self, data)
+        self._size = size
+
+    def read(self, size=-1):
+        return io.BytesIO.read(self, self._size)
+
+
+class JsonMemberTest(unittest.TestCase):
+
+    DOCUMENTS = [
+        '{"outports": {"a": 1}}',
+        ' {\n "x": [1, {"y": "}]"}, []], "outports" : {"a": [1, 2]} }\n',
+        '{"log": "a \\" quoted \\\\ \\"outports\\": 1", "outports": null}',
+        '{"outports": "\\u00e9\\n", "after": {"outports": 2}}',
+        '{"outports": 1, "outports": {"last": true}}',
+        '{"nested": {"deep": [[[{"outports": 0}]]]}, "outports": -1.5e3}',
+        '{"outports": {"big": "' + 'x' * 5000 + '"}, "tail": false}',
+        '{}',
+    ]
+
+    def assertMember(self, text, key='outports'):
+        expected = json.loads(text).get(key)
+        data = text.encode('utf-8')
+        for size in (1, 2, 3, 7, 64, len(data)):
+            self.assertEqual(json_member(_Trickle(data, size), key),
+                             expected, (text, size))
+
+    def test_documents(self):
+        for text in self.DOCUMENTS:
+            self.assertMember(text)
+
+    def test_other_key(self):
+        self.assertMember(self.DOCUMENTS[1], 'x')
+
+    def test_missing_key(self):
+        self.assertIsNone(json_member(io.BytesIO(b'{"a": 1}'), 'outports'))
+
+    def test_not_an_object(self):
+        for data in (b'', b'[1, 2]', b'"outports"', b'outports: 1',
+                     b'{"outports": 1} trailing', b'{"outports": 1',
+                     b'{"outports": [1, 2}', b'{"outports" 1}',
+                     b'{outports: 1}', b'{"outports": }',
+                     b'{"outports": "unterminated}'):
+            for size in (1, 3, len(data) or 1):
+                self.assertIsNone(json_member(_Trickle(data, size),
+                                              'outports'), (data, size))
+
+
+class CaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='leappwf_test_')
+        self._tempdir = tempfile.tempdir
+        tempfile.tempdir = self.tmpdir
+
+    def tearDown(self):
+        tempfile.tempdir = self._tempdir
+        shutil.rmtree(self.tmpdir)
+
+    def spilled(self):
+        return os.listdir(self.tmpdir)
+
+    def test_in_memory(self):
+        output = capture(_Trickle(b'0123456789', 3), 10, 10)
+        self.assertEqual(output, b'0123456789')
+        self.assertFalse(oversized(output))
+        self.assertEqual(read_output(output), b'0123456789')
+        self.assertEqual(self.spilled(), [])
+
+    def test_spilled(self):
+        output = capture(_Trickle(b'0123456789', 3), None, 4)
+        self.assertEqual(output['size'], 10)
+        self.assertEqual(self.spilled(),
+                         [os.path.basename(output['path'])])
+        self.assertFalse(oversized(output))
+        self.assertEqual(read_output(output), b'0123456789')
+        with open_output(output) as stream:
+            self.assertEqual(stream.read(4), b'0123')
+        remove_output(output)
+        self.assertEqual(self.spilled(), [])
+        # removed already
+        remove_output(output)
+
+    def test_oversized(self):
+        output = OutputCapture(8, 4)
+        for chunk in (b'012', b'345', b'678', b'9'):
+            output.write(chunk)
+        result = output.result()
+        self.assertEqual(result, {'size': 10, 'limit': 8})
+        self.assertTrue(oversized(result))
+        self.assertEqual(read_output(result), b'')
+        # spill file is removed as soon as output exceeds its limit
+        self.assertEqual(self.spilled(), [])
+
+    def test_at_limit(self):
+        output = capture(io.BytesIO(b'01234567'), 8)
+        self.assertEqual(output, b'01234567')
+        self.assertFalse(oversized(output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+""" Tests of matching inports of actors with outports """
+
+import logging
+import os
+import unittest
+
+from leappwf.actor import AnnotatedFuncActor
+from leappwf.msgtypes import ShellCommandStatus
+from leappwf.portannotation import (
+    All,
+    DstPortAnnotation,
+    PortAnnotation,
+    PortMatcher,
+    matchactors)
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor
+
+
+def _actor(name, inports):
+    """ Return actor with given inport annotations and one outport """
+    return AnnotatedFuncActor(
+        lambda *args: None,
+        name=name,
+        inports=sorted(inports),
+        inports_annotations=inports,
+        outports=['out'],
+        outports_annotations={'out': PortAnnotation(ShellCommandStatus)})
+
+
+class CollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.producer = _actor('producer', {})
+        self.collector = _actor('collector', {
+            'everything': DstPortAnnotation(ShellCommandStatus, All)})
+        self.actors = [self.producer, self.collector]
+
+    def test_matchactors(self):
+        self.assertEqual(matchactors(self.actors),
+                         [(self.collector.inports['everything'],
+                           [self.producer.outports['out']])])
+
+    def test_port_matcher(self):
+        matcher = PortMatcher()
+        for actor in self.actors:
+            matcher.add(actor)
+        self.assertEqual(matcher.match(self.collector.inports['everything']),
+                         [self.producer.outports['out']])
+
+
+class CollectorRunTest(ActorsTestCase):
+
+    def test_collector_runs_last(self):
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        actors_path = os.path.join(self.tmpdir, 'actors')
+        ran_path = os.path.join(self.tmpdir, 'ran')
+        for name in ('first', 'second'):
+            make_actor(actors_path, name,
+                       "echo {} >> '{}'; echo '{{}}'".format(name, ran_path))
+        make_actor(actors_path, 'collector',
+                   "echo collector >> '{}'; echo '{{}}'".format(ran_path),
+                   "inports:\n  - name: everything\n    src: '*'\n")
+
+        wf = LeAppWorkflow(actors_path, cache=False)
+        wf.load_actors()
+        results = wf.run_actors()
+        self.assertEqual(sorted(results), ['collector', 'first', 'second'])
+        self.assertFalse(any(data['errorinfo'] for data in results.values()))
+        with open(ran_path) as stream:
+            self.assertEqual(stream.read().split()[-1], 'collector')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+""" Tests of reloading changed actors of a loaded workflow """
+
+import logging
+import os
+import shutil
+import unittest
+
+from leappwf.results import jsonable_results
+from leappwf.run import LeAppWorkflow
+from leappwf.watch import InotifyWatcher, PollingWatcher
+
+from .helpers import ActorsTestCase, make_actor
+
+
+class ReloadTest(ActorsTestCase):
+
+    def setUp(self):
+        super(ReloadTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        # sink takes its inport class from source
+        self.source('data')
+        make_actor(self.actors_path, 'sink',
+                   'cat; echo \'{"outports": {"sink": "done"}}\'',
+                   'inports:\n  - src: source\n')
+        make_actor(self.actors_path, 'other',
+                   'echo \'{"outports": {"other": "x"}}\'')
+        self.wf = LeAppWorkflow(self.actors_path)
+        self.wf.load_actors()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(ReloadTest, self).tearDown()
+
+    def source(self, payload):
+        make_actor(self.actors_path, 'source',
+                   'echo \'{{"outports": {{"source": "{}"}}}}\''.format(
+                       payload))
+
+    def write(self, name, filename, text):
+        path = os.path.join(self.actors_path, name, filename)
+        with open(path, 'w') as stream:
+            stream.write(text)
+
+    @staticmethod
+    def snapshot(wf):
+        """ Return actors, their dependencies and results of a run """
+        return (sorted(wf.actors_data), wf.workflow.dependencies(),
+                jsonable_results(wf.run_actors()))
+
+    def assertReloaded(self, names, rebuilt):
+        self.assertEqual(self.wf.reload(names), set(rebuilt))
+        fresh = LeAppWorkflow(self.actors_path, cache=False)
+        fresh.load_actors()
+        self.assertEqual(self.snapshot(self.wf), self.snapshot(fresh))
+
+    def test_modified(self):
+        self.write('sink', 'actordecl.yaml',
+                   'outports:\n  - type: sink.json\n')
+        self.assertReloaded(['sink'], ['sink'])
+        self.assertEqual(self.wf.workflow.dependencies()['sink'], set())
+
+    def test_script_edited(self):
+        self.write_script(os.path.join(self.actors_path, 'source',
+                                       'source.sh'),
+                          '#!/bin/sh\necho \'{"outports": {"source": 1}}\'\n')
+        self.assertReloaded(['source'], ['source', 'sink'])
+
+    def test_class_edited(self):
+        self.write('source', 'source.json', '{"superclass": "MsgType"}')
+        self.assertReloaded(['source'], ['source', 'sink'])
+
+    def test_removed_and_added(self):
+        shutil.rmtree(os.path.join(self.actors_path, 'source'))
+        self.assertReloaded(['source'], ['source', 'sink'])
+        self.assertNotIn('source', self.wf.actors_data)
+
+        self.source('again')
+        self.assertReloaded(['source'], ['source', 'sink'])
+        self.assertEqual(self.wf.workflow.dependencies()['sink'],
+                         set(['source']))
+
+    def test_new_actor(self):
+        make_actor(self.actors_path, 'extra', 'cat',
+                   'inports:\n  - src: other\n')
+        self.assertReloaded(['extra'], ['extra'])
+        self.assertEqual(self.wf.workflow.dependencies()['extra'],
+                         set(['other']))
+
+    def test_unchanged(self):
+        self.assertReloaded([], [])
+        self.assertReloaded(['other'], ['other'])
+
+    def test_not_watched(self):
+        self.assertRaises(ValueError, self.wf.reload)
+
+    def test_watched(self):
+        self.wf.watch()
+        self.assertEqual(self.wf.reload(), set())
+        self.write_script(os.path.join(self.actors_path, 'source',
+                                       'source.sh'),
+                          '#!/bin/sh\necho \'{"outports": {"source": 1}}\'\n')
+        make_actor(self.actors_path, 'extra', 'cat',
+                   'inports:\n  - src: other\n')
+        self.assertReloaded(None, ['source', 'sink', 'extra'])
+
+
+class PollingWatcherTest(ActorsTestCase):
+
+    def setUp(self):
+        super(PollingWatcherTest, self).setUp()
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        for name in ('first', 'second'):
+            make_actor(self.actors_path, name, 'true')
+
+    def watch(self):
+        return PollingWatcher(self.actors_path)
+
+    def test_changed(self):
+        watcher = self.watch()
+        self.addCleanup(watcher.close)
+        self.assertEqual(watcher.changed(), set())
+        with open(os.path.join(self.actors_path, 'first', 'first.sh'),
+                  'a') as stream:
+            stream.write('true\n')
+        shutil.rmtree(os.path.join(self.actors_path, 'second'))
+        make_actor(self.actors_path, 'third', 'true')
+        self.assertEqual(watcher.changed(),
+                         set(['first', 'second', 'third']))
+        self.assertEqual(watcher.changed(), set())
+
+
+class InotifyWatcherTest(PollingWatcherTest):
+
+    def watch(self):
+        try:
+            return InotifyWatcher(self.actors_path)
+        except (OSError, AttributeError, TypeError) as err:
+            self.skipTest("inotify not available: {}".format(err))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+""" Tests of the store of workflow run results """
+
+import logging
+import os
+import unittest
+
+from leappwf.portannotation import ActorError
+from leappwf.results import FAILED, OK, ResultsStore
+from leappwf.run import LeAppWorkflow
+
+from .helpers import ActorsTestCase, make_actor
+
+
+def _ok(payload):
+    return {'payload': payload, 'errorinfo': None}
+
+
+def _error(errorinfo):
+    return {'payload': None, 'errorinfo': errorinfo}
+
+
+class ResultsStoreTest(ActorsTestCase):
+
+    def setUp(self):
+        super(ResultsStoreTest, self).setUp()
+        self.store = ResultsStore(os.path.join(self.tmpdir, 'results',
+                                               'results.sqlite'))
+
+    def test_results(self):
+        run = self.store.add_run({
+            'a': _ok({'x': [1, 2]}),
+            'b': _error(b'oops\n'),
+            'c': _error(ActorError('skipped', 'dependency failed',
+                                   {'actor': 'b'}))})
+        self.assertEqual(self.store.results(run), {
+            'a': {'outcome': OK, 'errorinfo': None, 'payload': {'x': [1, 2]}},
+            'b': {'outcome': FAILED, 'errorinfo': 'oops\n', 'payload': None},
+            'c': {'outcome': 'skipped',
+                  'errorinfo': {'type': 'skipped',
+                                'message': 'dependency failed',
+                                'details': {'actor': 'b'}},
+                  'payload': None}})
+        self.assertEqual(list(self.store.results(run, outcomes=[OK])),
+                         ['a'])
+
+    def test_delta(self):
+        first = self.store.add_run({'same': _ok(1), 'payload': _ok(1),
+                                    'outcome': _ok(1), 'error': _error('e'),
+                                    'removed': _ok(1)})
+        # first run of host has nothing to compare with
+        self.assertEqual(set(self.store.delta(first)),
+                         set(['same', 'payload', 'outcome', 'error',
+                              'removed']))
+        second = self.store.add_run({'same': _ok(1), 'payload': _ok(2),
+                                     'outcome': _error('e'),
+                                     'error': _error('other'),
+                                     'added': _ok(3)})
+        self.assertEqual(self.store.delta(second), {
+            'payload': {'outcome': OK, 'errorinfo': None, 'payload': 2},
+            'outcome': {'outcome': FAILED, 'errorinfo': 'e',
+                        'payload': None},
+            'error': {'outcome': FAILED, 'errorinfo': 'other',
+                      'payload': None},
+            'added': {'outcome': OK, 'errorinfo': None, 'payload': 3},
+            'removed': None})
+        self.assertEqual(self.store.delta(second, since=second), {})
+
+    def test_since(self):
+        first = self.store.add_run({'a': _ok(1), 'b': _ok(1)})
+        self.store.add_run({'a': _ok(2), 'b': _ok(1)})
+        third = self.store.add_run({'a': _ok(1), 'b': _ok(1)})
+        self.assertEqual(list(self.store.delta(third)), ['a'])
+        self.assertEqual(self.store.delta(third, since=first), {})
+
+    def test_hosts(self):
+        first = self.store.add_run({'a': _ok(1)}, host='one')
+        self.store.add_run({'a': _ok(2)}, host='two')
+        third = self.store.add_run({'a': _ok(1)}, host='one')
+        # compared with the last run of the same host
+        self.assertEqual(self.store.delta(third), {})
+        self.assertEqual(self.store.last_run('one'), third)
+        self.assertEqual([run['id'] for run in self.store.runs('one')],
+                         [third, first])
+        self.assertEqual([record['payload'] for record in
+                          self.store.history('a', host='one')], [1, 1])
+        self.assertEqual([record['payload'] for record in
+                          self.store.history('a', limit=2)], [1, 2])
+
+
+class StoredRunsTest(ActorsTestCase):
+
+    def test_workflow_runs(self):
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        actors_path = os.path.join(self.tmpdir, 'actors')
+        make_actor(actors_path, 'first', 'echo \'{"outports": {"first": 1}}\'')
+        make_actor(actors_path, 'second', 'echo "{}"')
+
+        wf = LeAppWorkflow(actors_path, cache=False, results=True)
+        wf.load_actors()
+        wf.run_actors()
+        first = wf.results.last_run()
+        self.assertEqual(set(wf.results.delta(first)),
+                         set(['first', 'second']))
+        wf.run_actors()
+        self.assertEqual(wf.results.delta(wf.results.last_run()), {})
+
+        # script of first now fails
+        self.write_script(os.path.join(actors_path, 'first', 'first.sh'),
+                          '#!/bin/sh\necho oops >&2; exit 1\n')
+        wf.run_actors()
+        delta = wf.results.delta(wf.results.last_run())
+        self.assertEqual(list(delta), ['first'])
+        self.assertEqual(delta['first']['outcome'], FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+""" Tests of loading and running actors with LeAppWorkflow """
+
+import logging
+import os
+import unittest
+
+from leappwf.run import LeAppWorkflow
+
+from .helpers import EXAMPLE_ACTORS, ActorsTestCase, make_actor, outcomes
+
+
+class TargetsTest(ActorsTestCase):
+
+    def setUp(self):
+        super(TargetsTest, self).setUp()
+        logging.disable(logging.WARNING)
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        wf.load_actors()
+        self.full = outcomes(wf.run_actors())
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(TargetsTest, self).tearDown()
+
+    def test_targeted_run_loads_required(self):
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        results = wf.run_actors(targets=['docker'])
+        self.assertEqual(set(results), set(['docker', 'has_docker']))
+        self.assertEqual(set(wf.actors_data), set(['docker', 'has_docker']))
+
+    def test_targeted_then_full(self):
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        wf.run_actors(targets=['docker'])
+        self.assertEqual(outcomes(wf.run_actors()), self.full)
+
+    def test_targeted_then_other_targets(self):
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        wf.run_actors(targets=['docker'])
+        results = wf.run_actors(targets=['rsync'])
+        self.assertEqual(outcomes(results),
+                         dict((name, self.full[name])
+                              for name in ('rsync', 'has_rsync')))
+        self.assertEqual(outcomes(wf.run_actors()), self.full)
+
+    def test_targeted_load_then_loaded_targets(self):
+        wf = LeAppWorkflow(EXAMPLE_ACTORS, cache=False)
+        wf.load_actors(targets=['docker', 'rsync'])
+        results = wf.run_actors(targets=['has_docker'])
+        self.assertEqual(set(results), set(['has_docker']))
+        self.assertNotIn('basic', wf.actors_data)
+
+    def test_cached_targeted_then_full(self):
+        LeAppWorkflow(EXAMPLE_ACTORS).load_actors()
+        wf = LeAppWorkflow(EXAMPLE_ACTORS)
+        wf.run_actors(targets=['docker'])
+        self.assertEqual(outcomes(wf.run_actors()), self.full)
+
+
+class _Warnings(logging.Handler):
+    """ Handler keeping messages of warnings """
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class SettingsTest(ActorsTestCase):
+    """ Actors with settings of wrong types or values are skipped when they
+    are built """
+
+    def setUp(self):
+        super(SettingsTest, self).setUp()
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        self.warnings = _Warnings()
+        root = logging.getLogger()
+        self.level = root.level
+        root.setLevel(logging.WARNING)
+        root.addHandler(self.warnings)
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.removeHandler(self.warnings)
+        root.setLevel(self.level)
+        super(SettingsTest, self).tearDown()
+
+    def assertSettings(self, good, bad):
+        """ Check actors of good decls are built and actors of bad ones
+        (dict of names to (decl, error)) are skipped with their error """
+        for name, decl in good.items():
+            make_actor(self.actors_path, name, 'echo "{}"', decl)
+        for name, (decl, _) in bad.items():
+            make_actor(self.actors_path, name, 'echo "{}"', decl)
+        wf = LeAppWorkflow(self.actors_path, cache=False)
+        wf.load_actors()
+        self.assertEqual(set(wf.workflow.actors), set(good))
+        self.assertEqual(sorted(self.warnings.messages),
+                         sorted("skip {}: {}".format(name, error)
+                                for name, (_, error) in bad.items()))
+
+    def test_weight_and_locks(self):
+        weight = "weight should be a non-negative number"
+        locks = "locks should be names"
+        self.assertSettings(
+            {'light': 'weight: 0\n',
+             'heavy': 'weight: 2.5\nlocks: [rpm, net]\n',
+             'rpm': 'locks: rpm\n'},
+            {'word': ('weight: heavy\n', weight),
+             'negative': ('weight: -1\n', weight),
+             'flag': ('weight: true\n', weight),
+             'number': ('locks: [1]\n', locks),
+             'mapping': ('locks: {rpm: 1}\n', locks)})
+
+    def test_limits(self):
+        self.assertSettings(
+            {'limited': 'timeout: 10\ncpu_time: 0.5\nmemory: 100000000\n',
+             'unlimited': 'timeout: null\n'},
+            {'word': ('timeout: long\n',
+                      "timeout should be a non-negative number of seconds"),
+             'negative': ('cpu_time: -1\n',
+                          "cpu_time should be a non-negative number of "
+                          "seconds"),
+             'fraction': ('memory: 1.5\n',
+                          "memory should be a non-negative number of bytes"),
+             'suffix': ('memory: 100M\n',
+                        "memory should be a non-negative number of bytes")})
+
+    def test_max_output(self):
+        error = "max_output should be a positive number of bytes"
+        self.assertSettings({'bounded': 'max_output: 1024\n'},
+                            {'zero': ('max_output: 0\n', error),
+                             'fraction': ('max_output: 0.5\n', error),
+                             'word': ('max_output: 1k\n', error)})
+
+
+if __name__ == '__main__':
+    unittest.main()
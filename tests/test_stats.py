@@ -0,0 +1,156 @@
+""" Tests of run statistics and of estimates of run durations """
+
+import collections
+import logging
+import os
+import sqlite3
+import time
+import unittest
+
+from leappwf.run import LeAppWorkflow
+from leappwf.stats import RunStats
+from leappwf.workflow import SERIAL, THREAD
+
+from .helpers import ActorsTestCase, make_actor
+
+_Actor = collections.namedtuple('_Actor', 'name script')
+
+
+class RunStatsTest(ActorsTestCase):
+
+    def setUp(self):
+        super(RunStatsTest, self).setUp()
+        self.stats_path = os.path.join(self.tmpdir, 'stats', 'runs.sqlite')
+        self.stats = RunStats(self.stats_path)
+
+    def actor(self, name, text='true'):
+        """ Return actor with script of given text """
+        script = os.path.join(self.tmpdir, name + '.sh')
+        self.write_script(script, '#!/bin/sh\n' + text + '\n')
+        return _Actor(name, script)
+
+    def add(self, actor, durations, failed=False):
+        """ Record and store runs of actor taking durations in turn """
+        for duration in durations:
+            self.stats.add(actor.name, actor.script, duration, failed)
+            # runs are ordered by the time they finished
+            time.sleep(0.01)
+        self.stats.save()
+
+    def test_latest_runs(self):
+        actor = self.actor('a')
+        self.stats.history = 3
+        self.add(actor, [100, 1, 2, 3])
+        self.assertEqual(self.stats.estimates([actor]), {'a': 2})
+
+    def test_script_changed(self):
+        actor = self.actor('a')
+        self.add(actor, [10])
+        self.assertEqual(self.stats.estimates([actor]), {'a': 10})
+        # older script runs are used until the new one has any
+        actor = self.actor('a', 'sleep 1')
+        self.assertEqual(self.stats.estimates([actor]), {'a': 10})
+        self.add(actor, [2])
+        self.assertEqual(self.stats.estimates([actor]), {'a': 2})
+
+    def test_failed_runs(self):
+        actor = self.actor('a')
+        self.add(actor, [4], failed=True)
+        self.assertEqual(self.stats.estimates([actor]), {'a': 4})
+        self.add(actor, [2])
+        self.add(actor, [8], failed=True)
+        self.assertEqual(self.stats.estimates([actor]), {'a': 2})
+
+    def test_never_run(self):
+        first, second, new = (self.actor(name)
+                              for name in ('first', 'second', 'new'))
+        no_script = _Actor('no_script', None)
+        self.assertEqual(self.stats.estimates([new, no_script]),
+                         {'new': RunStats.default_duration})
+        self.add(first, [1])
+        self.add(second, [3])
+        self.assertEqual(self.stats.estimates([first, second, new]),
+                         {'first': 1, 'second': 3, 'new': 2})
+
+    def test_keep_runs(self):
+        first, second = self.actor('first'), self.actor('second')
+        self.stats.keep_runs = 3
+        self.add(first, [100, 100, 1, 1, 1])
+        self.add(second, [5])
+        self.stats.history = 10
+        self.assertEqual(self.stats.estimates([first, second]),
+                         {'first': 1, 'second': 5})
+        conn = sqlite3.connect(self.stats_path)
+        try:
+            counts = dict(conn.execute(
+                'SELECT actor, count(*) FROM runs GROUP BY actor'))
+        finally:
+            conn.close()
+        self.assertEqual(counts, {'first': 3, 'second': 1})
+
+    def test_unreadable_store(self):
+        logging.disable(logging.WARNING)
+        try:
+            os.mkdir(os.path.dirname(self.stats_path))
+            os.mkdir(self.stats_path)
+            actor = self.actor('a')
+            self.add(actor, [10])
+            self.assertEqual(self.stats.estimates([actor]),
+                             {'a': RunStats.default_duration})
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+class EstimateTest(ActorsTestCase):
+
+    def setUp(self):
+        super(EstimateTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(EstimateTest, self).tearDown()
+
+    def load(self, stats=False):
+        wf = LeAppWorkflow(self.actors_path, cache=False, stats=stats)
+        wf.load_actors()
+        return wf
+
+    def test_simulated_runs(self):
+        # chain of slow and its dependent, two independent actors
+        make_actor(self.actors_path, 'slow', 'true')
+        make_actor(self.actors_path, 'after', 'true',
+                   'inports:\n  - src: slow\n')
+        make_actor(self.actors_path, 'one', 'true')
+        make_actor(self.actors_path, 'two', 'true')
+        workflow = self.load().workflow
+        durations = {'slow': 3, 'after': 1, 'one': 1, 'two': 1}
+
+        self.assertEqual(workflow.estimate(durations), 6)
+        self.assertEqual(workflow.estimate(durations, THREAD, 1), 6)
+        # slow is started first, one and two run meanwhile
+        self.assertEqual(workflow.estimate(durations, THREAD, 2), 4)
+        self.assertEqual(workflow.estimate(durations, THREAD, 4), 4)
+        # one actor at a time fits into the budget
+        self.assertEqual(workflow.estimate(durations, THREAD, 2, budget=1),
+                         6)
+        self.assertEqual(workflow.compile().by_priority(durations)[0],
+                         'slow')
+
+    def test_past_runs(self):
+        make_actor(self.actors_path, 'nap', 'sleep 0.3; echo "{}"')
+        make_actor(self.actors_path, 'quick', 'echo "{}"')
+        wf = self.load()
+        self.assertEqual(wf.estimate(),
+                         2 * RunStats.default_duration)
+
+        self.load(stats=True).run_actors()
+        estimate = self.load().estimate(SERIAL)
+        self.assertGreaterEqual(estimate, 0.3)
+        self.assertLess(estimate, 2 * RunStats.default_duration)
+        self.assertLess(self.load().estimate(THREAD, 2), estimate)
+
+
+if __name__ == '__main__':
+    unittest.main()
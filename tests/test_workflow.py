@@ -0,0 +1,147 @@
+""" Tests of running workflows in every mode """
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+
+from leappwf.results import outcome
+from leappwf.run import LeAppWorkflow
+from leappwf.workflow import PROCESS, SERIAL, THREAD
+
+from .helpers import TOP, ActorsTestCase, make_actor
+
+
+class FailFastTest(ActorsTestCase):
+
+    def setUp(self):
+        super(FailFastTest, self).setUp()
+        logging.disable(logging.WARNING)
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        make_actor(self.actors_path, 'bad',
+                   'sleep 0.5; echo oops >&2; exit 1', 'fail_fast: true\n')
+        make_actor(self.actors_path, 'long', 'sleep 30; echo "{}"')
+        make_actor(self.actors_path, 'after_long', 'echo "{}"',
+                   'inports:\n  - src: long\n')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        super(FailFastTest, self).tearDown()
+
+    def run_actors(self, run):
+        wf = LeAppWorkflow(self.actors_path, cache=False)
+        wf.load_actors()
+        started = time.time()
+        results = run(wf)
+        self.assertLess(time.time() - started, 10)
+        return dict((name, outcome(data['errorinfo']))
+                    for name, data in results.items()
+                    if data['errorinfo'])
+
+    def assertCancelled(self, run):
+        self.assertEqual(self.run_actors(run),
+                         {'bad': 'failed',
+                          'long': 'cancelled',
+                          'after_long': 'skipped'})
+
+    def test_serial(self):
+        self.assertCancelled(lambda wf: wf.run_actors(SERIAL))
+
+    def test_thread(self):
+        self.assertCancelled(lambda wf: wf.run_actors(THREAD))
+
+    def test_process(self):
+        self.assertCancelled(lambda wf: wf.run_actors(PROCESS))
+
+    @unittest.skipIf(sys.version_info < (3, 5), "needs asyncio")
+    def test_async(self):
+        import asyncio
+
+        def run(wf):
+            loop = asyncio.new_event_loop()
+            try:
+                return loop.run_until_complete(wf.run_actors_async())
+            finally:
+                loop.close()
+        self.assertCancelled(run)
+
+
+def _alive(pid):
+    """ Return True if process pid runs and is not a zombie """
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stream:
+            return stream.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except IOError:
+        return False
+
+
+@unittest.skipUnless(os.path.isdir('/proc'), "needs /proc")
+class InterruptTest(ActorsTestCase):
+    """ Ctrl-C of the leappwf command kills scripts, although they run in
+    sessions of their own """
+
+    def setUp(self):
+        super(InterruptTest, self).setUp()
+        self.actors_path = os.path.join(self.tmpdir, 'actors')
+        self.pidfile = os.path.join(self.tmpdir, 'sleep.pid')
+        make_actor(self.actors_path, 'long',
+                   'sleep 300 & echo $! > {}; wait'.format(self.pidfile))
+
+    def interrupt(self, mode):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [TOP] + [path for path in [env.get('PYTHONPATH')] if path])
+        with open(os.devnull, 'wb') as devnull:
+            # process group of its own, standing in for the terminal's
+            child = subprocess.Popen(
+                [sys.executable, '-m', 'leappwf.cli', 'run', '--quiet',
+                 '--no-cache', '--mode', mode, self.actors_path],
+                env=env, stdout=devnull, stderr=devnull,
+                preexec_fn=os.setsid)
+        pid = None
+        try:
+            deadline = time.time() + 30
+            while not os.path.exists(self.pidfile) or \
+                    not os.path.getsize(self.pidfile):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.1)
+            with open(self.pidfile) as stream:
+                pid = int(stream.read())
+            os.killpg(child.pid, signal.SIGINT)
+            while _alive(pid):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.1)
+            if mode == 'process' and sys.version_info < (3,):
+                # process pools of the futures backport may deadlock on
+                # workers interrupted while holding a queue lock
+                return
+            while child.poll() is None:
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.1)
+            self.assertNotEqual(child.returncode, 0)
+        finally:
+            if child.poll() is None:
+                os.killpg(child.pid, signal.SIGKILL)
+                child.wait()
+            if pid is not None and _alive(pid):
+                os.kill(pid, signal.SIGKILL)
+
+    def test_serial(self):
+        self.interrupt('serial')
+
+    def test_thread(self):
+        self.interrupt('thread')
+
+    def test_process(self):
+        self.interrupt('process')
+
+    @unittest.skipIf(sys.version_info < (3, 5), "needs asyncio")
+    def test_async(self):
+        self.interrupt('async')
+
+
+if __name__ == '__main__':
+    unittest.main()